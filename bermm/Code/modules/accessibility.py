@@ -1,21 +1,14 @@
-import speech_recognition as sr
-import pyttsx3
 import logging
 import pyautogui
-import os
-import platform
-import json
+from config_store import get_config_store
+from screen_reader import IncrementalScreenReader
+from speech_listener import get_speech_listener
+from tts_backends import get_text_to_speech
 
 try:
-    import tolk  # Biblioteca para compatibilidad con lectores de pantalla (NVDA, JAWS, etc.)
+    import pytesseract  # OCR para leer el texto visible en pantalla
 except ImportError:
-    tolk = None
-
-try:
-    import accessible_output2.outputs.auto  # Para mayor compatibilidad con sistemas de accesibilidad
-    output = accessible_output2.outputs.auto.Auto()
-except ImportError:
-    output = None
+    pytesseract = None
 
 
 class Accessibility:
@@ -39,10 +32,11 @@ class Accessibility:
         """
         self.setup_logging()
         self.engine = self.init_text_to_speech_engine()
-        self.recognizer = sr.Recognizer()
+        self.listener = None
+        self.screen_reader = None
         self.nvda_installed = self.is_nvda_installed()
         self.config = self.load_config(config_file)
-        self.initialize_screen_reader_support()
+        self.engine.set_rate(self.config.get("voice_speed", 150))
 
     def setup_logging(self):
         """
@@ -52,16 +46,11 @@ class Accessibility:
 
     def init_text_to_speech_engine(self):
         """
-        Inicializa el motor de texto a voz.
+        Obtiene el motor de voz compartido del proceso (se elige una sola vez al arrancar).
 
-        :return: Instancia del motor pyttsx3.
+        :return: Instancia de TextToSpeech.
         """
-        try:
-            engine = pyttsx3.init()
-            return engine
-        except Exception as e:
-            logging.error(f"Error al inicializar el motor de texto a voz: {e}")
-            return None
+        return get_text_to_speech()
 
     def load_config(self, config_file):
         """
@@ -77,101 +66,127 @@ class Accessibility:
             "high_contrast": False,
             "enable_screen_reader": True
         }
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, "r", encoding="utf-8") as file:
-                    config = json.load(file)
-                    logging.info("Configuración cargada correctamente.")
-                    return config
-            except json.JSONDecodeError as e:
-                logging.error(f"Error al decodificar el archivo de configuración: {e}")
-        else:
-            self.save_config(default_config, config_file)
-        return default_config
+        return get_config_store(config_file, default_config).data
 
     def save_config(self, config, config_file):
         """
         Guarda la configuración en un archivo JSON.
 
+        La escritura es atómica y se agrupa con las siguientes durante un breve
+        intervalo; los cambios pendientes se escriben al salir.
+
         :param config: Diccionario de configuración.
         :param config_file: Ruta al archivo JSON de configuración.
         """
-        try:
-            with open(config_file, "w", encoding="utf-8") as file:
-                json.dump(config, file, indent=4)
-                logging.info("Configuración guardada correctamente.")
-        except IOError as e:
-            logging.error(f"Error al guardar el archivo de configuración: {e}")
+        get_config_store(config_file).replace(config)
+        self.engine.set_rate(config.get("voice_speed", 150))
 
-    def initialize_screen_reader_support(self):
+    def is_nvda_installed(self):
         """
-        Inicializa el soporte para lectores de pantalla si las bibliotecas están disponibles.
+        Comprueba si NVDA es el motor de voz elegido (su cliente de control se cargó y NVDA está en marcha).
+
+        :return: True si la voz sale por NVDA.
         """
-        if tolk:
-            try:
-                tolk.load()
-                logging.info("Tolk cargado correctamente.")
-            except Exception as e:
-                logging.error(f"Error al cargar Tolk: {e}")
-        if output:
-            logging.info("Salida de accesibilidad inicializada correctamente.")
+        return self.engine.name == "nvda"
 
-    def text_to_speech(self, text):
+    def text_to_speech(self, text, interrupt=False):
         """
         Convierte texto en voz y lo reproduce con el motor más accesible disponible.
 
-        Prioridad:
-        1. NVDA si está instalado en Windows.
+        Prioridad (se comprueba una sola vez, al arrancar):
+        1. NVDA si está en marcha en Windows (nvdaControllerClient.dll).
         2. Tolk (compatibilidad con JAWS y lectores de pantalla).
         3. accessible_output2 (soporte adicional).
         4. pyttsx3 (motor TTS interno de Python).
 
         :param text: Texto que se debe leer en voz alta.
+        :param interrupt: Cortar lo que se esté leyendo antes.
         """
         if not text:
             logging.warning("No se proporcionó texto para convertir a voz.")
             return
         try:
-            if self.nvda_installed:
-                os.system(f'nvdaControllerClient speak "{text}"')
-            elif tolk and tolk.is_loaded():
-                tolk.speak(text)
-            elif output:
-                output.speak(text)
-            elif self.engine:
-                self.engine.say(text)
-                self.engine.runAndWait()
-            else:
-                logging.error("No hay motor de texto a voz disponible.")
-            logging.info(f"Texto hablado: {text}")
+            if self.engine.speak(text, interrupt=interrupt):
+                logging.info(f"Texto hablado: {text}")
         except Exception as e:
             logging.error(f"Error al convertir texto a voz: {e}")
 
-    def speech_to_text(self):
+    def speech_to_text(self, timeout=10):
         """
-        Convierte voz en texto utilizando reconocimiento de voz con ajuste de ruido.
+        Convierte voz en texto con el reconocimiento de voz continuo compartido.
 
+        :param timeout: Segundos máximos de espera de una locución.
         :return: Texto reconocido o mensaje de error.
         """
-        with sr.Microphone() as source:
-            logging.info("Escuchando...")
-            self.recognizer.adjust_for_ambient_noise(source)
-            try:
-                audio = self.recognizer.listen(source, timeout=5)
-                text = self.recognizer.recognize_google(audio, language=self.config.get("language", "es-ES"))
-                logging.info(f"Texto reconocido: {text}")
-                return text.lower()
-            except sr.UnknownValueError:
-                logging.warning("No se pudo entender el audio.")
-                return "No entendí lo que dijiste."
-            except sr.RequestError as e:
-                logging.error(f"Error en el servicio de reconocimiento de voz: {e}")
+        if self.listener is None:
+            self.listener = get_speech_listener(self.config.get("language", "es-ES"),
+                                                backend=self.config.get("speech_backend", "google"),
+                                                model_path=self.config.get("vosk_model"),
+                                                wake_word=self.config.get("wake_words") or None)
+        text = self.listener.listen(timeout)
+        if text is None:
+            if not self.listener.available:
                 return "Error en el reconocimiento de voz."
+            logging.warning("No se pudo entender el audio.")
+            return "No entendí lo que dijiste."
+        return text
 
-    def read_screen_text(self):
+    def read_screen_text(self, incremental=False):
         """
         Captura el texto visible en la pantalla y lo lee en voz alta.
 
+        :param incremental: Solo pasar por el OCR las zonas que cambiaron desde
+            la lectura anterior y leer únicamente el texto nuevo.
+        :return: Texto reconocido o None si no se pudo leer la pantalla.
+        """
+        if pytesseract is None:
+            logging.error("pytesseract no está instalado; no se puede leer la pantalla.")
+            return None
+        try:
+            if incremental:
+                text = self.get_screen_reader().read()
+            else:
+                screenshot = pyautogui.screenshot()
+                text = pytesseract.image_to_string(screenshot, lang=self.ocr_language()).strip()
+        except Exception as e:
+            logging.error(f"Error al leer el texto de la pantalla: {e}")
+            return None
+        if text:
+            self.text_to_speech(text)
+        else:
+            logging.info("No se encontró texto nuevo en la pantalla." if incremental
+                         else "No se encontró texto en la pantalla.")
+        return text
+
+    def ocr_language(self):
+        return "spa" if self.config.get("language", "es-ES").startswith("es") else "eng"
+
+    def get_screen_reader(self):
+        """
+        Devuelve el lector de pantalla incremental, creándolo en el primer uso.
+
+        :return: Instancia de IncrementalScreenReader.
+        """
+        if self.screen_reader is None:
+            self.screen_reader = IncrementalScreenReader(lang=self.ocr_language())
+        return self.screen_reader
 
-::contentReference[oaicite:8]{index=8}
- 
+    def start_screen_reading(self, interval=2.0):
+        """
+        Lee en voz alta, cada interval segundos, el texto que aparezca en la pantalla.
+
+        :param interval: Segundos entre capturas.
+        """
+        if pytesseract is None:
+            logging.error("pytesseract no está instalado; no se puede leer la pantalla.")
+            return
+        self.get_screen_reader().start(self.text_to_speech, interval)
+        logging.info("Lectura continua de pantalla activada (cada %.1f s).", interval)
+
+    def stop_screen_reading(self):
+        """
+        Detiene la lectura continua de pantalla.
+        """
+        if self.screen_reader is not None:
+            self.screen_reader.stop()
+            self.screen_reader.log_stats()
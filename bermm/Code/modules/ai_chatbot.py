@@ -1,64 +1,108 @@
-import openai
 import logging
-import sqlite3
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-import pyttsx3
+import os
+import time
+from speech_service import get_speech_service
+from response_cache import ResponseCache, normalize_key
+from storage import MemoryStore
+from llm_client import LLMClient
+from conversation import ConversationManager
 from datetime import datetime
 
-# Descargar recursos de análisis de emociones si no están disponibles
-nltk.download('vader_lexicon')
+# Configurar clave de OpenAI (Reemplázala con tu clave o define OPENAI_API_KEY)
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "TU_CLAVE_OPENAI")
+OPENAI_API_BASE = "https://api.openai.com/v1"
 
-# Configurar clave de OpenAI (Reemplázala con tu clave)
-openai.api_key = "TU_CLAVE_OPENAI"
+# Respuestas que dependen del momento: se cachean poco tiempo y no se guardan en memoria.
+TIME_SENSITIVE_WORDS = {"hora", "fecha", "hoy", "dia", "ahora", "manana", "ayer"}
+TIME_SENSITIVE_TTL = 60
+
+# Referencias explícitas a la conversación anterior ("¿y mañana?", "explícalo mejor"). Esos
+# mensajes se cachean con la huella de la última respuesta; el resto, sin contexto.
+FOLLOW_UP_WORDS = {"eso", "esto", "esa", "ese", "esas", "esos", "aquello", "ello", "anterior", "antes", "entonces",
+                   "tambien", "otra", "otro", "mismo", "misma", "sigue", "continua", "mejor", "explicalo",
+                   "repitelo", "amplialo", "resumelo"}
+FOLLOW_UP_PREFIXES = ("y ", "pero ", "entonces ")
+
+AI_ERROR_RESPONSE = "Lo siento, hubo un error con el servicio de inteligencia artificial."
 
 class AIChatbot:
-    def __init__(self, language="es", personality="amigable"):
+    def __init__(self, language="es", personality="amigable", cache_size=512, api_base=OPENAI_API_BASE,
+                 request_timeout=30.0, context_tokens=1500):
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         logging.info("AI Chatbot inicializado.")
         
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
+        self.speech = get_speech_service()
         
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+        # NLTK y su léxico se cargan en el primer análisis de sentimiento.
+        self._sentiment_analyzer = None
 
-        self.conn = sqlite3.connect("chat_memory.db")
-        self.cursor = self.conn.cursor()
-        self.create_memory_table()
+        # WAL, conexión por hilo y escrituras agrupadas en un hilo escritor.
+        self.store = MemoryStore("chat_memory.db")
+
+        self.cache = ResponseCache(max_entries=cache_size)
+        self.warm_cache_from_memory()
 
         self.predefined_responses = {
             "hola": ["Hola, ¿cómo estás?", "¡Hola! ¿En qué puedo ayudarte?"],
             "adiós": ["Adiós, que tengas un buen día.", "Hasta luego, vuelve pronto."],
             "cómo estás": ["Estoy funcionando correctamente. Gracias por preguntar."],
             "qué puedes hacer": ["Puedo responder preguntas, abrir aplicaciones, buscar información y más."],
-            "qué hora es": [f"La hora actual es {datetime.now().strftime('%H:%M')}."]
+            "qué hora es": ["La hora actual es {hora}."]
         }
+        self._predefined_index = {normalize_key(key): value for key, value in self.predefined_responses.items()}
         
         self.language = language
         self.personality = personality
+        # api_base permite apuntar a otro endpoint compatible (p. ej. un servidor local de pruebas).
+        self.llm = LLMClient(OPENAI_API_KEY, api_base=api_base, timeout=request_timeout)
 
-    def create_memory_table(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS memory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_input TEXT UNIQUE,
-                bot_response TEXT
-            )
-        """)
-        self.conn.commit()
+        # Contexto multi-turno con ventana limitada por tokens y resumen incremental.
+        self.conversation = ConversationManager(self.store, self._summarize_turns,
+                                                max_context_tokens=context_tokens)
+        self.last_stream_metrics = {}
 
     def save_to_memory(self, user_input, bot_response):
         try:
-            self.cursor.execute("INSERT OR IGNORE INTO memory (user_input, bot_response) VALUES (?, ?)",
-                                (user_input, bot_response))
-            self.conn.commit()
+            self.store.save_memory(user_input, bot_response)
         except Exception as e:
             logging.error(f"Error al guardar en memoria: {e}")
 
     def get_from_memory(self, user_input):
-        self.cursor.execute("SELECT bot_response FROM memory WHERE user_input = ?", (user_input,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
+        return self.store.get_memory(user_input)
+
+    def warm_cache_from_memory(self):
+        """Carga en la caché las respuestas más recientes de la memoria persistente."""
+        for user_input, bot_response in self.store.recent_memory(self.cache.max_entries):
+            if not self.is_time_sensitive(user_input):
+                self.cache.put(user_input, bot_response)
+
+    @staticmethod
+    def is_time_sensitive(message):
+        return not TIME_SENSITIVE_WORDS.isdisjoint(normalize_key(message).split())
+
+    @staticmethod
+    def is_follow_up(message):
+        """Indica si un mensaje se refiere a lo ya dicho ("eso", "y ...", "explícalo")."""
+        key = normalize_key(message)
+        return key.startswith(FOLLOW_UP_PREFIXES) or not FOLLOW_UP_WORDS.isdisjoint(key.split())
+
+    def cache_stats(self):
+        """Contadores de aciertos/fallos de la caché de respuestas para monitorización."""
+        return self.cache.stats()
+
+    @property
+    def sentiment_analyzer(self):
+        if self._sentiment_analyzer is None:
+            import nltk
+            from nltk.sentiment import SentimentIntensityAnalyzer
+
+            # Descargar recursos de análisis de emociones solo si no están disponibles
+            try:
+                nltk.data.find('sentiment/vader_lexicon.zip')
+            except LookupError:
+                nltk.download('vader_lexicon')
+            self._sentiment_analyzer = SentimentIntensityAnalyzer()
+        return self._sentiment_analyzer
 
     def analyze_sentiment(self, message):
         sentiment_score = self.sentiment_analyzer.polarity_scores(message)["compound"]
@@ -69,36 +113,143 @@ class AIChatbot:
         return "neutral"
 
     def speak(self, text):
-        self.engine.say(text)
-        self.engine.runAndWait()
+        return self.speech.speak(text)
 
-    def get_response(self, message):
-        message = message.lower()
+    def _lookup_response(self, message, context):
+        """
+        Busca una respuesta en caché, memoria o predefinidas sin llamar al modelo.
+
+        Siempre se prueba primero la clave normalizada sin contexto y la memoria
+        persistente. Para los seguimientos (context no vacío) se prueba después
+        la entrada guardada con la huella de la última respuesta: "explícalo
+        mejor" no reutiliza lo que se explicó tras otra respuesta.
+        """
+        cached_response = self.cache.get(message)
+        if cached_response is not None:
+            logging.info("Respuesta obtenida de la caché.")
+            return cached_response
 
         memory_response = self.get_from_memory(message)
         if memory_response:
             logging.info("Respuesta obtenida de la memoria.")
+            self.cache.put(message, memory_response,
+                           ttl=TIME_SENSITIVE_TTL if self.is_time_sensitive(message) else None)
             return memory_response
 
-        if message in self.predefined_responses:
+        if context:
+            cached_response = self.cache.get(message, context=context)
+            if cached_response is not None:
+                logging.info("Respuesta obtenida de la caché (seguimiento).")
+                return cached_response
+
+        predefined = self._predefined_index.get(normalize_key(message))
+        if predefined:
             logging.info("Respuesta predefinida utilizada.")
-            return self.predefined_responses[message][0]
+            return predefined[0].format(hora=datetime.now().strftime('%H:%M'))
+        return None
+
+    def _remember(self, message, response, context):
+        if context is None:
+            return
+        time_sensitive = self.is_time_sensitive(message)
+        self.cache.put(message, response, ttl=TIME_SENSITIVE_TTL if time_sensitive else None, context=context)
+        if not time_sensitive and not context:
+            self.save_to_memory(message, response)
+
+    def _cache_context(self, message, follow_up):
+        """
+        Contexto con el que se cachea la respuesta: "" para los mensajes independientes y la
+        huella de la última respuesta para los seguimientos (None si aún no hay ninguna: no se cachean).
+        """
+        if follow_up is None:
+            follow_up = self.is_follow_up(message)
+        if not follow_up:
+            return ""
+        return self.conversation.reply_digest() or None
+
+    def get_response(self, message, follow_up=None):
+        """
+        :param follow_up: True si el mensaje depende de la conversación anterior; None lo decide is_follow_up().
+        """
+        message = message.lower()
+        context = self._cache_context(message, follow_up)
+
+        known_response = self._lookup_response(message, context)
+        if known_response is not None:
+            self.conversation.add_turn(message, known_response)
+            return known_response
 
         ai_response = self.get_ai_response(message)
 
-        self.save_to_memory(message, ai_response)
+        if ai_response != AI_ERROR_RESPONSE:
+            self._remember(message, ai_response, context)
+            self.conversation.add_turn(message, ai_response)
         return ai_response
 
+    def get_response_stream(self, message, follow_up=None):
+        """Como get_response, pero genera la respuesta por fragmentos a medida que llegan del modelo."""
+        message = message.lower()
+        context = self._cache_context(message, follow_up)
+
+        known_response = self._lookup_response(message, context)
+        if known_response is not None:
+            self.conversation.add_turn(message, known_response)
+            yield known_response
+            return
+
+        tokens = []
+        for token in self.stream_ai_response(message):
+            tokens.append(token)
+            yield token
+
+        if not self.last_stream_metrics.get("error"):
+            response = "".join(tokens).strip()
+            self._remember(message, response, context)
+            self.conversation.add_turn(message, response)
+
     def get_ai_response(self, prompt):
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response["choices"][0]["message"]["content"]
+            return self.llm.complete(self.conversation.build_messages(prompt))
         except Exception as e:
             logging.error(f"Error en IA: {e}")
-            return "Lo siento, hubo un error con el servicio de inteligencia artificial."
+            return AI_ERROR_RESPONSE
+
+    def stream_ai_response(self, prompt):
+        """
+        Genera los tokens de la respuesta del modelo a medida que llegan.
+
+        Al terminar, last_stream_metrics contiene el tiempo hasta el primer token
+        (time_to_first_token), la latencia total (total) y el número de tokens.
+        """
+        start = time.perf_counter()
+        metrics = {"time_to_first_token": None, "total": None, "tokens": 0, "error": False}
+        self.last_stream_metrics = metrics
+        try:
+            for token in self.llm.stream(self.conversation.build_messages(prompt)):
+                if metrics["time_to_first_token"] is None:
+                    metrics["time_to_first_token"] = time.perf_counter() - start
+                metrics["tokens"] += 1
+                yield token
+        except Exception as e:
+            logging.error(f"Error en IA: {e}")
+            metrics["error"] = True
+            yield AI_ERROR_RESPONSE
+        finally:
+            metrics["total"] = time.perf_counter() - start
+            logging.info("Streaming IA: primer token %s, total %.3fs, %d tokens.",
+                         f"{metrics['time_to_first_token']:.3f}s" if metrics["time_to_first_token"] is not None else "-",
+                         metrics["total"], metrics["tokens"])
+
+    def _summarize_turns(self, previous_summary, messages):
+        """Resume los turnos que salen de la ventana de contexto junto con el resumen anterior."""
+        transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+        # ~0,75 palabras por token: el resumen debe caber en summary_tokens.
+        max_words = self.conversation.summary_tokens * 3 // 4
+        prompt = ("Actualiza el resumen de la conversación en pocas frases, conservando datos, "
+                  f"nombres y preferencias del usuario. Usa como máximo {max_words} palabras.\n"
+                  f"Resumen anterior: {previous_summary or '(vacío)'}\n"
+                  f"Nuevos mensajes:\n{transcript}")
+        return self.llm.complete([{"role": "user", "content": prompt}], timeout=15.0)
 
 if __name__ == "__main__":
     chatbot = AIChatbot()
@@ -106,7 +257,7 @@ if __name__ == "__main__":
         user_input = input("Tú: ")
         if user_input.lower() in ["salir", "adiós"]:
             print("AI: Hasta luego.")
-            chatbot.speak("Hasta luego.")
+            chatbot.speak("Hasta luego.").wait()
             break
 
         sentiment = chatbot.analyze_sentiment(user_input)
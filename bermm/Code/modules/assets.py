@@ -0,0 +1,151 @@
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from direct.actor.Actor import Actor
+
+# Variantes del avatar: modelo y animaciones. AvatarModule y AvatarCreator las comparten.
+AVATAR_VARIANTS = {
+    "default": ("models/avatar", {"wave": "models/avatar_wave", "talk": "models/avatar_talk"}),
+}
+MODEL_EXTENSIONS = (".bam", ".egg", ".egg.pz", ".gltf", ".glb", ".obj")
+
+
+class AssetManager:
+    """
+    Caché de modelos y animaciones de Panda3D.
+
+    - Precarga en segundo plano con el cargador asíncrono de Panda3D
+      (loader.loadModel(..., blocking=False)); los callbacks llegan en el hilo
+      principal, en una tarea del task manager.
+    - Guarda una copia .bam de cada fuente (.egg, .gltf...) en cache_dir, con la
+      fecha de modificación de la fuente en el nombre: si la fuente cambia, se
+      vuelve a convertir; si no, se carga el .bam, que es mucho más rápido.
+    - Cada modelo se lee de disco una sola vez. Los Actor creados con
+      make_actor() copian el grafo de nodos pero comparten los datos de
+      geometría y las animaciones, así que cambiar de variante no toca el disco.
+    """
+
+    def __init__(self, loader, cache_dir=".bam_cache"):
+        self.loader = loader
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._models = {}
+        self._pending = {}
+        self.load_times = {}
+
+    @staticmethod
+    def _source_file(path):
+        if os.path.splitext(path)[1] and os.path.isfile(path):
+            return path
+        for extension in MODEL_EXTENSIONS:
+            if os.path.isfile(path + extension):
+                return path + extension
+        return None
+
+    def _bam_path(self, source):
+        """Ruta del .bam en caché para la versión actual de source, o None si source ya es un .bam."""
+        if source is None or source.endswith(".bam"):
+            return None
+        digest = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:12]
+        prefix = os.path.join(self.cache_dir, f"{os.path.basename(source).split('.')[0]}_{digest}_")
+        return f"{prefix}{os.stat(source).st_mtime_ns}.bam"
+
+    def _load_target(self, path):
+        """Devuelve (archivo a cargar, .bam a escribir tras cargarlo o None)."""
+        source = self._source_file(path)
+        bam = self._bam_path(source)
+        if bam is None:
+            return source or path, None
+        if os.path.isfile(bam):
+            return bam, None
+        return source, bam
+
+    def _store(self, path, model, bam, started):
+        if model is None:
+            logging.error("No se pudo cargar el modelo %s.", path)
+            return None
+        if bam is not None:
+            # Borrar los .bam de versiones anteriores de la misma fuente.
+            for stale in glob.glob(bam.rsplit("_", 1)[0] + "_*.bam"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            if not model.writeBamFile(bam):
+                logging.warning("No se pudo guardar el modelo %s en caché.", path)
+        self._models[path] = model
+        self.load_times[path] = time.perf_counter() - started
+        logging.info("Modelo %s cargado en %.2f s%s.", path, self.load_times[path],
+                     " (convertido a .bam)" if bam is not None else "")
+        return model
+
+    def get(self, path):
+        """Devuelve el modelo cacheado, cargándolo de forma síncrona si aún no lo está."""
+        model = self._models.get(path)
+        if model is None:
+            target, bam = self._load_target(path)
+            model = self._store(path, self.loader.loadModel(target, okMissing=True), bam, time.perf_counter())
+        return model
+
+    def preload(self, path, callback=None):
+        """Carga un modelo en segundo plano; callback(modelo) se llama al terminar (en el hilo principal)."""
+        if path in self._models:
+            if callback:
+                callback(self._models[path])
+            return
+        if path in self._pending:
+            if callback:
+                self._pending[path].append(callback)
+            return
+        self._pending[path] = [callback] if callback else []
+        target, bam = self._load_target(path)
+        self.loader.loadModel(target, blocking=False, callback=self._on_loaded,
+                              extraArgs=[path, bam, time.perf_counter()])
+
+    def _on_loaded(self, model, path, bam, started):
+        model = self._store(path, model, bam, started)
+        for callback in self._pending.pop(path, []):
+            try:
+                callback(model)
+            except Exception as e:
+                logging.error("Error en el callback de carga de %s: %s", path, e)
+
+    def preload_actor(self, variant="default", callback=None):
+        """Precarga el modelo y las animaciones de una variante; callback(variante) al tener todo."""
+        model, anims = AVATAR_VARIANTS[variant]
+        paths = [model] + list(anims.values())
+        remaining = {"count": len(paths)}
+
+        def loaded(_):
+            remaining["count"] -= 1
+            if remaining["count"] == 0 and callback:
+                callback(variant)
+
+        for path in paths:
+            self.preload(path, loaded)
+
+    def make_actor(self, variant="default"):
+        """Crea un Actor de una variante a partir de la caché (carga síncrona solo si falta algo)."""
+        model, anims = AVATAR_VARIANTS[variant]
+        geometry = self.get(model)
+        if geometry is None:
+            raise IOError(f"No se pudo cargar el modelo del avatar '{variant}'.")
+        animations = {name: self.get(path) for name, path in anims.items()}
+        return Actor(geometry, {name: anim for name, anim in animations.items() if anim is not None})
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_asset_manager(loader):
+    """Devuelve el AssetManager compartido de un cargador de Panda3D, creándolo la primera vez."""
+    with _managers_lock:
+        manager = _managers.get(id(loader))
+        if manager is None:
+            manager = _managers[id(loader)] = AssetManager(loader)
+        return manager
@@ -1,38 +1,95 @@
 import panda3d.core
-from panda3d.core import AmbientLight, DirectionalLight
+from panda3d.core import AmbientLight, ClockObject, DirectionalLight
 from direct.showbase.ShowBase import ShowBase
 from direct.actor.Actor import Actor
-import pyttsx3
+from speech_service import get_speech_service
+from camera_broker import get_camera_broker
+from gestures import GestureEngine
+from frame_pipeline import FrameTimeHistogram
+from lip_sync import LipSync
+from assets import get_asset_manager
+from avatar_palette import AvatarPalette
 import mediapipe as mp
 import cv2
+import logging
+import queue
 import threading
 import time
 
 class AvatarModule(ShowBase):
-    def __init__(self, camera_enabled=True):
+    def __init__(self, camera_enabled=True, camera_index=0, gesture_fps=15, report_interval=30.0,
+                 variant="default", palette_mode="node"):
         ShowBase.__init__(self)
 
+        # Panda3D no es seguro entre hilos: las llamadas desde la cámara o la voz se
+        # encolan y las ejecuta una tarea del task manager en el hilo principal.
+        self._main_thread_calls = queue.SimpleQueue()
+        self.taskMgr.add(self._run_main_thread_calls, "bermm-main-thread-calls")
+        self.report_interval = report_interval
+
         self.setup_lighting()
 
-        self.avatar = Actor("models/avatar",
-                            {"wave": "models/avatar_wave",
-                             "talk": "models/avatar_talk"})
+        # El avatar se carga en segundo plano: la ventana arranca con un Actor vacío
+        # que se sustituye en cuanto el modelo y sus animaciones están en caché.
+        self.assets = get_asset_manager(self.loader)
+        self.variant = None
+        self.palette = AvatarPalette(mode=palette_mode)
+        self.taskMgr.add(self.palette.flush_task, "bermm-avatar-palette")
+        self.avatar = Actor()
         self.avatar.reparentTo(self.render)
         self.avatar.setScale(1.5)
         self.avatar.setPos(0, 10, -2)
-
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
+        # Animación pedida mientras está el Actor provisional (sin animaciones); se aplica al cargar.
+        self._pending_animation = None
+        self.assets.preload_actor(variant, self.set_variant)
+
+        self.speech = get_speech_service()
+        # La boca se anima en cada frame a partir de los eventos de palabra del motor de voz,
+        # posando la animación "talk" según la apertura; la voz nunca bloquea el render.
+        self.lip_sync = LipSync(rate=self.speech.rate)
+        self.talking = False
+        self._talk_frames = 0
+        self.frame_times = FrameTimeHistogram("render")
+        self._next_frame_report = time.perf_counter() + self.report_interval
+        self.taskMgr.add(self._update_frame, "bermm-avatar-frame")
 
         self.camera_enabled = camera_enabled
         if self.camera_enabled:
             self.mp_hands = mp.solutions.hands
             self.hand_detector = self.mp_hands.Hands()
-            self.cap = cv2.VideoCapture(0)
-            self.camera_thread = threading.Thread(target=self.process_camera_feed)
+            self.gestures = GestureEngine(dispatch=self.call_in_main_thread)
+            self.gestures.on("pinch", self._on_wave_gesture)
+            # La cámara se comparte con VisionModule: el broker captura y convierte a RGB
+            # una sola vez, y los gestos se procesan a gesture_fps frames por segundo.
+            self.camera_subscription = get_camera_broker(camera_index).subscribe("avatar", fps=gesture_fps, rgb=True)
+            self.camera_thread = threading.Thread(target=self.process_camera_feed, daemon=True)
             self.camera_thread.start()
 
-        self.avatar.loop("wave")
+    def set_variant(self, variant):
+        """Cambia el avatar por otra variante en caliente, conservando posición y estado; llamar desde el hilo principal."""
+        actor = self.assets.make_actor(variant)
+        actor.reparentTo(self.render)
+        actor.setTransform(self.avatar.getTransform())
+        previous, self.avatar, self.variant = self.avatar, actor, variant
+        previous.cleanup()
+        previous.removeNode()
+        # Los nodos de las partes se resuelven una vez por Actor y se reaplican los colores actuales.
+        self.palette.bind(actor)
+        self._talk_frames = max((self.avatar.getNumFrames("talk") or 1) - 1, 0)
+        pending, self._pending_animation = self._pending_animation, None
+        if pending is not None:
+            method, args = pending
+            getattr(self.avatar, method)(*args)
+        elif not self.talking:
+            self.avatar.loop("wave")
+        logging.info("Avatar '%s' cargado.", variant)
+
+    def _animate(self, method, *args):
+        """Llama a loop/pose/stop del avatar; con el Actor provisional se guarda la última para set_variant()."""
+        if self.variant is None:
+            self._pending_animation = (method, args)
+            return
+        getattr(self.avatar, method)(*args)
 
     def setup_lighting(self):
         ambient_light = AmbientLight("ambientLight")
@@ -46,43 +103,89 @@ class AvatarModule(ShowBase):
         directional_node = self.render.attachNewNode(directional_light)
         self.render.setLight(directional_node)
 
+    def call_in_main_thread(self, function, *args):
+        """Ejecuta function(*args) en el hilo de Panda3D en el próximo frame; se puede llamar desde cualquier hilo."""
+        self._main_thread_calls.put((function, args))
+
+    def _run_main_thread_calls(self, task):
+        while True:
+            try:
+                function, args = self._main_thread_calls.get_nowait()
+            except queue.Empty:
+                return task.cont
+            try:
+                function(*args)
+            except Exception as e:
+                logging.error("Error en una llamada al hilo principal: %s", e)
+
     def speak(self, text):
-        self.avatar.loop("talk")
-        self.engine.say(text)
-        self.engine.runAndWait()
-        self.avatar.loop("wave")
+        return self.speech.speak(text, on_start=self._on_speech_start, on_word=self._on_speech_word,
+                                 on_done=self._on_speech_done)
+
+    def _on_speech_start(self, utterance):
+        self.lip_sync.start(utterance.text)
+        self.call_in_main_thread(self._set_talking, True)
+
+    def _on_speech_word(self, utterance, word):
+        self.lip_sync.on_word(word)
+
+    def _on_speech_done(self, utterance):
+        # Con respuestas en streaming llegan varias frases seguidas; solo se vuelve
+        # a la animación de reposo cuando no queda nada por decir.
+        if not self.speech.is_busy():
+            self.lip_sync.stop()
+            self.call_in_main_thread(self._set_talking, False)
+
+    def _set_talking(self, talking):
+        self.talking = talking
+        if talking:
+            self._animate("stop")
+        else:
+            self._animate("loop", "wave")
+
+    def _update_frame(self, task):
+        self.frame_times.record(ClockObject.getGlobalClock().getDt())
+        if self.talking:
+            self._animate("pose", "talk", int(round(self.lip_sync.openness() * self._talk_frames)))
+        if time.perf_counter() >= self._next_frame_report:
+            self.frame_times.log()
+            self._next_frame_report = time.perf_counter() + self.report_interval
+        return task.cont
+
+    def _on_wave_gesture(self, event):
+        self._animate("loop", "wave")
+        print("👋 Gesto detectado: saludo")
 
     def process_camera_feed(self):
-        while self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.hand_detector.process(frame)
-
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    thumb_tip = hand_landmarks.landmark[4]
-                    index_tip = hand_landmarks.landmark[8]
-
-                    if abs(thumb_tip.x - index_tip.x) < 0.05:
-                        self.avatar.loop("wave")
-                        print("👋 Gesto detectado: saludo")
-
-            time.sleep(0.1)
+        next_report = time.perf_counter() + self.report_interval
+        while not self.camera_subscription.closed:
+            frame = self.camera_subscription.get(timeout=0.5)
+            if frame is None:
+                continue
+            results = self.hand_detector.process(frame.rgb)
+            hands = results.multi_hand_landmarks or []
+            # La lateralidad identifica cada mano entre frames para la histéresis.
+            hand_keys = [handedness.classification[0].label for handedness in results.multi_handedness] \
+                if hands and results.multi_handedness else None
+            # También se procesan los frames sin manos: así se liberan los gestos activos.
+            self.gestures.process(hands, hand_keys, frame.timestamp)
+
+            if time.perf_counter() >= next_report:
+                self.gestures.log_stats()
+                next_report = time.perf_counter() + self.report_interval
 
     def change_avatar_color(self, part, color):
-        if part == "skin":
-            self.avatar.setColor(color[0], color[1], color[2], 1)
-        elif part == "hair":
-            self.avatar.find("**/Hair").setColor(color[0], color[1], color[2], 1)
-        elif part == "eyes":
-            self.avatar.find("**/Eyes").setColor(color[0], color[1], color[2], 1)
+        # El color se aplica en el siguiente frame; apply_palette() cambia varias partes a la vez.
+        self.palette.set_color(part, color)
         print(f"Color de {part} cambiado a {color}")
 
+    def apply_palette(self, colors):
+        """Aplica varios colores {parte: (r, g, b)} en la misma actualización; llamar desde el hilo principal."""
+        self.palette.apply_palette(colors)
+
     def cleanup(self):
         if self.camera_enabled:
-            self.cap.release()
+            self.camera_subscription.close()
             cv2.destroyAllWindows()
 
 if __name__ == "__main__":
@@ -1,14 +1,30 @@
-import json
-import os
 import logging
 import threading
-import pyttsx3
-import speech_recognition as sr
 import colorsys
-from panda3d.core import AmbientLight, DirectionalLight, Vec4
+from panda3d.core import AmbientLight, DirectionalLight
 from direct.showbase.ShowBase import ShowBase
 from direct.gui.DirectGui import DirectFrame, DirectButton, DirectSlider, DirectLabel
 from direct.actor.Actor import Actor
+from speech_service import get_speech_service
+from assets import get_asset_manager
+from config_store import get_config_store
+from avatar_palette import AvatarPalette
+from speech_listener import get_speech_listener
+
+# Palabras de los comandos de voz: "ojos azules", "pon el pelo negro"...
+VOICE_PARTS = {"piel": "skin", "ojos": "eye", "ojo": "eye", "cabello": "hair", "pelo": "hair", "ropa": "outfit"}
+VOICE_COLORS = {
+    "rojo": [1, 0, 0], "verde": [0, 1, 0], "azul": [0, 0, 1], "amarillo": [1, 1, 0],
+    "negro": [0, 0, 0], "blanco": [1, 1, 1], "gris": [0.5, 0.5, 0.5], "naranja": [1, 0.5, 0],
+    "rosa": [1, 0.6, 0.8], "morado": [0.5, 0, 0.5], "marrón": [0.45, 0.25, 0.1],
+}
+# Formas en femenino y plural ("azules", "negra", "rojos") de cada color.
+VOICE_COLOR_FORMS = {}
+for _name, _color in VOICE_COLORS.items():
+    _forms = {_name, _name + "s", _name + "es"}
+    if _name.endswith("o"):
+        _forms |= {_name[:-1] + "a", _name[:-1] + "as"}
+    VOICE_COLOR_FORMS.update(dict.fromkeys(_forms, _color))
 
 class AvatarCreator(ShowBase):
     """
@@ -20,19 +36,19 @@ class AvatarCreator(ShowBase):
     ✅ Selector avanzado de colores (RGB y HSV).
     """
 
-    def __init__(self, config_file="avatar_config.json"):
+    def __init__(self, config_file="avatar_config.json", palette_mode="node"):
         ShowBase.__init__(self)
 
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.config_file = config_file
         self.config = self.load_config()
 
-        # Inicializar motor de voz
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
+        # Servicio de voz compartido
+        self.speech = get_speech_service()
 
-        # Inicializar reconocimiento de voz
-        self.recognizer = sr.Recognizer()
+        # Colores por parte: nodos resueltos una vez y cambios aplicados una vez por frame.
+        self.palette = AvatarPalette(mode=palette_mode)
+        self.taskMgr.add(self.palette.flush_task, "bermm-avatar-palette")
 
         # Configurar iluminación y cargar avatar
         self.setup_lighting()
@@ -47,29 +63,19 @@ class AvatarCreator(ShowBase):
         logging.info("Avatar Creator inicializado correctamente.")
 
     def load_config(self):
-        """Carga la configuración del avatar desde JSON."""
+        """Carga la configuración del avatar desde JSON (a través del ConfigStore compartido)."""
         default_config = {
             "skin_color": [1, 1, 1],   
             "eye_color": [0, 0, 1],    
             "hair_color": [0, 0, 0],   
             "outfit_color": [1, 0, 0]  
         }
-
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, "r", encoding="utf-8") as file:
-                    return json.load(file)
-            except json.JSONDecodeError:
-                logging.error("Error al leer la configuración, usando valores por defecto.")
-        
-        self.save_config(default_config)
-        return default_config
+        self.config_store = get_config_store(self.config_file, default_config)
+        return self.config_store.data
 
     def save_config(self, config):
-        """Guarda la configuración del avatar en un archivo JSON."""
-        with open(self.config_file, "w", encoding="utf-8") as file:
-            json.dump(config, file, indent=4)
-            logging.info("Configuración del avatar guardada correctamente.")
+        """Programa el guardado de la configuración; las escrituras seguidas se agrupan en una."""
+        self.config_store.replace(config)
 
     def setup_lighting(self):
         """Configura la iluminación del entorno 3D."""
@@ -84,17 +90,26 @@ class AvatarCreator(ShowBase):
         directional_node = self.render.attachNewNode(directional_light)
         self.render.setLight(directional_node)
 
-    def load_avatar(self):
-        """Carga el modelo 3D del avatar y aplica los colores configurados."""
+    def load_avatar(self, variant="default"):
+        """Carga el modelo 3D del avatar en segundo plano; los colores se aplican al terminar."""
+        self.assets = get_asset_manager(self.loader)
+        self.avatar = Actor()
+        self.avatar.reparentTo(self.render)
+        self.avatar.setScale(1.5)
+        self.avatar.setPos(0, 10, -2)
+        self.assets.preload_actor(variant, self.on_avatar_loaded)
+
+    def on_avatar_loaded(self, variant):
+        """Sustituye el avatar provisional por la variante cargada y aplica los colores configurados."""
         try:
-            self.avatar = Actor("models/avatar", {
-                "wave": "models/avatar_wave",
-                "talk": "models/avatar_talk"
-            })
-            self.avatar.reparentTo(self.render)
-            self.avatar.setScale(1.5)
-            self.avatar.setPos(0, 10, -2)
-
+            actor = self.assets.make_actor(variant)
+            actor.reparentTo(self.render)
+            actor.setTransform(self.avatar.getTransform())
+            self.avatar.cleanup()
+            self.avatar.removeNode()
+            self.avatar = actor
+
+            self.palette.bind(actor)
             self.apply_saved_colors()
             logging.info("Avatar cargado correctamente.")
 
@@ -102,9 +117,39 @@ class AvatarCreator(ShowBase):
             logging.error(f"Error al cargar el avatar: {e}")
 
     def apply_saved_colors(self):
-        """Aplica los colores guardados en la configuración."""
-        for part in ["skin", "eye", "hair", "outfit"]:
-            self.change_avatar_color(part, self.config.get(f"{part}_color", [1, 1, 1]))
+        """Aplica los colores guardados en la configuración, todos en la misma actualización."""
+        self.palette.apply_palette({part: self.config.get(f"{part}_color", [1, 1, 1])
+                                    for part in ["skin", "eye", "hair", "outfit"]})
+
+    def create_color_palette_ui(self):
+        """Crea los deslizadores RGB y los botones para elegir la parte del avatar a colorear."""
+        self.selected_part = "skin"
+        self.ui_frame = DirectFrame(frameColor=(0, 0, 0, 0.4), frameSize=(-0.55, 0.55, -0.35, 0.35),
+                                    pos=(-0.75, 0, -0.55))
+        self.part_label = DirectLabel(text="Parte: skin", scale=0.05, pos=(0, 0, 0.27), parent=self.ui_frame)
+        self.red_slider, self.green_slider, self.blue_slider = (
+            self._create_slider(label, z) for label, z in (("R", 0.15), ("G", 0.05), ("B", -0.05)))
+        # El comando se asigna cuando existen los tres deslizadores, porque update_color los lee todos.
+        for slider in (self.red_slider, self.green_slider, self.blue_slider):
+            slider["command"] = lambda: self.update_color(self.selected_part)
+
+        for i, part in enumerate(["skin", "eye", "hair", "outfit"]):
+            DirectButton(text=part, scale=0.05, pos=(-0.39 + i * 0.26, 0, -0.22), parent=self.ui_frame,
+                         command=self.select_part, extraArgs=[part])
+        self.select_part(self.selected_part)
+
+    def _create_slider(self, label, z):
+        DirectLabel(text=label, scale=0.05, pos=(-0.45, 0, z), parent=self.ui_frame)
+        return DirectSlider(range=(0, 1), value=1, pageSize=0.05, scale=0.38, pos=(0.05, 0, z + 0.015),
+                            parent=self.ui_frame)
+
+    def select_part(self, part):
+        """Elige la parte a colorear y coloca los deslizadores en su color actual."""
+        self.selected_part = part
+        self.part_label["text"] = f"Parte: {part}"
+        color = self.config.get(f"{part}_color", [1, 1, 1])
+        for slider, value in zip((self.red_slider, self.green_slider, self.blue_slider), color):
+            slider["value"] = value
 
     def update_color(self, part):
         """Obtiene el color seleccionado y lo aplica al avatar."""
@@ -112,46 +157,42 @@ class AvatarCreator(ShowBase):
         self.change_avatar_color(part, color)
 
     def change_avatar_color(self, part, color):
-        """Cambia el color de una parte específica del avatar."""
-        color_tuple = Vec4(color[0], color[1], color[2], 1)
-        node_name = {
-            "skin": "", 
-            "eye": "Eyes", 
-            "hair": "Hair", 
-            "outfit": "Outfit"
-        }.get(part, "")
+        """
+        Cambia el color de una parte específica del avatar.
 
+        Se puede llamar desde cualquier hilo (p. ej. el control por voz): el color se
+        aplica en el siguiente frame junto con los demás cambios pendientes.
+        """
         try:
-            if part == "skin":
-                self.avatar.setColor(color_tuple)
-            else:
-                node = self.avatar.find(f"**/{node_name}")
-                if not node.isEmpty():
-                    node.setColor(color_tuple)
-
-            self.config[f"{part}_color"] = color
-            self.save_config(self.config)
-            logging.info(f"Color de {part} cambiado a {color}.")
+            self.palette.set_color(part, color)
+            # Sin escritura si el color no cambia (p. ej. al aplicar los colores guardados).
+            self.config_store.set(f"{part}_color", list(color))
+            logging.debug(f"Color de {part} cambiado a {color}.")
         except Exception as e:
             logging.error(f"No se pudo cambiar el color de {part}: {e}")
 
-    def listen_for_command(self):
-        """Escucha comandos de voz para cambiar colores del avatar."""
-        with sr.Microphone() as source:
-            logging.info("Di un comando (piel, ojos, cabello, ropa)...")
-            self.recognizer.adjust_for_ambient_noise(source)
-            try:
-                audio = self.recognizer.listen(source, timeout=5)
-                command = self.recognizer.recognize_google(audio, language="es-ES").lower()
-                self.process_voice_command(command)
-            except sr.UnknownValueError:
-                logging.warning("No se entendió el comando.")
-            except sr.RequestError:
-                logging.error("Error con el servicio de reconocimiento de voz.")
+    def process_voice_command(self, command):
+        """Interpreta comandos como "ojos azules" o "pelo negro"; sin parte, usa la seleccionada."""
+        words = command.lower().split()
+        part = next((VOICE_PARTS[word] for word in words if word in VOICE_PARTS), self.selected_part)
+        color = next((VOICE_COLOR_FORMS[word] for word in words if word in VOICE_COLOR_FORMS), None)
+        if color is None:
+            logging.warning(f"No se reconoció ningún color en el comando: {command}")
+            return
+        self.change_avatar_color(part, color)
+        logging.info(f"Comando de voz: {part} -> {color}.")
+
+    def on_voice_transcript(self, transcript):
+        self.process_voice_command(transcript.text)
 
     def start_voice_control(self):
-        """Inicia el reconocimiento de voz en un hilo separado."""
-        threading.Thread(target=self.listen_for_command, daemon=True).start()
+        """Suscribe el avatar a la escucha continua compartida (sin calibrar en cada comando)."""
+        def subscribe():
+            # La primera suscripción abre el micrófono y calibra: fuera del hilo de Panda3D.
+            self.stop_voice_control = get_speech_listener().subscribe(self.on_voice_transcript)
+            logging.info("Di un comando (piel, ojos, cabello, ropa)...")
+
+        threading.Thread(target=subscribe, daemon=True).start()
 
 if __name__ == "__main__":
     app = AvatarCreator()
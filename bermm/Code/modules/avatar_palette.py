@@ -0,0 +1,152 @@
+import logging
+import threading
+
+from panda3d.core import Shader, Texture, SamplerState, Vec4
+
+# Partes coloreables del avatar y el nodo que las contiene (None es el avatar completo).
+AVATAR_PARTS = {"skin": None, "eye": "Eyes", "hair": "Hair", "outfit": "Outfit"}
+PART_ALIASES = {"eyes": "eye"}
+
+PALETTE_VERTEX_SHADER = """
+#version 130
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat4 p3d_ModelViewMatrix;
+uniform mat3 p3d_NormalMatrix;
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+in vec4 p3d_Color;
+in vec2 p3d_MultiTexCoord0;
+out vec3 normal;
+out vec4 vertex_color;
+out vec2 texcoord;
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    normal = normalize(p3d_NormalMatrix * p3d_Normal);
+    vertex_color = p3d_Color;
+    texcoord = p3d_MultiTexCoord0;
+}
+"""
+
+# Color = textura base * color de vértice * color de la parte en la paleta, con
+# iluminación ambiental + direccional equivalente a la del resto de la escena.
+PALETTE_FRAGMENT_SHADER = """
+#version 130
+uniform sampler2D p3d_Texture0;
+uniform sampler2D palette;
+uniform float part_index;
+uniform struct { vec4 ambient; } p3d_LightModel;
+uniform struct {
+    vec4 color;
+    vec4 position;
+} p3d_LightSource[2];
+in vec3 normal;
+in vec4 vertex_color;
+in vec2 texcoord;
+out vec4 fragment_color;
+void main() {
+    vec4 tint = texelFetch(palette, ivec2(int(part_index), 0), 0);
+    vec3 light = p3d_LightModel.ambient.rgb;
+    for (int i = 0; i < 2; ++i) {
+        vec3 direction = normalize(p3d_LightSource[i].position.xyz);
+        light += p3d_LightSource[i].color.rgb * max(dot(normalize(normal), direction), 0.0);
+    }
+    vec4 base = texture(p3d_Texture0, texcoord) * vertex_color * tint;
+    fragment_color = vec4(base.rgb * light, base.a);
+}
+"""
+
+
+class AvatarPalette:
+    """
+    Colores de las partes del avatar.
+
+    Los NodePath de cada parte se buscan una sola vez al enlazar el Actor (no en
+    cada cambio de color). set_color() se puede llamar desde cualquier hilo y
+    solo anota el color; flush() aplica todos los pendientes de una vez, de modo
+    que muchos cambios en un mismo frame (arrastrar un deslizador) cuestan una
+    sola actualización por parte.
+
+    Con mode="shader", los colores viven en una textura de paleta de una fila
+    (un texel por parte) que lee un shader; cada parte solo guarda su índice como
+    shader input, así que recolorear es escribir unos bytes en la textura, sin
+    tocar el grafo de escena, por muchas subpartes que tenga el modelo.
+    """
+
+    def __init__(self, actor=None, parts=None, mode="node"):
+        if mode not in ("node", "shader"):
+            raise ValueError("Modo de paleta no reconocido. Usa 'node' o 'shader'.")
+        self.parts = dict(parts or AVATAR_PARTS)
+        self.mode = mode
+        self.colors = {}
+        self._nodes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._indices = {part: index for index, part in enumerate(self.parts)}
+        self._texture = None
+        self._texels = None
+        if mode == "shader":
+            self._texture = Texture("avatar-palette")
+            self._texture.setup2dTexture(len(self.parts), 1, Texture.T_unsigned_byte, Texture.F_rgba8)
+            self._texture.setMinfilter(SamplerState.FT_nearest)
+            self._texture.setMagfilter(SamplerState.FT_nearest)
+            self._texels = bytearray(b"\xff" * 4 * len(self.parts))
+            self._texture.setRamImage(bytes(self._texels))
+            self._shader = Shader.make(Shader.SL_GLSL, PALETTE_VERTEX_SHADER, PALETTE_FRAGMENT_SHADER)
+        if actor is not None:
+            self.bind(actor)
+
+    def bind(self, actor):
+        """Resuelve los nodos de cada parte en un Actor (p. ej. tras cambiar de variante) y reaplica los colores."""
+        self._nodes = {}
+        for part, node_name in self.parts.items():
+            node = actor if node_name is None else actor.find(f"**/{node_name}")
+            if node.isEmpty():
+                logging.debug("El avatar no tiene la parte '%s'.", part)
+                continue
+            self._nodes[part] = node
+            if self.mode == "shader":
+                node.setShaderInput("part_index", float(self._indices[part]))
+        if self.mode == "shader":
+            actor.setShader(self._shader)
+            actor.setShaderInput("palette", self._texture)
+        self.apply_palette(self.colors)
+
+    def set_color(self, part, color):
+        """Anota el color de una parte; se aplica en el siguiente flush()."""
+        part = PART_ALIASES.get(part, part)
+        if part not in self.parts:
+            raise ValueError(f"Parte del avatar desconocida: {part}")
+        with self._lock:
+            self._pending[part] = tuple(color[:3])
+
+    def flush(self):
+        """Aplica los colores pendientes; llamar desde el hilo de Panda3D, una vez por frame."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.colors.update(pending)
+        if self.mode == "shader":
+            for part, (red, green, blue) in pending.items():
+                offset = self._indices[part] * 4
+                # Las imágenes en RAM de Panda3D se guardan en orden BGRA.
+                self._texels[offset:offset + 3] = bytes(int(round(max(0.0, min(1.0, value)) * 255))
+                                                        for value in (blue, green, red))
+            self._texture.setRamImage(bytes(self._texels))
+            return
+        for part, (red, green, blue) in pending.items():
+            node = self._nodes.get(part)
+            if node is not None:
+                # Prioridad 1: se impone a los colores propios de las subpartes del modelo.
+                node.setColor(Vec4(red, green, blue, 1), 1)
+
+    def apply_palette(self, colors):
+        """Aplica varios colores {parte: (r, g, b)} de una sola vez."""
+        for part, color in colors.items():
+            self.set_color(part, color)
+        self.flush()
+
+    def flush_task(self, task):
+        """Tarea del task manager que aplica los cambios pendientes en cada frame."""
+        self.flush()
+        return task.cont
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    Bucle asyncio que corre en un hilo propio.
+
+    Permite usar clientes asíncronos (con su pool de conexiones ligado a un único
+    bucle) tanto desde código síncrono como desde otros bucles asyncio.
+    """
+
+    def __init__(self, name):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Programa una corrutina en el bucle y devuelve un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Ejecuta una corrutina y bloquea hasta obtener su resultado."""
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro):
+        """Ejecuta una corrutina en este bucle y la espera desde cualquier otro bucle."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
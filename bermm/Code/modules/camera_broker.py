@@ -0,0 +1,190 @@
+import logging
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_pipeline import LatestFrameBuffer, StageStats
+
+
+class CameraFrame:
+    """
+    Frame compartido entre consumidores.
+
+    bgr y rgb son arrays de solo lectura: todos los suscriptores reciben el mismo
+    objeto, así que quien necesite dibujar sobre el frame debe copiarlo antes.
+    """
+
+    __slots__ = ("index", "timestamp", "bgr", "rgb")
+
+    def __init__(self, index, timestamp, bgr, rgb=None):
+        self.index = index
+        self.timestamp = timestamp
+        self.bgr = bgr
+        self.rgb = rgb
+
+
+class CameraSubscription:
+    """Suscripción de un consumidor: recibe el frame más reciente, como máximo a fps frames por segundo."""
+
+    def __init__(self, broker, name, fps=None, rgb=False, capacity=1):
+        self.broker = broker
+        self.name = name
+        self.rgb = rgb
+        self.min_interval = 1.0 / fps if fps else 0.0
+        self.closed = False
+        self._buffer = LatestFrameBuffer(capacity)
+        self._next_due = 0.0
+
+    @property
+    def dropped(self):
+        """Frames que llegaron a la suscripción pero se descartaron porque el consumidor iba retrasado."""
+        return self._buffer.dropped
+
+    def get(self, timeout=None):
+        """Devuelve el siguiente CameraFrame, o None si vence el tiempo."""
+        return self._buffer.get(timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def _offer(self, frame):
+        if frame.timestamp < self._next_due:
+            return
+        # Avanzar desde el plazo anterior evita que la tasa efectiva derive por debajo de fps.
+        self._next_due = max(self._next_due + self.min_interval, frame.timestamp)
+        self._buffer.put(frame)
+
+
+class CameraBroker:
+    """
+    Captura única de una cámara compartida por varios consumidores.
+
+    Un solo hilo lee la cámara, convierte a RGB una vez por frame (solo si algún
+    suscriptor lo pide) y reparte el mismo CameraFrame a todas las suscripciones.
+    La cámara se abre con la primera suscripción y se libera con la última.
+
+    Los frames RGB se escriben en un pequeño grupo de buffers reservados de
+    antemano; un buffer solo se reutiliza cuando ningún consumidor conserva ya
+    el frame (ni vistas de él), así que nunca se modifica un frame entregado.
+    """
+
+    # Buffers RGB reutilizables como máximo; si todos están en uso se reserva uno suelto.
+    max_rgb_buffers = 8
+
+    def __init__(self, camera_index=0):
+        self.camera_index = camera_index
+        self.stats = StageStats("captura")
+        self.frames_captured = 0
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        # Serializa arrancar y parar el hilo de captura (incluida la espera a que termine).
+        self._lifecycle_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._rgb_buffers = []
+
+    def subscribe(self, name, fps=None, rgb=False, capacity=1):
+        """
+        :param name: Nombre del consumidor, para los registros.
+        :param fps: Tasa máxima de entrega al consumidor; None entrega todos los frames.
+        :param rgb: Si el consumidor necesita la versión RGB del frame.
+        """
+        subscription = CameraSubscription(self, name, fps, rgb, capacity)
+        with self._lifecycle_lock:
+            # Un hilo que se estaba parando ya terminó: unsubscribe lo espera sin soltar este cerrojo.
+            with self._lock:
+                self._subscriptions.append(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=f"bermm-camera-{self.camera_index}",
+                                                daemon=True)
+                self._thread.start()
+        logging.info("Consumidor '%s' suscrito a la cámara %d.", name, self.camera_index)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lifecycle_lock:
+            with self._lock:
+                if subscription in self._subscriptions:
+                    self._subscriptions.remove(subscription)
+                subscription.closed = True
+                if self._subscriptions or self._thread is None:
+                    return
+                self._stop.set()
+            # El hilo de captura toma _lock en cada frame: se le espera fuera de _lock, pero
+            # dentro de _lifecycle_lock para que un subscribe simultáneo vea el hilo ya parado.
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+
+    def _rgb_buffer(self, shape):
+        """Devuelve un buffer RGB libre de la forma dada, reservándolo si no hay ninguno."""
+        for buffer in self._rgb_buffers:
+            # Solo lo referencian la lista, esta variable y getrefcount: ningún frame lo conserva.
+            if buffer.shape == shape and sys.getrefcount(buffer) <= 3:
+                buffer.flags.writeable = True
+                return buffer
+        buffer = np.empty(shape, dtype=np.uint8)
+        if len(self._rgb_buffers) >= self.max_rgb_buffers:
+            # Al cambiar de resolución se descartan los buffers del tamaño anterior.
+            self._rgb_buffers = [old for old in self._rgb_buffers if old.shape == shape]
+        if len(self._rgb_buffers) < self.max_rgb_buffers:
+            self._rgb_buffers.append(buffer)
+        return buffer
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            logging.error("No se pudo abrir la cámara con índice %d.", self.camera_index)
+            self._close_all()
+            return
+        logging.info("Cámara %d abierta.", self.camera_index)
+        last = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                ret, bgr = cap.read()
+                if not ret:
+                    logging.warning("No se pudo leer el frame. Terminando captura.")
+                    break
+                now = time.perf_counter()
+                self.stats.record(now - last)
+                last = now
+                self.frames_captured += 1
+
+                with self._lock:
+                    subscriptions = list(self._subscriptions)
+                rgb = None
+                if any(subscription.rgb for subscription in subscriptions):
+                    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer(bgr.shape))
+                    rgb.flags.writeable = False
+                bgr.flags.writeable = False
+                frame = CameraFrame(self.frames_captured, time.time(), bgr, rgb)
+                for subscription in subscriptions:
+                    subscription._offer(frame)
+        finally:
+            cap.release()
+            self._close_all()
+            logging.info("Cámara %d liberada.", self.camera_index)
+
+    def _close_all(self):
+        # Los consumidores comprueban subscription.closed para terminar sus bucles.
+        with self._lock:
+            for subscription in self._subscriptions:
+                subscription.closed = True
+            self._subscriptions.clear()
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_camera_broker(camera_index=0):
+    """Devuelve el CameraBroker compartido de una cámara, creándolo la primera vez."""
+    with _brokers_lock:
+        broker = _brokers.get(camera_index)
+        if broker is None:
+            broker = _brokers[camera_index] = CameraBroker(camera_index)
+        return broker
@@ -0,0 +1,160 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+class ConfigStore:
+    """
+    Configuración JSON persistente con escrituras agrupadas y atómicas.
+
+    Los cambios se aplican en memoria al instante y un hilo propio los escribe
+    cuando pasan debounce segundos sin cambios (o, como mucho, max_delay
+    segundos después del primero), así que arrastrar un deslizador produce una
+    sola escritura. Cada escritura va a un archivo temporal que sustituye al
+    original con os.replace, de modo que un corte nunca deja el JSON a medias.
+    Los cambios pendientes se escriben al salir del proceso. Si una escritura
+    falla, los cambios siguen pendientes y se reintenta con espera exponencial
+    (de 1 s hasta max_backoff segundos).
+    """
+
+    def __init__(self, path, defaults=None, debounce=0.5, max_delay=2.0, max_backoff=60.0):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_backoff = max_backoff
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._first_change = self._last_change = 0.0
+        self._closed = False
+        self.writes = 0
+
+        self.data = self._load(defaults or {})
+        self._thread = threading.Thread(target=self._run, name="bermm-config", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _load(self, defaults):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                logging.info("Configuración cargada desde %s.", self.path)
+                return data
+            except (json.JSONDecodeError, OSError) as e:
+                logging.error("Error al leer %s, usando valores por defecto: %s", self.path, e)
+                return copy.deepcopy(defaults)
+        # Crear el archivo con los valores por defecto, como antes, pero sin bloquear.
+        self._dirty = True
+        self._first_change = self._last_change = time.monotonic()
+        return copy.deepcopy(defaults)
+
+    def get(self, key, default=None):
+        with self._condition:
+            return self.data.get(key, default)
+
+    def set(self, key, value):
+        """Cambia un valor; si no cambia nada, no se programa ninguna escritura."""
+        with self._condition:
+            if key in self.data and self.data[key] == value:
+                return
+            self.data[key] = value
+            self._mark_dirty()
+
+    def update(self, values):
+        with self._condition:
+            changed = {key: value for key, value in values.items() if key not in self.data or self.data[key] != value}
+            if changed:
+                self.data.update(changed)
+                self._mark_dirty()
+
+    def replace(self, data):
+        """Sustituye toda la configuración."""
+        with self._condition:
+            if data is not self.data:
+                self.data.clear()
+                self.data.update(data)
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        now = time.monotonic()
+        if not self._dirty:
+            self._first_change = now
+        self._dirty = True
+        self._last_change = now
+        self._condition.notify()
+
+    def _run(self):
+        with self._condition:
+            while not self._closed:
+                if not self._dirty:
+                    self._condition.wait()
+                    continue
+                due = max(min(self._last_change + self.debounce, self._first_change + self.max_delay),
+                          self._retry_at)
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._condition.release()
+                try:
+                    self.flush()
+                finally:
+                    self._condition.acquire()
+
+    def flush(self):
+        """Escribe ya los cambios pendientes, si los hay."""
+        with self._write_lock:
+            with self._condition:
+                if not self._dirty:
+                    return
+                text = json.dumps(self.data, indent=4, ensure_ascii=False)
+                self._dirty = False
+            temporary = None
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                descriptor, temporary = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+                with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                    file.write(text)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temporary, self.path)
+                self.writes += 1
+                self._backoff = self._retry_at = 0.0
+                logging.debug("Configuración guardada en %s.", self.path)
+            except OSError as e:
+                self._backoff = min(max(self._backoff * 2, self.debounce, 1.0), self.max_backoff)
+                logging.error("Error al guardar %s (reintento en %.1f s): %s", self.path, self._backoff, e)
+                if temporary is not None and os.path.exists(temporary):
+                    os.remove(temporary)
+                with self._condition:
+                    self._retry_at = time.monotonic() + self._backoff
+                    self._mark_dirty()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_config_store(path, defaults=None):
+    """Devuelve el ConfigStore compartido de un archivo, creándolo la primera vez."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ConfigStore(path, defaults)
+        return store
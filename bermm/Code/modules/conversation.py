@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+CONVERSATION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversation (
+        session TEXT,
+        seq INTEGER,
+        role TEXT,
+        content TEXT,
+        tokens INTEGER,
+        created REAL,
+        PRIMARY KEY (session, seq)
+    );
+    CREATE TABLE IF NOT EXISTS conversation_summary (
+        session TEXT PRIMARY KEY,
+        summary TEXT,
+        upto_seq INTEGER
+    );
+"""
+INSERT_TURN = "INSERT OR REPLACE INTO conversation (session, seq, role, content, tokens, created) VALUES (?, ?, ?, ?, ?, ?)"
+UPSERT_SUMMARY = "INSERT OR REPLACE INTO conversation_summary (session, summary, upto_seq) VALUES (?, ?, ?)"
+SELECT_SUMMARY = "SELECT summary, upto_seq FROM conversation_summary WHERE session = ?"
+SELECT_WINDOW = "SELECT seq, role, content, tokens FROM conversation WHERE session = ? AND seq > ? ORDER BY seq"
+SELECT_LAST_SEQ = "SELECT MAX(seq) FROM conversation WHERE session = ?"
+SELECT_LAST_REPLY = ("SELECT content FROM conversation WHERE session = ? AND role = 'assistant' "
+                     "ORDER BY seq DESC LIMIT 1")
+
+
+def clip_words(text, max_chars, keep_end=False):
+    """Recorta text a max_chars caracteres sin partir palabras; keep_end conserva el final en lugar del principio."""
+    if len(text) <= max_chars:
+        return text
+    if keep_end:
+        clipped = text[-max_chars:]
+        return clipped.split(" ", 1)[1] if " " in clipped and not text[-max_chars - 1].isspace() else clipped.lstrip()
+    clipped = text[:max_chars]
+    return clipped.rsplit(" ", 1)[0] if " " in clipped and not text[max_chars].isspace() else clipped.rstrip()
+
+
+def estimate_tokens(text):
+    """Estimación barata de tokens (~4 caracteres por token) sin depender de un tokenizador."""
+    return max(1, len(text) // 4)
+
+
+class Message:
+    __slots__ = ("seq", "role", "content", "tokens")
+
+    def __init__(self, seq, role, content, tokens):
+        self.seq = seq
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+
+class ConversationManager:
+    """
+    Estado de la conversación con ventana deslizante limitada por tokens.
+
+    Los turnos se guardan en chat_memory.db (tabla conversation) a través del
+    MemoryStore. Cuando la ventana supera max_context_tokens, los turnos más
+    antiguos se resumen en segundo plano junto con el resumen anterior
+    (resumen incremental), y el resumen se guarda en conversation_summary.
+    Así cada turno nuevo envía como mucho resumen + ventana, sin importar lo
+    larga que sea la historia.
+    """
+
+    def __init__(self, store, summarize, session="default", max_context_tokens=1500,
+                 summary_tokens=250, system_prompt=None):
+        """
+        :param store: MemoryStore compartido con el chatbot.
+        :param summarize: Función (resumen_anterior, mensajes) -> nuevo resumen.
+        :param max_context_tokens: Presupuesto de tokens de la ventana de turnos recientes.
+        :param summary_tokens: Tamaño máximo aproximado del resumen.
+        """
+        self.store = store
+        self.summarize = summarize
+        self.session = session
+        self.max_context_tokens = max_context_tokens
+        self.summary_tokens = summary_tokens
+        self.system_prompt = system_prompt
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bermm-summary")
+        self._compacting = False
+
+        self.store.execute_script(CONVERSATION_SCHEMA)
+        row = self.store.query(SELECT_SUMMARY, (session,))
+        self.summary, self.upto_seq = row[0] if row else ("", 0)
+        self.window = deque(Message(*fields) for fields in self.store.query(SELECT_WINDOW, (session, self.upto_seq)))
+        self.window_tokens = sum(message.tokens for message in self.window)
+        last_seq = self.store.query(SELECT_LAST_SEQ, (session,))[0][0]
+        self._seq = last_seq or 0
+        row = self.store.query(SELECT_LAST_REPLY, (session,))
+        self.last_reply = row[0][0] if row else ""
+
+    def build_messages(self, prompt):
+        """Mensajes para el modelo: instrucciones + resumen, ventana reciente y el prompt nuevo."""
+        with self._lock:
+            system_parts = [self.system_prompt] if self.system_prompt else []
+            if self.summary:
+                system_parts.append(f"Resumen de la conversación anterior: {self.summary}")
+            messages = [{"role": "system", "content": "\n".join(system_parts)}] if system_parts else []
+            messages.extend({"role": message.role, "content": message.content} for message in self.window)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def reply_digest(self):
+        """
+        Huella de la última respuesta del asistente, o "" si aún no hay ninguna.
+
+        Un seguimiento ("¿y mañana?") se responde igual tras la misma respuesta,
+        aunque el resto de la conversación sea distinto.
+        """
+        with self._lock:
+            if not self.last_reply:
+                return ""
+            return hashlib.sha1(self.last_reply.encode("utf-8")).hexdigest()[:16]
+
+    def add_turn(self, user_input, response):
+        with self._lock:
+            for role, content in (("user", user_input), ("assistant", response)):
+                self._seq += 1
+                message = Message(self._seq, role, content, estimate_tokens(content))
+                self.window.append(message)
+                self.window_tokens += message.tokens
+                self.store.write(INSERT_TURN, (self.session, message.seq, role, content, message.tokens, time.time()))
+            self.last_reply = response
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._compacting or self.window_tokens <= self.max_context_tokens:
+            return
+        # Resumir hasta dejar la ventana a la mitad del presupuesto, para no resumir en cada turno.
+        evicted, remaining = [], self.window_tokens
+        for message in self.window:
+            if remaining <= self.max_context_tokens // 2:
+                break
+            evicted.append(message)
+            remaining -= message.tokens
+        self._compacting = True
+        self._executor.submit(self._compact, self.summary, evicted)
+
+    def _compact(self, previous_summary, evicted):
+        try:
+            summary = self.summarize(previous_summary, evicted)
+        except Exception as e:
+            logging.error("Error al resumir la conversación: %s", e)
+            summary = None
+        if summary:
+            # El resumen del modelo empieza por los datos más antiguos: si se pasa del límite
+            # pedido en el prompt, se corta el final.
+            summary = clip_words(summary.strip(), self.summary_tokens * 4)
+        else:
+            # Alternativa sin modelo: conservar el final del texto acumulado.
+            summary = " ".join([previous_summary] + [f"{m.role}: {m.content}" for m in evicted]).strip()
+            summary = clip_words(summary, self.summary_tokens * 4, keep_end=True)
+
+        with self._lock:
+            # Los mensajes resumidos siguen al principio de la ventana: add_turn solo añade al final.
+            for _ in evicted:
+                message = self.window.popleft()
+                self.window_tokens -= message.tokens
+            self.summary = summary
+            self.upto_seq = evicted[-1].seq
+            self.store.write(UPSERT_SUMMARY, (self.session, summary, self.upto_seq))
+            self._compacting = False
+            logging.info("Conversación resumida hasta el mensaje %d (%d tokens en ventana).",
+                         self.upto_seq, self.window_tokens)
+            self._maybe_compact()
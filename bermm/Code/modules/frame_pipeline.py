@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import deque
+
+
+class LatestFrameBuffer:
+    """
+    Búfer circular que descarta los elementos más antiguos.
+
+    Con capacity=1 el consumidor siempre recibe el frame más reciente y los
+    frames que no llegó a procesar se descartan en lugar de acumularse.
+    """
+
+    def __init__(self, capacity=1):
+        self._items = deque(maxlen=capacity)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Devuelve el elemento más antiguo del búfer, o None si vence el tiempo."""
+        with self._condition:
+            if not self._items and not self._condition.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+
+class StageStats:
+    """FPS y latencia de una etapa del pipeline, acumulados entre informes."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._reset(time.perf_counter())
+
+    def _reset(self, now):
+        self.count = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.since = now
+
+    def record(self, latency):
+        with self._lock:
+            self.count += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self, reset=True):
+        """Devuelve (fps, latencia media, latencia máxima) desde el último informe."""
+        now = time.perf_counter()
+        with self._lock:
+            elapsed = now - self.since
+            fps = self.count / elapsed if elapsed > 0 else 0.0
+            average = self.total_latency / self.count if self.count else 0.0
+            result = (fps, average, self.max_latency)
+            if reset:
+                self._reset(now)
+        return result
+
+    def log(self, reset=True):
+        fps, average, maximum = self.snapshot(reset)
+        logging.info("[%s] %.1f FPS, latencia media %.1f ms, máxima %.1f ms.",
+                     self.name, fps, average * 1000, maximum * 1000)
+
+
+class FrameTimeHistogram:
+    """
+    Histograma de tiempos de frame para detectar tirones del render.
+
+    Los tiempos se agrupan en cubetas (en milisegundos) y se cuentan aparte los
+    frames que superan stall_ms, que a 60 FPS equivalen a saltarse frames.
+    """
+
+    def __init__(self, name, bounds_ms=(8.3, 16.7, 20, 25, 33.3, 50, 100), stall_ms=50.0):
+        self.name = name
+        self.bounds_ms = bounds_ms
+        self.stall_ms = stall_ms
+        self._reset()
+
+    def _reset(self):
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.frames = 0
+        self.stalls = 0
+        self.max_ms = 0.0
+
+    def record(self, frame_time):
+        milliseconds = frame_time * 1000
+        bucket = 0
+        while bucket < len(self.bounds_ms) and milliseconds > self.bounds_ms[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.frames += 1
+        self.max_ms = max(self.max_ms, milliseconds)
+        if milliseconds > self.stall_ms:
+            self.stalls += 1
+
+    def log(self, reset=True):
+        if self.frames:
+            labels = [f"<={bound:g}" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]:g}"]
+            buckets = ", ".join(f"{label} ms: {count}" for label, count in zip(labels, self.counts) if count)
+            logging.info("[%s] %d frames, máximo %.1f ms, tirones (>%g ms): %d. %s.",
+                         self.name, self.frames, self.max_ms, self.stall_ms, self.stalls, buckets)
+        if reset:
+            self._reset()
+
+
+class AdaptiveScheduler:
+    """
+    Decide qué frames procesar según el coste medido de la inferencia.
+
+    Mantiene una media móvil exponencial del tiempo de inferencia y procesa un
+    frame de cada ceil(coste / presupuesto) frames, donde el presupuesto es
+    1 / target_fps, la frecuencia a la que debe avanzar el bucle. Si la
+    inferencia se abarata (por ejemplo al procesar solo una región de
+    interés), la tasa de detección sube automáticamente.
+    """
+
+    def __init__(self, target_fps=30.0, min_interval=1, max_interval=30, smoothing=0.2):
+        self.frame_budget = 1.0 / target_fps
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.average_cost = None
+        self.interval = min_interval
+        self._since_last = 0
+
+    def due(self):
+        """Llamar una vez por frame capturado; devuelve True si este frame debe procesarse."""
+        self._since_last += 1
+        if self._since_last >= self.interval:
+            self._since_last = 0
+            return True
+        return False
+
+    def record(self, cost):
+        """Registra el tiempo de inferencia de un frame procesado y recalcula el intervalo."""
+        if self.average_cost is None:
+            self.average_cost = cost
+        else:
+            self.average_cost += self.smoothing * (cost - self.average_cost)
+        interval = -(-self.average_cost // self.frame_budget)
+        self.interval = int(min(self.max_interval, max(self.min_interval, interval)))
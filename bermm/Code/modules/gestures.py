@@ -0,0 +1,206 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from frame_pipeline import StageStats
+
+# Índices de los 21 landmarks de mediapipe Hands.
+WRIST = 0
+THUMB_MCP, THUMB_IP, THUMB_TIP = 2, 3, 4
+FINGER_PIPS = [6, 10, 14, 18]
+FINGER_TIPS = [8, 12, 16, 20]
+INDEX_TIP = 8
+MIDDLE_MCP = 9
+
+
+def hands_to_array(hands):
+    """Convierte una lista de landmarks de mano (mediapipe o arrays (21, 3)) en un array (H, 21, 3)."""
+    arrays = [hand if isinstance(hand, np.ndarray) else
+              np.array([(lm.x, lm.y, lm.z) for lm in hand.landmark], dtype=np.float32)
+              for hand in hands]
+    return np.stack(arrays) if arrays else np.empty((0, 21, 3), dtype=np.float32)
+
+
+def _palm_size(hands):
+    # Distancia muñeca-base del dedo medio: hace los umbrales independientes de la distancia a la cámara.
+    return np.linalg.norm(hands[:, MIDDLE_MCP, :2] - hands[:, WRIST, :2], axis=1) + 1e-6
+
+
+def _fingers_extended(hands):
+    """(H, 4) booleano: la punta de cada dedo está más lejos de la muñeca que su articulación PIP."""
+    wrist = hands[:, WRIST:WRIST + 1, :2]
+    tips = np.linalg.norm(hands[:, FINGER_TIPS, :2] - wrist, axis=2)
+    pips = np.linalg.norm(hands[:, FINGER_PIPS, :2] - wrist, axis=2)
+    return tips > pips
+
+
+def pinch(hands):
+    """Pulgar e índice juntos (el gesto de saludo original del avatar)."""
+    distance = np.linalg.norm(hands[:, THUMB_TIP, :2] - hands[:, INDEX_TIP, :2], axis=1)
+    return distance < 0.25 * _palm_size(hands)
+
+
+def open_palm(hands):
+    return _fingers_extended(hands).all(axis=1) & ~pinch(hands)
+
+
+def fist(hands):
+    return ~_fingers_extended(hands).any(axis=1)
+
+
+def thumbs_up(hands):
+    # En coordenadas de imagen la y crece hacia abajo: "arriba" es una y menor.
+    thumb_up = (hands[:, THUMB_TIP, 1] < hands[:, THUMB_IP, 1]) & (hands[:, THUMB_IP, 1] < hands[:, THUMB_MCP, 1])
+    return thumb_up & fist(hands)
+
+
+DEFAULT_GESTURES = {"pinch": pinch, "open_palm": open_palm, "fist": fist, "thumbs_up": thumbs_up}
+
+
+class GestureEvent:
+    __slots__ = ("name", "hand", "timestamp")
+
+    def __init__(self, name, hand, timestamp):
+        self.name = name
+        self.hand = hand
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"GestureEvent({self.name!r}, hand={self.hand!r})"
+
+
+class _Gesture:
+    __slots__ = ("name", "classifier", "on_frames", "off_frames")
+
+    def __init__(self, name, classifier, on_frames, off_frames):
+        self.name = name
+        self.classifier = classifier
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+
+
+class _GestureState:
+    __slots__ = ("hits", "misses", "active")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.active = False
+
+
+class GestureEngine:
+    """
+    Reconocimiento de gestos de mano por eventos.
+
+    Cada gesto registrado es un clasificador vectorizado que recibe los landmarks
+    de todas las manos del frame, un array (H, 21, 3), y devuelve un booleano por
+    mano. Con histéresis temporal, un gesto se activa tras on_frames frames
+    seguidos y se libera tras off_frames frames sin él, así que cada gesto emite
+    un único evento aunque dure muchos frames.
+
+    Los manejadores se ejecutan a través de dispatch(función, evento); por
+    defecto en el mismo hilo, pero AvatarModule lo usa para llevarlos al
+    task manager de Panda3D.
+    """
+
+    def __init__(self, dispatch=None, on_frames=3, off_frames=3, register_defaults=True):
+        self.dispatch = dispatch or (lambda handler, event: handler(event))
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+        self._gestures = {}
+        self._handlers = {}
+        self._states = {}
+        self.stats = StageStats("gestos")
+        self.hands_processed = 0
+        self._hands_since = time.perf_counter()
+        if register_defaults:
+            for name, classifier in DEFAULT_GESTURES.items():
+                self.register(name, classifier)
+
+    def register(self, name, classifier, on_frames=None, off_frames=None):
+        """Registra (o reemplaza) un gesto; classifier recibe (H, 21, 3) y devuelve (H,) booleano."""
+        self._gestures[name] = _Gesture(name, classifier, on_frames or self.on_frames, off_frames or self.off_frames)
+
+    def on(self, name, handler):
+        """Suscribe handler(evento) a un gesto; "*" recibe todos."""
+        self._handlers.setdefault(name, []).append(handler)
+
+    def process(self, hands, hand_keys=None, timestamp=None):
+        """
+        Procesa las manos de un frame y devuelve los eventos de gestos que empiezan en él.
+
+        :param hands: Landmarks de mediapipe por mano, o un array (H, 21, 3).
+        :param hand_keys: Identificador estable de cada mano (p. ej. "Left"/"Right");
+            por defecto, su posición en la lista.
+        """
+        start = time.perf_counter()
+        timestamp = timestamp or time.time()
+        landmarks = hands if isinstance(hands, np.ndarray) else hands_to_array(hands)
+        keys = list(hand_keys) if hand_keys is not None else list(range(len(landmarks)))
+
+        detected = set()
+        if len(landmarks):
+            for gesture in self._gestures.values():
+                for key, match in zip(keys, gesture.classifier(landmarks)):
+                    if match:
+                        detected.add((gesture.name, key))
+
+        events = []
+        for state_key in detected | set(self._states):
+            name, hand = state_key
+            gesture = self._gestures.get(name)
+            if gesture is None:
+                self._states.pop(state_key, None)
+                continue
+            state = self._states.get(state_key)
+            if state is None:
+                state = self._states[state_key] = _GestureState()
+            if state_key in detected:
+                state.hits += 1
+                state.misses = 0
+                if not state.active and state.hits >= gesture.on_frames:
+                    state.active = True
+                    events.append(GestureEvent(name, hand, timestamp))
+            else:
+                state.misses += 1
+                state.hits = 0
+                if not state.active or state.misses >= gesture.off_frames:
+                    del self._states[state_key]
+
+        self.hands_processed += len(landmarks)
+        self.stats.record(time.perf_counter() - start)
+        for event in events:
+            for handler in self._handlers.get(event.name, []) + self._handlers.get("*", []):
+                self.dispatch(handler, event)
+        return events
+
+    def log_stats(self):
+        now = time.perf_counter()
+        elapsed = now - self._hands_since
+        logging.info("[gestos] %.1f manos/s.", self.hands_processed / elapsed if elapsed > 0 else 0.0)
+        self.hands_processed = 0
+        self._hands_since = now
+        self.stats.log()
+
+
+def benchmark_gestures(hands=2, iterations=2000):
+    """Mide el rendimiento de la clasificación con todos los gestos por defecto; devuelve (frames/s, manos/s)."""
+    rng = np.random.default_rng(0)
+    frames = rng.uniform(0, 1, size=(64, hands, 21, 3)).astype(np.float32)
+    engine = GestureEngine()
+    start = time.perf_counter()
+    for i in range(iterations):
+        engine.process(frames[i % len(frames)])
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, iterations * hands / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del motor de gestos de BERMM")
+    parser.add_argument("--hands", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    frames_per_second, hands_per_second = benchmark_gestures(args.hands, args.iterations)
+    print(f"{frames_per_second:,.0f} frames/s, {hands_per_second:,.0f} manos/s")
@@ -0,0 +1,261 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+# Palabras que no cambian el comando ("abre EL navegador, POR FAVOR").
+STOPWORDS = frozenset(("el", "la", "los", "las", "lo", "un", "una", "unos", "unas", "de", "del", "al", "a", "mi",
+                       "me", "por", "favor", "puedes", "podrias", "quiero", "que", "y", "ya", "ahora", "bermm"))
+# Las palabras más cortas se comparan solo de forma exacta: con una letra de
+# diferencia, "abre" y "abra" están bien, pero "luz" y "voz" no son la misma.
+MIN_FUZZY_LENGTH = 4
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9ñ]+")
+
+
+def normalize(text):
+    """Minúsculas, sin tildes (la ñ se conserva), sin puntuación ni palabras vacías; devuelve la lista de palabras."""
+    text = unicodedata.normalize("NFD", text.lower().replace("ñ", "\0"))
+    text = "".join(char for char in text if unicodedata.category(char) != "Mn").replace("\0", "ñ")
+    return [token for token in _TOKEN_PATTERN.findall(text) if token not in STOPWORDS]
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a, b):
+    """True si a y b están a una edición: inserción, borrado, sustitución o trasposición de letras contiguas."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    return a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1]
+
+
+class Intent:
+    """
+    Comando declarado: nombre, frases que lo activan y función que lo ejecuta.
+
+    Un comando anchored solo se reconoce si una de sus frases es todo el texto
+    (salvo palabras vacías), sin correcciones y sin ser una pregunta: así
+    "apaga el equipo" lo activa, pero "mi hermano apaga el equipo cada noche"
+    o "¿cómo apago el equipo?" no.
+    """
+
+    __slots__ = ("name", "phrases", "handler", "description", "anchored")
+
+    def __init__(self, name, phrases, handler, description="", anchored=False):
+        self.name = name
+        self.phrases = tuple(phrases)
+        self.handler = handler
+        self.description = description
+        self.anchored = anchored
+
+
+class IntentMatch:
+    __slots__ = ("intent", "phrase", "start", "end", "corrections")
+
+    def __init__(self, intent, phrase, start, end, corrections):
+        self.intent = intent
+        self.phrase = phrase
+        self.start = start
+        self.end = end
+        self.corrections = corrections
+
+    def __repr__(self):
+        return f"IntentMatch({self.intent.name!r}, {self.phrase!r}, correcciones={self.corrections})"
+
+
+class IntentMatcher:
+    """
+    Reconocedor de comandos compilado a partir de un registro declarativo.
+
+    Las frases de todos los comandos se normalizan y se compilan en un único
+    autómata de Aho–Corasick sobre palabras, así que un texto se recorre una
+    sola vez sea cual sea el número de comandos. Antes de recorrerlo:
+
+    - Pre-filtro: si ninguna palabra del texto pertenece al vocabulario de los
+      comandos (ni a una letra de distancia), se descarta sin más; es el caso de
+      casi toda la charla normal y cuesta unos microsegundos.
+    - Corrección: las palabras desconocidas de al menos MIN_FUZZY_LENGTH letras
+      se sustituyen por la palabra del vocabulario a una edición de distancia
+      (índice de borrados al estilo SymSpell: solo búsquedas en diccionario),
+      para tolerar errores del reconocimiento de voz ("navegadro").
+
+    Si varias frases coinciden gana la más larga y, a igualdad, la que necesitó
+    menos correcciones. Los comandos anchored (p. ej. apagar el equipo) no
+    admiten correcciones ni coincidencias dentro de una frase más larga, ver
+    Intent. Registrar un comando invalida el autómata, que se
+    recompila en la siguiente búsqueda.
+    """
+
+    def __init__(self):
+        self.intents = {}
+        self._compiled = False
+        self._lock = threading.Lock()
+        self._vocabulary = set()
+        self._delete_index = {}
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+    def register(self, name, phrases, handler, description="", anchored=False):
+        """
+        Registra (o sustituye) un comando; phrases es una frase o una lista de frases.
+
+        :param anchored: La frase debe ser todo el texto, sin correcciones; para comandos peligrosos.
+        """
+        if isinstance(phrases, str):
+            phrases = (phrases,)
+        intent = Intent(name, phrases, handler, description, anchored)
+        with self._lock:
+            self.intents[name] = intent
+            self._compiled = False
+        return intent
+
+    def unregister(self, name):
+        with self._lock:
+            if self.intents.pop(name, None) is not None:
+                self._compiled = False
+
+    def _compile(self):
+        start = time.perf_counter()
+        goto, outputs = [{}], [[]]
+        vocabulary = set()
+        for intent in self.intents.values():
+            for phrase in intent.phrases:
+                tokens = normalize(phrase)
+                if not tokens:
+                    logging.warning("La frase '%s' del comando '%s' está vacía tras normalizarla.", phrase, intent.name)
+                    continue
+                vocabulary.update(tokens)
+                state = 0
+                for token in tokens:
+                    if token not in goto[state]:
+                        goto.append({})
+                        outputs.append([])
+                        goto[state][token] = len(goto) - 1
+                    state = goto[state][token]
+                outputs[state].append((intent, phrase, len(tokens)))
+
+        # Enlaces de fallo por anchura, como en Aho–Corasick clásico.
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for token, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and token not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(token, 0)
+                outputs[child] = outputs[child] + outputs[fail[child]]
+
+        delete_index = {}
+        for word in vocabulary:
+            if len(word) >= MIN_FUZZY_LENGTH:
+                for deleted in _deletes(word) | {word}:
+                    delete_index.setdefault(deleted, set()).add(word)
+
+        self._goto, self._fail, self._outputs = goto, fail, outputs
+        self._vocabulary, self._delete_index = vocabulary, delete_index
+        self._compiled = True
+        logging.debug("Comandos compilados: %d frases, %d estados, %d palabras en %.2f ms.",
+                      sum(len(intent.phrases) for intent in self.intents.values()), len(goto), len(vocabulary),
+                      (time.perf_counter() - start) * 1000)
+
+    def _correct(self, token):
+        """Palabra del vocabulario a una edición de token, o None si no hay una única candidata."""
+        if len(token) < MIN_FUZZY_LENGTH:
+            return None
+        candidates = set()
+        for deleted in _deletes(token) | {token}:
+            candidates.update(self._delete_index.get(deleted, ()))
+        # Compartir un borrado no basta ("xabc" y "abcy" están a dos ediciones): se confirma cada candidata.
+        candidates = {word for word in candidates if _within_one_edit(word, token)}
+        return candidates.pop() if len(candidates) == 1 else None
+
+    def match(self, text):
+        """Devuelve el IntentMatch del comando contenido en text, o None si no hay ninguno."""
+        if not self._compiled:
+            with self._lock:
+                if not self._compiled:
+                    self._compile()
+        tokens = normalize(text)
+        canonical, corrected = [], []
+        known = False
+        for token in tokens:
+            if token in self._vocabulary:
+                known = True
+                canonical.append(token)
+                corrected.append(False)
+                continue
+            replacement = self._correct(token)
+            known = known or replacement is not None
+            canonical.append(replacement or token)
+            corrected.append(replacement is not None)
+        if not known:
+            return None
+        question = "?" in text or "¿" in text
+
+        best = None
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for end, token in enumerate(canonical, 1):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for intent, phrase, length in outputs[state]:
+                corrections = sum(corrected[end - length:end])
+                if intent.anchored and (corrections or question or length != len(canonical)):
+                    continue
+                if best is None or (length, -corrections) > (best.end - best.start, -best.corrections):
+                    best = IntentMatch(intent, phrase, end - length, end, corrections)
+        return best
+
+    def dispatch(self, text):
+        """Ejecuta el comando contenido en text; devuelve el IntentMatch, o None si no había comando."""
+        found = self.match(text)
+        if found is not None:
+            if found.corrections:
+                logging.info("Comando '%s' reconocido con %d corrección(es).", found.intent.name, found.corrections)
+            found.intent.handler()
+        return found
+
+
+def benchmark_matcher(matcher, utterances, repeat=3):
+    """Mide el tiempo medio por texto (en microsegundos) y cuántos activan un comando."""
+    matcher.match("")  # Compilar fuera de la medida.
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matches = sum(matcher.match(text) is not None for text in utterances)
+        best = min(best, time.perf_counter() - start)
+    return best / len(utterances) * 1e6, matches
+
+
+if __name__ == "__main__":
+    import random
+
+    from system_control import SystemControl
+
+    logging.basicConfig(level=logging.INFO)
+    control = SystemControl()
+    chat = ["hola que tal estas hoy", "cuentame un chiste sobre programadores", "que tiempo hace en madrid",
+            "me ayudas con los deberes de matematicas", "como se dice gracias en ingles",
+            "recomiendame una pelicula de ciencia ficcion", "estoy un poco cansado la verdad"]
+    commands = ["abre el navegador por favor", "abrir navegadro", "apaga la computadora", "reinicia el ordenador",
+                "puedes abrir el bloc de notas"]
+    random.seed(0)
+    utterances = [random.choice(chat) for _ in range(9000)] + [random.choice(commands) for _ in range(1000)]
+    random.shuffle(utterances)
+    per_text, matches = benchmark_matcher(control.matcher, utterances)
+    print(f"{len(utterances)} textos: {per_text:.1f} µs por texto, {matches} comandos reconocidos.")
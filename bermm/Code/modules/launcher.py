@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import platform
+import shutil
+import threading
+import time
+
+from background_loop import BackgroundLoop
+
+try:
+    import winreg  # Registro de Windows: App Paths de los programas instalados
+except ImportError:
+    winreg = None
+
+APP_PATHS_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths"
+
+
+class ProgramCache:
+    """
+    Rutas de los ejecutables, resueltas con shutil.which una sola vez.
+
+    En Windows, si el programa no está en PATH se busca en App Paths del
+    registro, que es donde se registran Chrome, Edge y la mayoría de
+    aplicaciones (lo mismo que consulta "start chrome"). La caché se vacía
+    cuando cambia PATH (o PATHEXT en Windows). Los programas no encontrados
+    también se recuerdan, y una ruta cacheada que ya no existe (programa
+    desinstalado) se vuelve a buscar.
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self._environment = None
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def which(self, program):
+        environment = (os.environ.get("PATH", ""), os.environ.get("PATHEXT", ""))
+        with self._lock:
+            self.lookups += 1
+            if environment != self._environment:
+                self._paths.clear()
+                self._environment = environment
+            if program in self._paths:
+                path = self._paths[program]
+                if path is None or os.path.isfile(path):
+                    self.hits += 1
+                    return path
+        path = shutil.which(program, path=environment[0]) or self._app_path(program)
+        with self._lock:
+            if environment == self._environment:
+                self._paths[program] = path
+        return path
+
+    @staticmethod
+    def _app_path(program):
+        if winreg is None:
+            return None
+        name = program if os.path.splitext(program)[1] else program + ".exe"
+        for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+            try:
+                with winreg.OpenKey(root, APP_PATHS_KEY + "\\" + name) as key:
+                    path = os.path.expandvars(winreg.QueryValue(key, None).strip('"'))
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                return path
+        return None
+
+
+class LaunchResult:
+    """Resultado de un proceso lanzado: código de salida y duración."""
+
+    __slots__ = ("args", "pid", "returncode", "elapsed")
+
+    def __init__(self, args, pid, returncode, elapsed):
+        self.args = args
+        self.pid = pid
+        self.returncode = returncode
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+class ProcessLauncher:
+    """
+    Lanza programas sin shell y sin bloquear a quien llama.
+
+    Los procesos se crean con asyncio.create_subprocess_exec en un
+    BackgroundLoop propio, así que launch() vuelve al instante con un
+    concurrent.futures.Future que se resuelve con un
+    LaunchResult cuando el proceso termina (alaunch() hace lo mismo desde
+    cualquier bucle asyncio). Los procesos vivos quedan en children hasta que
+    terminan; terminate_all() los cierra.
+    """
+
+    def __init__(self, programs=None):
+        self.programs = programs or ProgramCache()
+        self.children = {}
+        self.stats = {"launched": 0, "failed": 0, "not_found": 0}
+        self.runtime = BackgroundLoop("bermm-launcher")
+
+    def which(self, program):
+        return self.programs.which(program)
+
+    def launch(self, program, *args, on_start=None):
+        """
+        Lanza program (nombre en PATH o ruta) con sus argumentos; devuelve un Future con el LaunchResult.
+
+        :param on_start: on_start(pid) se llama (en el hilo del launcher) en cuanto el proceso arranca,
+            sin esperar a que termine.
+        """
+        return self.runtime.submit(self._run(program, args, on_start))
+
+    async def alaunch(self, program, *args, on_start=None):
+        return await self.runtime.run_async(self._run(program, args, on_start))
+
+    def open_target(self, target):
+        """Abre una URL o un archivo con la aplicación predeterminada del sistema."""
+        system = platform.system()
+        if system == "Windows":
+            return self.runtime.submit(self._start_file(target))
+        return self.launch("open" if system == "Darwin" else "xdg-open", target)
+
+    async def _start_file(self, target):
+        # os.startfile no usa shell ni espera a la aplicación: no hay proceso hijo que seguir.
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.startfile, target)
+        except OSError as e:
+            self.stats["failed"] += 1
+            logging.error("No se pudo abrir %s: %s", target, e)
+            return LaunchResult(("startfile", target), None, None, 0.0)
+        return LaunchResult(("startfile", target), None, 0, 0.0)
+
+    async def _run(self, program, args, on_start=None):
+        executable = program if os.path.isabs(program) else self.which(program)
+        if executable is None:
+            self.stats["not_found"] += 1
+            logging.error("Programa no encontrado en PATH: %s", program)
+            return LaunchResult((program,) + args, None, None, 0.0)
+        started = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                executable, *args, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL)
+        except OSError as e:
+            self.stats["failed"] += 1
+            logging.error("No se pudo lanzar %s: %s", program, e)
+            return LaunchResult((program,) + args, None, None, 0.0)
+        self.stats["launched"] += 1
+        self.children[process.pid] = ((program,) + args, process)
+        logging.info("Lanzado %s (pid %d).", program, process.pid)
+        if on_start is not None:
+            try:
+                on_start(process.pid)
+            except Exception as e:
+                logging.error("Error en on_start de %s: %s", program, e)
+        try:
+            returncode = await process.wait()
+        finally:
+            self.children.pop(process.pid, None)
+        result = LaunchResult((program,) + args, process.pid, returncode, time.perf_counter() - started)
+        if not result.ok:
+            self.stats["failed"] += 1
+            logging.warning("%s terminó con código %d tras %.1f s.", program, returncode, result.elapsed)
+        return result
+
+    async def _terminate_all(self, timeout):
+        processes = [process for _, process in self.children.values()]
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+        if processes:
+            await asyncio.wait([asyncio.ensure_future(process.wait()) for process in processes], timeout=timeout)
+
+    def terminate_all(self, timeout=5.0):
+        """Pide a todos los procesos lanzados que terminen y espera como mucho timeout segundos."""
+        self.runtime.run(self._terminate_all(timeout))
+
+
+_launcher = None
+_launcher_lock = threading.Lock()
+
+
+def get_process_launcher():
+    """Devuelve el ProcessLauncher compartido del proceso, creándolo en el primer uso."""
+    global _launcher
+    if _launcher is None:
+        with _launcher_lock:
+            if _launcher is None:
+                _launcher = ProcessLauncher()
+    return _launcher
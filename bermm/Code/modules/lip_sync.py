@@ -0,0 +1,81 @@
+import re
+import threading
+import time
+
+# Apertura de la boca (0 cerrada, 1 abierta del todo) por letra: una aproximación
+# barata a los visemas sin analizar fonemas.
+VISEME_OPENNESS = {"a": 1.0, "á": 1.0, "e": 0.7, "é": 0.7, "o": 0.8, "ó": 0.8,
+                   "i": 0.45, "í": 0.45, "u": 0.4, "ú": 0.4, "ü": 0.4,
+                   "m": 0.0, "b": 0.0, "p": 0.0, "f": 0.15, "v": 0.15}
+CONSONANT_OPENNESS = 0.25
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def word_visemes(word):
+    """Aperturas de la boca para cada letra de una palabra."""
+    return [VISEME_OPENNESS.get(letter, CONSONANT_OPENNESS) for letter in word.lower() if letter.isalpha()]
+
+
+class LipSync:
+    """
+    Apertura de la boca a lo largo del tiempo a partir de la voz.
+
+    El hilo de voz llama a on_word() con cada evento started-word de pyttsx3 y la
+    tarea de render consulta openness() en cada frame, sin bloquearse nunca. Si
+    el motor no emite eventos por palabra, start() programa todas las palabras
+    del texto con la duración estimada a partir de la velocidad de habla.
+    """
+
+    def __init__(self, rate=150, chars_per_word=5.0):
+        """
+        :param rate: Velocidad de habla del motor en palabras por minuto.
+        :param chars_per_word: Longitud media de palabra usada para estimar duraciones.
+        """
+        self.seconds_per_char = 60.0 / rate / chars_per_word
+        self._lock = threading.Lock()
+        self._keys = []
+
+    def _word_keys(self, word, start):
+        keys = []
+        for visemes in word_visemes(word):
+            keys.append((start, visemes))
+            start += self.seconds_per_char
+        keys.append((start, 0.0))
+        return keys, start
+
+    def start(self, text, now=None):
+        """Programa todo el texto desde ahora; los eventos por palabra lo corrigen si llegan."""
+        now = time.monotonic() if now is None else now
+        keys = []
+        for word in WORD_PATTERN.findall(text):
+            word_keys, now = self._word_keys(word, now)
+            keys.extend(word_keys)
+            now += self.seconds_per_char
+        with self._lock:
+            self._keys = keys
+
+    def on_word(self, word, now=None):
+        """Resincroniza con el motor: la palabra empieza ahora y sustituye a lo programado."""
+        now = time.monotonic() if now is None else now
+        keys, _ = self._word_keys(word, now)
+        with self._lock:
+            self._keys = keys
+
+    def stop(self):
+        with self._lock:
+            self._keys = []
+
+    def openness(self, now=None):
+        """Apertura de la boca interpolada en el instante now."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            keys = self._keys
+            # Descartar los fotogramas clave ya pasados (salvo el último anterior a now).
+            while len(keys) > 1 and keys[1][0] <= now:
+                keys.pop(0)
+            if not keys or now < keys[0][0]:
+                return 0.0
+            if len(keys) == 1:
+                return keys[0][1] if now - keys[0][0] < self.seconds_per_char else 0.0
+            (t0, v0), (t1, v1) = keys[0], keys[1]
+            return v0 + (v1 - v0) * (now - t0) / (t1 - t0)
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import queue
+import random
+import time
+import httpx
+from background_loop import BackgroundLoop
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Error definitivo al consultar el modelo de lenguaje."""
+
+
+class _RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Limitador de peticiones por cubeta de fichas: rate fichas/s con ráfagas de hasta capacity."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, deadline=None):
+        """
+        Espera a tener una ficha y la consume.
+
+        :param deadline: Instante (time.monotonic()) límite; si la ficha no llegaría a
+            tiempo, vuelve enseguida sin consumirla.
+        :return: True si se obtuvo la ficha, False si se habría superado el plazo.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+                if deadline is not None and now + wait >= deadline:
+                    return False
+                await asyncio.sleep(wait)
+
+
+class LLMClient:
+    """
+    Cliente asíncrono para la API de chat completions.
+
+    - Pool de conexiones HTTP keep-alive compartido (httpx.AsyncClient).
+    - Plazo máximo (deadline) por petición, incluidos los reintentos.
+    - Reintentos con espera exponencial y jitter ante timeouts, errores de red,
+      429 y 5xx (respetando Retry-After).
+    - Coalescencia single-flight: prompts idénticos en curso comparten una sola petición.
+    - Limitador de tasa por cubeta de fichas.
+
+    Corre en su propio BackgroundLoop: complete() y stream() se usan desde código
+    síncrono y acomplete() desde cualquier bucle asyncio.
+    """
+
+    def __init__(self, api_key, api_base="https://api.openai.com/v1", model="gpt-3.5-turbo",
+                 timeout=30.0, connect_timeout=5.0, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 rate=3.0, burst=5, max_connections=10, transport=None):
+        """
+        :param transport: Transporte de httpx alternativo (p. ej. httpx.MockTransport en las pruebas).
+        """
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate = rate
+        self.burst = burst
+        self.max_connections = max_connections
+        self.transport = transport
+        self.stats = {"requests": 0, "retries": 0, "coalesced": 0, "failures": 0}
+
+        self.runtime = BackgroundLoop("bermm-llm")
+        self._inflight = {}
+        self.runtime.run(self._setup())
+
+    async def _setup(self):
+        # El cliente y el limitador deben crearse dentro del bucle que los usará.
+        self._client = httpx.AsyncClient(
+            base_url=self.api_base,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            transport=self.transport,
+        )
+        self._bucket = TokenBucket(self.rate, self.burst)
+
+    def _payload(self, messages, stream=False):
+        payload = {"model": self.model, "messages": messages}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def complete(self, messages, timeout=None):
+        """Devuelve el texto de la respuesta; bloquea como máximo timeout segundos."""
+        timeout = self.timeout if timeout is None else timeout
+        return self.runtime.run(self._coalesced(self._payload(messages), time.monotonic() + timeout))
+
+    async def acomplete(self, messages, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        return await self.runtime.run_async(
+            self._coalesced(self._payload(messages), time.monotonic() + timeout))
+
+    async def _coalesced(self, payload, deadline):
+        key = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_with_retries(payload, deadline))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: si un llamador se cancela o agota su plazo, los demás siguen esperando la misma
+        # petición. Cada llamador espera como mucho hasta su propio deadline, no el del primero.
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(deadline - time.monotonic(), 0.0))
+        except asyncio.TimeoutError:
+            self.stats["failures"] += 1
+            raise LLMError("Tiempo de espera agotado para la petición al modelo.") from None
+
+    async def _request_with_retries(self, payload, deadline):
+        async def send(remaining):
+            response = await asyncio.wait_for(self._client.post("/chat/completions", json=payload), remaining)
+            self._check_status(response)
+            return response.json()["choices"][0]["message"]["content"]
+
+        return await self._with_retries(send, deadline)
+
+    async def _with_retries(self, send, deadline):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            acquired = False
+            if remaining > 0:
+                # wait_for también acota la espera al cerrojo si otra petición está esperando ficha.
+                try:
+                    acquired = await asyncio.wait_for(self._bucket.acquire(deadline), remaining)
+                except asyncio.TimeoutError:
+                    acquired = False
+            remaining = deadline - time.monotonic()
+            if not acquired or remaining <= 0:
+                self.stats["failures"] += 1
+                raise LLMError("Tiempo de espera agotado para la petición al modelo.")
+            self.stats["requests"] += 1
+            try:
+                return await send(remaining)
+            except (_RetryableError, httpx.TransportError, asyncio.TimeoutError) as e:
+                retry_after = getattr(e, "retry_after", None)
+                delay = retry_after if retry_after is not None else \
+                    min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self.stats["failures"] += 1
+                    raise LLMError(f"La petición al modelo falló tras {attempt + 1} intentos: {e!r}") from e
+                attempt += 1
+                self.stats["retries"] += 1
+                logging.warning("Reintentando petición al modelo en %.2fs (intento %d): %r", delay, attempt, e)
+                await asyncio.sleep(delay)
+            except httpx.HTTPStatusError as e:
+                self.stats["failures"] += 1
+                raise LLMError(f"El modelo respondió con error {e.response.status_code}.") from e
+
+    @staticmethod
+    def _check_status(response):
+        if response.status_code in RETRY_STATUS:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            raise _RetryableError(f"HTTP {response.status_code}", retry_after)
+        response.raise_for_status()
+
+    def stream(self, messages, timeout=None):
+        """
+        Genera los tokens de la respuesta a medida que llegan (Server-Sent Events).
+
+        Solo se reintenta mientras no se haya recibido ningún token; timeout limita
+        el tiempo hasta el primer token y también el silencio entre tokens.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        tokens = queue.Queue()
+        done = object()
+
+        async def produce():
+            try:
+                await self._stream_into(self._payload(messages, stream=True), time.monotonic() + timeout,
+                                        timeout, tokens.put)
+                tokens.put(done)
+            except Exception as e:
+                tokens.put(e)
+
+        future = self.runtime.submit(produce())
+        try:
+            while True:
+                item = tokens.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item if isinstance(item, LLMError) else LLMError(repr(item))
+                yield item
+        finally:
+            future.cancel()
+
+    async def _stream_into(self, payload, deadline, idle_timeout, emit):
+        started = False
+
+        async def send(remaining):
+            try:
+                await receive(remaining)
+            except (_RetryableError, httpx.TransportError, asyncio.TimeoutError) as e:
+                if started:
+                    # Reintentar repetiría los tokens ya emitidos.
+                    self.stats["failures"] += 1
+                    raise LLMError(f"El streaming del modelo se interrumpió: {e!r}") from e
+                raise
+
+        async def receive(remaining):
+            nonlocal started
+            request = self._client.build_request("POST", "/chat/completions", json=payload)
+            # La espera de las cabeceras también cuenta para el plazo.
+            response = await asyncio.wait_for(self._client.send(request, stream=True), remaining)
+            try:
+                self._check_status(response)
+                lines = response.aiter_lines()
+                wait = max(deadline - time.monotonic(), 0.0)
+                while True:
+                    try:
+                        line = await asyncio.wait_for(lines.__anext__(), wait)
+                    except StopAsyncIteration:
+                        return
+                    wait = idle_timeout
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    token = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if token:
+                        started = True
+                        emit(token)
+            finally:
+                await response.aclose()
+
+        await self._with_retries(send, deadline)
+
+    def close(self):
+        self.runtime.run(self._client.aclose())
+        self.runtime.stop()
@@ -1,46 +1,96 @@
+import argparse
+import asyncio
 import logging
 import os
-from ai_chatbot import AIChatbot
-from vision import VisionModule
-from avatar import AvatarModule
-from voice import VoiceAssistant
-from system_control import SystemControl
+import time
+from registry import ModuleRegistry
+from pipeline import ConversationPipeline
+from recognizers import BACKEND_NAMES
 
 # Configuración del logging para depuración
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Bermm:
-    def __init__(self):
+    # Módulos usados por el chat de texto; se precargan en segundo plano al arrancar.
+    DEFAULT_WARM_MODULES = ("chatbot", "system_control")
+
+    def __init__(self, warm=DEFAULT_WARM_MODULES, speech_options=None):
+        """
+        :param speech_options: Opciones del reconocimiento de voz (speech_backend, vosk_model,
+            wake_word); el listener compartido se crea con ellas al cargar el módulo de voz.
+        """
         logging.info("Iniciando BERMM...")
-        
-        # Inicializar módulos
-        self.chatbot = AIChatbot()
-        self.vision = VisionModule(camera_index=0, mode="detection", display_window=False)
-        self.avatar = AvatarModule(camera_enabled=False)
-        self.voice = VoiceAssistant()
-        self.system_control = SystemControl()
 
-        logging.info("Todos los módulos de BERMM han sido cargados.")
+        # Registrar módulos; cada uno se construye en su primer uso.
+        self.modules = ModuleRegistry()
+        self.modules.register("chatbot", "ai_chatbot", "AIChatbot")
+        self.modules.register("vision", "vision", "VisionModule",
+                              camera_index=0, mode="detection", display_window=False)
+        self.modules.register("avatar", "avatar", "AvatarModule", camera_enabled=False)
+        self.modules.register("voice", "voice", "VoiceAssistant", **(speech_options or {}))
+        self.modules.register("system_control", "system_control", "SystemControl")
+
+        if warm:
+            self.modules.warm(warm)
+
+        logging.info("Módulos de BERMM registrados; se cargarán bajo demanda.")
+
+    @property
+    def chatbot(self):
+        return self.modules.get("chatbot")
+
+    @property
+    def vision(self):
+        return self.modules.get("vision")
+
+    @property
+    def avatar(self):
+        return self.modules.get("avatar")
+
+    @property
+    def voice(self):
+        return self.modules.get("voice")
+
+    @property
+    def system_control(self):
+        return self.modules.get("system_control")
 
     def start(self):
         """Método para iniciar el sistema y habilitar las interacciones."""
         logging.info("BERMM está ahora en funcionamiento.")
-        while True:
-            user_input = input("Tú: ")
-            if user_input.lower() in ["salir", "adiós"]:
-                logging.info("Cerrando BERMM...")
-                break
-
-            # Pasar el mensaje al chatbot
-            response = self.chatbot.get_response(user_input)
-            print(f"BERMM: {response}")
+        # Entrada, chatbot, voz y comandos corren como etapas concurrentes.
+        asyncio.run(ConversationPipeline(self).run())
 
-            # Activar el avatar si está habilitado
-            self.avatar.speak(response)
-
-            # Manejo de comandos del sistema
-            self.system_control.execute_command(user_input)
+    def profile_startup(self):
+        """Carga todos los módulos de forma síncrona y devuelve el informe de tiempos de arranque."""
+        for name in ("chatbot", "vision", "avatar", "voice", "system_control"):
+            try:
+                self.modules.get(name)
+            except Exception as e:
+                logging.error("No se pudo cargar el módulo '%s': %s", name, e)
+        return self.modules.startup_report()
 
 if __name__ == "__main__":
-    bermm = Bermm()
-    bermm.start()
+    parser = argparse.ArgumentParser(description="BERMM")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Muestra el tiempo de importación e inicialización de cada módulo y termina.")
+    parser.add_argument("--speech-backend", choices=BACKEND_NAMES, default="google",
+                        help="Reconocedor de voz: google (en la nube) o vosk (local, en streaming).")
+    parser.add_argument("--vosk-model", help="Carpeta del modelo de Vosk (reconocedor y palabra de activación).")
+    parser.add_argument("--wake-word", action="append",
+                        help="Palabra de activación; se puede repetir. Sin ella se escucha siempre.")
+    args = parser.parse_args()
+    if args.speech_backend == "vosk" and not args.vosk_model:
+        parser.error("--speech-backend vosk necesita --vosk-model.")
+    # El listener (y el modelo de Vosk) no se construye aquí, sino con el módulo de voz en su primer uso.
+    speech_options = {"speech_backend": args.speech_backend, "vosk_model": args.vosk_model,
+                      "wake_word": args.wake_word}
+
+    if args.profile_startup:
+        start = time.perf_counter()
+        bermm = Bermm(warm=(), speech_options=speech_options)
+        print(f"Arranque de BERMM (sin módulos cargados): {time.perf_counter() - start:.3f}s")
+        print(bermm.profile_startup())
+    else:
+        bermm = Bermm(speech_options=speech_options)
+        bermm.start()
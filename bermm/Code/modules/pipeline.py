@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from speech_service import get_speech_service, iter_sentences
+
+
+class Turn:
+    """Un turno de conversación que recorre las etapas del pipeline."""
+
+    def __init__(self, turn_id, user_input):
+        self.id = turn_id
+        self.user_input = user_input
+        self.response = None
+        self.created = time.perf_counter()
+        self.timings = {}
+        self.speech_started = None
+        self.last_utterance = None
+        # Etapas finales (voz y comando) que faltan por completar este turno.
+        self.pending = 2
+
+
+class ConversationPipeline:
+    """
+    Pipeline asíncrono de BERMM.
+
+    Entrada, chatbot, voz y comandos son etapas independientes conectadas por
+    colas, de modo que se puede aceptar la siguiente entrada y ejecutar un
+    comando mientras la respuesta anterior todavía se está pronunciando.
+    Cada etapa bloqueante corre siempre en su propio hilo dedicado.
+
+    Con stream=True la respuesta del chatbot se imprime token a token y cada
+    frase completa pasa a la etapa de voz en cuanto se cierra.
+    """
+
+    STAGES = ("input", "chatbot", "speech", "command")
+    EXIT_WORDS = ("salir", "adiós")
+
+    def __init__(self, bermm, queue_size=8, input_func=input, output_func=print, stream=True):
+        self.bermm = bermm
+        self.stream = stream
+        self.queue_size = queue_size
+        self.input_func = input_func
+        self.output_func = output_func
+        self.executors = {stage: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"bermm-{stage}")
+                          for stage in self.STAGES}
+        self.completed_turns = deque(maxlen=100)
+
+    async def _run_stage(self, stage, func, *args):
+        """Ejecuta una llamada bloqueante en el hilo de la etapa y devuelve (resultado, duración)."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result = await loop.run_in_executor(self.executors[stage], func, *args)
+        return result, time.perf_counter() - start
+
+    async def run(self):
+        """Arranca todas las etapas y espera a que la entrada termine y las colas se vacíen."""
+        self.chat_queue = asyncio.Queue(self.queue_size)
+        self.speech_queue = asyncio.Queue(self.queue_size)
+        self.command_queue = asyncio.Queue(self.queue_size)
+
+        workers = [
+            asyncio.create_task(self._chatbot_stage()),
+            asyncio.create_task(self._speech_stage()),
+            asyncio.create_task(self._command_stage()),
+        ]
+        try:
+            await self._input_stage()
+            await asyncio.gather(*workers)
+        finally:
+            for executor in self.executors.values():
+                executor.shutdown(wait=False)
+
+    async def _input_stage(self):
+        turn_id = 0
+        while True:
+            try:
+                user_input, _ = await self._run_stage("input", self.input_func, "Tú: ")
+            except EOFError:
+                user_input = "salir"
+            if user_input.lower() in self.EXIT_WORDS:
+                logging.info("Cerrando BERMM...")
+                break
+            turn_id += 1
+            turn = Turn(turn_id, user_input)
+            # El comando no depende de la respuesta, así que se despacha en paralelo.
+            await self.chat_queue.put(turn)
+            await self.command_queue.put(turn)
+
+        await self.chat_queue.put(None)
+        await self.command_queue.put(None)
+
+    async def _chatbot_stage(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            turn = await self.chat_queue.get()
+            if turn is None:
+                await self.speech_queue.put(None)
+                break
+            try:
+                if self.stream:
+                    _, turn.timings["chatbot"] = await self._run_stage("chatbot", self._stream_turn, turn, loop)
+                else:
+                    turn.response, turn.timings["chatbot"] = await self._run_stage(
+                        "chatbot", self.bermm.chatbot.get_response, turn.user_input)
+                    if turn.response:
+                        self.output_func(f"BERMM: {turn.response}")
+                        await self.speech_queue.put((turn, turn.response))
+            except Exception as e:
+                logging.error("Error en la etapa del chatbot (turno %d): %s", turn.id, e)
+            # Marca de fin de turno para la etapa de voz.
+            await self.speech_queue.put((turn, None))
+
+    def _stream_turn(self, turn, loop):
+        """Corre en el hilo del chatbot: imprime los tokens y envía cada frase completa a la etapa de voz."""
+        start = time.perf_counter()
+        parts = []
+
+        def tokens():
+            for token in self.bermm.chatbot.get_response_stream(turn.user_input):
+                if not parts:
+                    turn.timings["first_token"] = time.perf_counter() - start
+                    self.output_func("BERMM: ", end="", flush=True)
+                parts.append(token)
+                self.output_func(token, end="", flush=True)
+                yield token
+
+        for sentence in iter_sentences(tokens()):
+            asyncio.run_coroutine_threadsafe(self.speech_queue.put((turn, sentence)), loop).result()
+        if parts:
+            self.output_func("")
+        turn.response = "".join(parts)
+
+    async def _speech_stage(self):
+        while True:
+            item = await self.speech_queue.get()
+            if item is None:
+                break
+            turn, sentence = item
+            try:
+                if sentence is not None:
+                    # speak() solo encola en el servicio de voz, así que las frases se
+                    # encadenan sin huecos mientras el chatbot sigue generando.
+                    if turn.speech_started is None:
+                        turn.speech_started = time.perf_counter()
+                    turn.last_utterance, _ = await self._run_stage("speech", self._speak, sentence)
+                    continue
+                # Fin de turno: esperar a que termine de sonar para medir y conservar el orden.
+                if turn.last_utterance is not None:
+                    await self._run_stage("speech", turn.last_utterance.wait)
+                    turn.timings["speech"] = time.perf_counter() - turn.speech_started
+            except Exception as e:
+                logging.error("Error en la etapa de voz (turno %d): %s", turn.id, e)
+                if sentence is not None:
+                    continue
+            self._finish(turn)
+
+    def _speak(self, sentence):
+        """
+        Encola una frase en el servicio de voz compartido.
+
+        El avatar solo recibe la frase (para el lip-sync) si ya está cargado: pedirlo
+        aquí construiría la ventana de Panda3D en el hilo de voz de una sesión de texto.
+        """
+        if self.bermm.modules.is_loaded("avatar"):
+            return self.bermm.avatar.speak(sentence)
+        return get_speech_service().speak(sentence)
+
+    async def _command_stage(self):
+        while True:
+            turn = await self.command_queue.get()
+            if turn is None:
+                break
+            try:
+                _, turn.timings["command"] = await self._run_stage(
+                    "command", self.bermm.system_control.execute_command, turn.user_input)
+            except Exception as e:
+                logging.error("Error en la etapa de comandos (turno %d): %s", turn.id, e)
+            self._finish(turn)
+
+    def _finish(self, turn):
+        """Marca una etapa final como completada y registra el desglose de latencias del turno."""
+        turn.pending -= 1
+        if turn.pending:
+            return
+        turn.timings["total"] = time.perf_counter() - turn.created
+        self.completed_turns.append(turn)
+        logging.info("Turno %d — primer token: %.3fs | chatbot: %.3fs | voz: %.3fs | comando: %.3fs | total: %.3fs",
+                     turn.id,
+                     turn.timings.get("first_token", turn.timings.get("chatbot", 0.0)),
+                     turn.timings.get("chatbot", 0.0),
+                     turn.timings.get("speech", 0.0),
+                     turn.timings.get("command", 0.0),
+                     turn.timings["total"])
@@ -0,0 +1,249 @@
+import json
+import logging
+import re
+import threading
+import time
+
+try:
+    import vosk  # Reconocimiento local en streaming, sin conexión (opcional)
+except ImportError:
+    vosk = None
+
+DEFAULT_WAKE_WORDS = ("bermm", "berm")
+
+_vosk_models = {}
+_vosk_models_lock = threading.Lock()
+
+
+def load_vosk_model(model_path):
+    """Carga un modelo de Vosk una sola vez por ruta (el detector y el reconocedor pueden compartirlo)."""
+    if vosk is None:
+        raise ImportError("vosk no está instalado.")
+    with _vosk_models_lock:
+        model = _vosk_models.get(model_path)
+        if model is None:
+            start = time.perf_counter()
+            model = _vosk_models[model_path] = vosk.Model(model_path)
+            logging.info("Modelo de Vosk %s cargado en %.2f s.", model_path, time.perf_counter() - start)
+        return model
+
+
+class RecognizerMetrics:
+    """Latencia y factor de tiempo real (tiempo de proceso / duración del audio) de un reconocedor."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.utterances = 0
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, audio_seconds, processing_seconds, latency):
+        """
+        :param audio_seconds: Duración del audio reconocido.
+        :param processing_seconds: Tiempo de CPU/red dedicado a reconocerlo.
+        :param latency: Segundos desde el final de la locución hasta el texto final.
+        """
+        with self._lock:
+            self.utterances += 1
+            self.audio_seconds += audio_seconds
+            self.processing_seconds += processing_seconds
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def real_time_factor(self):
+        return self.processing_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "utterances": self.utterances,
+                "audio_seconds": self.audio_seconds,
+                "real_time_factor": self.real_time_factor,
+                "average_latency": self.total_latency / self.utterances if self.utterances else 0.0,
+                "max_latency": self.max_latency,
+            }
+
+    def log(self):
+        stats = self.snapshot()
+        logging.info("[%s] %d locuciones, %.1f s de audio, RTF %.2f, latencia media %.0f ms, máxima %.0f ms.",
+                     self.name, stats["utterances"], stats["audio_seconds"], stats["real_time_factor"],
+                     stats["average_latency"] * 1000, stats["max_latency"] * 1000)
+
+
+class RecognizerBackend:
+    """
+    Interfaz de los reconocedores de voz.
+
+    Los backends completos implementan recognize(audio). Los de streaming
+    (streaming = True) implementan además start() / accept(pcm) / finish():
+    accept recibe PCM de 16 bits mono a sample_rate mientras el usuario habla
+    y devuelve la hipótesis parcial acumulada; finish devuelve el texto final.
+    """
+
+    name = "base"
+    streaming = False
+    sample_rate = 16000
+
+    def __init__(self, name=None):
+        if name:
+            self.name = name
+        self.metrics = RecognizerMetrics(self.name)
+
+    def recognize(self, audio):
+        """Reconoce un sr.AudioData completo; devuelve el texto o None si no se entendió."""
+        raise NotImplementedError
+
+    def start(self):
+        raise NotImplementedError(f"El backend {self.name} no admite streaming.")
+
+    def accept(self, pcm):
+        raise NotImplementedError(f"El backend {self.name} no admite streaming.")
+
+    def finish(self):
+        raise NotImplementedError(f"El backend {self.name} no admite streaming.")
+
+
+class GoogleBackend(RecognizerBackend):
+    """Reconocimiento en la nube de Google (el de siempre): locución completa, requiere conexión."""
+
+    name = "google"
+
+    def __init__(self, language="es-ES", recognizer=None):
+        super().__init__()
+        self.language = language
+        if recognizer is None:
+            # Import diferido: main.py importa este módulo (BACKEND_NAMES) al arrancar.
+            import speech_recognition as sr
+            recognizer = sr.Recognizer()
+        self.recognizer = recognizer
+
+    def recognize(self, audio):
+        import speech_recognition as sr
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return None
+
+
+class VoskBackend(RecognizerBackend):
+    """Reconocimiento local con Vosk en CPU; emite hipótesis parciales mientras se habla."""
+
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path, sample_rate=16000, grammar=None, name=None):
+        """
+        :param model_path: Carpeta de un modelo de Vosk (p. ej. vosk-model-small-es-0.42).
+        :param grammar: Lista de frases permitidas; restringe el decodificador y lo abarata.
+        """
+        super().__init__(name)
+        self.model = load_vosk_model(model_path)
+        self.sample_rate = sample_rate
+        self.grammar = json.dumps(list(grammar), ensure_ascii=False) if grammar else None
+        self._recognizer = None
+        self._final_parts = []
+
+    def start(self):
+        arguments = (self.model, self.sample_rate) + ((self.grammar,) if self.grammar else ())
+        self._recognizer = vosk.KaldiRecognizer(*arguments)
+        self._final_parts = []
+
+    def accept(self, pcm):
+        if self._recognizer.AcceptWaveform(pcm):
+            # Vosk cierra un tramo en cada pausa interna: se acumula y se sigue.
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._final_parts.append(text)
+            return " ".join(self._final_parts)
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(self._final_parts + ([partial] if partial else []))
+
+    def finish(self):
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        parts = self._final_parts + ([text] if text else [])
+        self._recognizer = None
+        self._final_parts = []
+        return " ".join(parts) or None
+
+    def recognize(self, audio):
+        self.start()
+        self.accept(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        return self.finish()
+
+
+BACKEND_NAMES = ("google", "vosk")
+
+
+def make_backend(name, language="es-ES", recognizer=None, model_path=None):
+    """
+    Crea un backend por su nombre (para la línea de comandos y la configuración).
+
+    :param name: "google" o "vosk".
+    :param model_path: Carpeta del modelo de Vosk; obligatoria con "vosk".
+    """
+    if name == "google":
+        return GoogleBackend(language, recognizer)
+    if name == "vosk":
+        if not model_path:
+            raise ValueError("El reconocedor Vosk necesita la ruta de un modelo (vosk_model).")
+        return VoskBackend(model_path)
+    raise ValueError(f"Reconocedor de voz no reconocido: {name}. Usa uno de {', '.join(BACKEND_NAMES)}.")
+
+
+class WakeWordGate:
+    """
+    Palabra de activación delante del reconocedor principal.
+
+    Con un modelo de Vosk, el detector decodifica con una gramática que solo
+    contiene las palabras de activación, mucho más barata que el reconocimiento
+    completo, y el reconocedor principal solo recibe audio durante
+    window_seconds tras oír la palabra. Sin Vosk, la comprobación se hace sobre
+    el texto ya reconocido (filtra comandos, pero no ahorra reconocimiento).
+    """
+
+    def __init__(self, wake_words=DEFAULT_WAKE_WORDS, model_path=None, window_seconds=8.0, sample_rate=16000):
+        self.wake_words = tuple(word.lower() for word in wake_words)
+        self.window_seconds = window_seconds
+        self.backend = None
+        if model_path and vosk is not None:
+            self.backend = VoskBackend(model_path, sample_rate, grammar=list(self.wake_words) + ["[unk]"],
+                                       name="activación")
+        self._pattern = re.compile(r"\b(" + "|".join(map(re.escape, self.wake_words)) + r")\b[,.]?\s*")
+        self._awake_until = 0.0
+
+    @property
+    def awake(self):
+        return time.monotonic() < self._awake_until
+
+    def wake(self):
+        """Abre (o prolonga) la ventana en la que el reconocedor principal escucha."""
+        self._awake_until = time.monotonic() + self.window_seconds
+
+    def heard(self, text):
+        return bool(text) and self._pattern.search(text.lower()) is not None
+
+    def strip(self, text):
+        """Quita la palabra de activación del texto reconocido."""
+        return self._pattern.sub("", text.lower()).strip()
+
+    def start(self):
+        if self.backend is not None:
+            self.backend.start()
+
+    def accept(self, pcm):
+        """Devuelve True en cuanto la palabra de activación aparece en el audio de la locución."""
+        return self.backend is not None and self.heard(self.backend.accept(pcm))
+
+    def finish(self):
+        if self.backend is not None:
+            self.backend.finish()
+
+    def check_audio(self, audio):
+        """True/False si se puede decidir localmente sobre una locución completa; None si no hay detector local."""
+        if self.backend is None:
+            return None
+        return self.heard(self.backend.recognize(audio))
@@ -0,0 +1,188 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+from frame_pipeline import StageStats
+
+
+class FrameRecorder:
+    """
+    Grabador de frames en segmentos de vídeo rotativos.
+
+    Sustituye a un JPEG por frame: los frames se codifican en un hilo propio
+    dentro de archivos de vídeo que rotan por duración o tamaño, y solo se
+    conservan los max_segments más recientes.
+
+    Con mode="triggered" solo se graba alrededor de un evento: se mantiene en
+    memoria un pre-roll de pre_seconds y, al llamar a trigger(), se vuelca junto
+    con los post_seconds siguientes (ampliables si el evento se repite). Los
+    segmentos de un evento largo rotan igual que en modo continuo.
+
+    Los frames llegan a ritmo variable (solo se graban los procesados), así que
+    se colocan según su marca de tiempo en un vídeo a fps constantes: un frame
+    se repite para cubrir un hueco y se omite si llega antes de su turno. Así el
+    vídeo se reproduce a velocidad real sea cual sea el ritmo de escritura.
+    """
+
+    def __init__(self, output_folder, fps=30.0, mode="continuous", segment_seconds=300,
+                 max_segment_bytes=256 * 1024 * 1024, max_segments=48, pre_seconds=5.0, post_seconds=5.0,
+                 fourcc="MJPG", extension=".avi", max_pending=64):
+        if mode not in ("continuous", "triggered"):
+            raise ValueError("Modo de grabación no reconocido. Usa 'continuous' o 'triggered'.")
+        self.output_folder = output_folder
+        self.fps = fps
+        self.mode = mode
+        self.segment_seconds = segment_seconds
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+
+        os.makedirs(self.output_folder, exist_ok=True)
+        self.stats = StageStats("grabación")
+        self.dropped = 0
+        self.dropped_triggers = 0
+        self.repeated_frames = 0
+        self.skipped_frames = 0
+        self._queue = queue.Queue(max_pending)
+        self._writer = None
+        self._segment_open = False
+        self._segment_path = None
+        self._segment_started = None
+        self._segment_frames = 0
+        self._next_size_check = 0
+        self._segments = deque(sorted(
+            os.path.join(self.output_folder, name) for name in os.listdir(self.output_folder)
+            if name.startswith("segment_") and name.endswith(self.extension)))
+        self._pre_roll = deque()
+        self._record_until = 0.0
+        self._thread = threading.Thread(target=self._run, name="bermm-recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        """Encola un frame sin bloquear; si el grabador va retrasado, el frame se descarta."""
+        try:
+            self._queue.put_nowait(("frame", time.time() if timestamp is None else timestamp, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def trigger(self, timestamp=None):
+        """Señala un evento (p. ej. una detección): en modo triggered graba pre-roll y post-roll."""
+        if self.mode != "triggered":
+            return
+        # Sin bloquear al hilo de visión: si la cola está llena, el siguiente evento (las
+        # detecciones se repiten frame a frame) volverá a disparar la grabación.
+        try:
+            self._queue.put_nowait(("trigger", time.time() if timestamp is None else timestamp, None))
+        except queue.Full:
+            self.dropped_triggers += 1
+            logging.debug("Cola del grabador llena: evento descartado.")
+
+    def close(self):
+        self._queue.put(("close", None, None))
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            kind, timestamp, frame = self._queue.get()
+            if kind == "close":
+                self._close_segment()
+                return
+            try:
+                if kind == "trigger":
+                    self._on_trigger(timestamp)
+                else:
+                    self._on_frame(timestamp, frame)
+            except Exception as e:
+                logging.error("Error en el grabador de frames: %s", e)
+
+    def _on_trigger(self, timestamp):
+        if not self._segment_open:
+            self._open_segment(timestamp)
+            for buffered_timestamp, buffered_frame in self._pre_roll:
+                self._write_frame(buffered_timestamp, buffered_frame)
+            self._pre_roll.clear()
+        self._record_until = max(self._record_until, timestamp + self.post_seconds)
+
+    def _on_frame(self, timestamp, frame):
+        if self.mode == "triggered":
+            if self._segment_open and timestamp > self._record_until:
+                self._close_segment()
+            if not self._segment_open:
+                self._pre_roll.append((timestamp, frame))
+                while self._pre_roll and timestamp - self._pre_roll[0][0] > self.pre_seconds:
+                    self._pre_roll.popleft()
+                return
+            if self._should_rotate(timestamp):
+                self._close_segment()
+                self._open_segment(timestamp)
+        elif not self._segment_open or self._should_rotate(timestamp):
+            self._close_segment()
+            self._open_segment(timestamp)
+        self._write_frame(timestamp, frame)
+
+    def _should_rotate(self, timestamp):
+        if timestamp - self._segment_started >= self.segment_seconds:
+            return True
+        # Comprobar el tamaño cada segundo de vídeo aproximadamente, no en cada frame.
+        if self._segment_frames >= self._next_size_check:
+            self._next_size_check = self._segment_frames + max(int(self.fps), 1)
+            try:
+                return os.path.getsize(self._segment_path) >= self.max_segment_bytes
+            except OSError:
+                return False
+        return False
+
+    def _open_segment(self, timestamp):
+        name = datetime.fromtimestamp(timestamp).strftime("segment_%Y%m%d_%H%M%S_%f") + self.extension
+        self._segment_path = os.path.join(self.output_folder, name)
+        self._segment_started = timestamp
+        self._segment_frames = 0
+        self._next_size_check = max(int(self.fps), 1)
+        self._segment_open = True
+        self._segments.append(self._segment_path)
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments.popleft()
+            try:
+                os.remove(oldest)
+            except OSError as e:
+                logging.warning("No se pudo borrar el segmento %s: %s", oldest, e)
+
+    def _write_frame(self, timestamp, frame):
+        start = time.perf_counter()
+        if self._writer is None:
+            # El VideoWriter se crea con el primer frame, cuando se conoce su tamaño.
+            h, w = frame.shape[:2]
+            self._writer = cv2.VideoWriter(self._segment_path, self.fourcc, self.fps, (w, h))
+            logging.info("Grabando segmento %s.", self._segment_path)
+            self._segment_started = min(self._segment_started, timestamp)
+        # Posición del frame en el vídeo a fps constantes según su marca de tiempo.
+        copies = int((timestamp - self._segment_started) * self.fps) + 1 - self._segment_frames
+        if copies <= 0:
+            self.skipped_frames += 1
+            return
+        max_copies = max(int(self.fps * 2), 1)
+        if copies > max_copies:
+            # Tras un parón largo (cámara bloqueada) no se rellenan minutos de vídeo congelado.
+            self._segment_started += (copies - max_copies) / self.fps
+            copies = max_copies
+        for _ in range(copies):
+            self._writer.write(frame)
+        self._segment_frames += copies
+        self.repeated_frames += copies - 1
+        self.stats.record(time.perf_counter() - start)
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            logging.info("Segmento cerrado: %s (%d frames).", self._segment_path, self._segment_frames)
+        self._writer = None
+        self._segment_open = False
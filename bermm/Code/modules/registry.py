@@ -0,0 +1,84 @@
+import importlib
+import logging
+import threading
+import time
+
+
+class LazyModule:
+    """Describe un módulo de BERMM que se importa y construye en el primer uso."""
+
+    def __init__(self, name, module_path, class_name, kwargs=None):
+        self.name = name
+        self.module_path = module_path
+        self.class_name = class_name
+        self.kwargs = kwargs or {}
+        self.instance = None
+        self.import_time = None
+        self.init_time = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.instance is not None
+
+
+class ModuleRegistry:
+    """
+    Registro de inicialización diferida de los módulos de BERMM.
+
+    Cada módulo se importa y se construye la primera vez que se solicita con
+    get(), o antes en segundo plano con warm(). Se registran por separado los
+    tiempos de importación y de construcción para el perfilado de arranque.
+    """
+
+    def __init__(self):
+        self._modules = {}
+
+    def register(self, name, module_path, class_name, **kwargs):
+        self._modules[name] = LazyModule(name, module_path, class_name, kwargs)
+
+    def get(self, name):
+        entry = self._modules[name]
+        if entry.instance is not None:
+            return entry.instance
+        with entry.lock:
+            if entry.instance is None:
+                start = time.perf_counter()
+                module = importlib.import_module(entry.module_path)
+                imported = time.perf_counter()
+                entry.instance = getattr(module, entry.class_name)(**entry.kwargs)
+                entry.import_time = imported - start
+                entry.init_time = time.perf_counter() - imported
+                logging.info("Módulo '%s' cargado (importación %.3fs, inicialización %.3fs).",
+                             name, entry.import_time, entry.init_time)
+        return entry.instance
+
+    def is_loaded(self, name):
+        return self._modules[name].loaded
+
+    def warm(self, names):
+        """Precarga los módulos indicados en un hilo en segundo plano."""
+        def _warm():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logging.error("Error al precargar el módulo '%s': %s", name, e)
+
+        thread = threading.Thread(target=_warm, name="bermm-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def startup_report(self):
+        """Devuelve una tabla con los tiempos de importación e inicialización de cada módulo cargado."""
+        lines = [f"{'Módulo':<16}{'Importación':>14}{'Inicialización':>17}{'Total':>10}"]
+        total = 0.0
+        for entry in self._modules.values():
+            if not entry.loaded:
+                lines.append(f"{entry.name:<16}{'(sin cargar)':>14}")
+                continue
+            module_total = entry.import_time + entry.init_time
+            total += module_total
+            lines.append(f"{entry.name:<16}{entry.import_time:>13.3f}s{entry.init_time:>16.3f}s{module_total:>9.3f}s")
+        lines.append(f"{'Total':<16}{'':>31}{total:>9.3f}s")
+        return "\n".join(lines)
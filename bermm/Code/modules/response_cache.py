@@ -0,0 +1,196 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Palabras que no cambian el sentido de la pregunta; el resto (nombres, cifras,
+# verbos...) debe coincidir exactamente para aceptar una coincidencia aproximada.
+STOPWORDS = frozenset(("el", "la", "los", "las", "lo", "un", "una", "unos", "unas", "de", "del", "al", "a", "y",
+                       "o", "que", "en", "por", "favor", "me", "te", "se", "mi", "tu", "es", "eh", "pues", "bueno",
+                       "oye", "hola", "the", "an", "of", "to", "please"))
+
+
+def normalize_key(text):
+    """Normaliza un mensaje: minúsculas, sin acentos, sin puntuación y con espacios simples."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _PUNCTUATION.sub(" ", text)
+    return " ".join(text.split())
+
+
+def content_words(key):
+    """Palabras con contenido de una clave normalizada."""
+    return frozenset(word for word in key.split() if word not in STOPWORDS)
+
+
+def char_ngrams(key, size=3):
+    padded = f" {key} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at", "grams", "words", "context")
+
+    def __init__(self, value, expires_at, grams, words, context):
+        self.value = value
+        self.expires_at = expires_at
+        self.grams = grams
+        self.words = words
+        self.context = context
+
+
+class ResponseCache:
+    """
+    Caché de respuestas del chatbot con claves normalizadas.
+
+    - Coincidencia exacta sobre la clave normalizada ("¿Qué hora es?" == "que hora es").
+    - Coincidencia aproximada opcional (desactivada por defecto) mediante un índice
+      invertido de n-gramas de caracteres y similitud de Jaccard. Solo se usa con
+      mensajes de al menos min_approximate_length caracteres y exige que las
+      palabras con contenido coincidan exactamente: "llamar a juana" nunca
+      devuelve la respuesta de "llamar a juan".
+    - Contexto opcional en la clave (p. ej. la huella de la conversación): la
+      misma pregunta en otro contexto es otra entrada ("¿y mañana?").
+    - Caducidad (TTL) por entrada para respuestas que dependen del momento.
+    - Límite de tamaño con expulsión LRU.
+    - Contadores de aciertos y fallos accesibles con stats().
+    """
+
+    def __init__(self, max_entries=512, ttl=None, approximate=False, similarity_threshold=0.85, ngram_size=3,
+                 min_approximate_length=20):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.approximate = approximate
+        self.similarity_threshold = similarity_threshold
+        self.ngram_size = ngram_size
+        self.min_approximate_length = min_approximate_length
+        self._entries = OrderedDict()
+        self._index = defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.approximate_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(text, context):
+        key = normalize_key(text)
+        return (context, key) if context else key
+
+    def get(self, text, default=None, context=""):
+        normalized = normalize_key(text)
+        key = self._key(text, context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(key, entry, now):
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+            if self.approximate and len(normalized) >= self.min_approximate_length:
+                match = self._find_similar(normalized, context, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.approximate_hits += 1
+                    return self._entries[match].value
+
+            self.misses += 1
+            return default
+
+    def put(self, text, value, ttl=None, context=""):
+        """
+        Guarda una respuesta en la caché.
+
+        :param ttl: Segundos de validez; si es None se usa el TTL por defecto de la caché.
+        :param context: Contexto en el que la respuesta es válida ("" si vale en cualquiera).
+        """
+        normalized = normalize_key(text)
+        if not normalized:
+            return
+        key = self._key(text, context)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            grams = char_ngrams(normalized, self.ngram_size) if self.approximate else ()
+            words = content_words(normalized) if self.approximate else None
+            self._entries[key] = CacheEntry(value, expires_at, grams, words, context)
+            for gram in grams:
+                self._index[gram].add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, text, context=""):
+        with self._lock:
+            key = self._key(text, context)
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.approximate_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "approximate_hits": self.approximate_hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.approximate_hits) / lookups if lookups else 0.0,
+            }
+
+    def _expired(self, key, entry, now):
+        if entry.expires_at is not None and entry.expires_at <= now:
+            self._remove(key)
+            self.expirations += 1
+            return True
+        return False
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for gram in entry.grams:
+            keys = self._index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[gram]
+
+    def _find_similar(self, key, context, now):
+        """
+        Busca la clave con mayor similitud de Jaccard sobre n-gramas que supere el
+        umbral y tenga exactamente las mismas palabras con contenido.
+        """
+        grams = char_ngrams(key, self.ngram_size)
+        words = content_words(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._index.get(gram, ()):
+                shared[candidate] += 1
+
+        best_key, best_score = None, self.similarity_threshold
+        for candidate, common in shared.items():
+            entry = self._entries[candidate]
+            if entry.words != words or entry.context != context:
+                continue
+            score = common / (len(grams) + len(entry.grams) - common)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and self._expired(best_key, self._entries[best_key], now):
+            return self._find_similar(key, context, now)
+        return best_key
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+try:
+    import pyautogui  # Captura de pantalla por defecto
+except ImportError:
+    pyautogui = None
+
+try:
+    import pytesseract  # OCR para leer el texto visible en pantalla
+except ImportError:
+    pytesseract = None
+
+
+class IncrementalScreenReader:
+    """
+    Lectura de pantalla incremental.
+
+    Cada captura se divide en teselas de tile_size píxeles y se calcula un hash
+    de cada una; solo las teselas que cambiaron respecto a la captura anterior
+    pasan por el OCR. Las filas de teselas cambiadas contiguas se agrupan en un
+    rectángulo (de la primera a la última columna cambiada) y se amplía una
+    tesela por cada lado: una línea de texto partida por el borde de una
+    tesela llega entera al OCR, en lugar de en trozos ilegibles.
+
+    El texto de cada rectángulo se guarda en una caché LRU con la clave del
+    contenido (los hashes de sus teselas, no su posición): si un contenido
+    vuelve a aparecer, aunque sea desplazado una tesela entera (cambiar de
+    ventana y volver, desplazar una lista), no se repite el OCR. Solo se anuncian las líneas que no
+    se habían leído hace poco, así que se puede llamar a read() cada pocos
+    segundos desde un temporizador (start()).
+    """
+
+    def __init__(self, lang="spa", tile_size=(128, 64), cache_size=256, remembered_lines=200, capture=None):
+        """
+        :param tile_size: (ancho, alto) de las teselas en píxeles.
+        :param cache_size: Rectángulos cuyo texto se guarda en la caché de OCR.
+        :param remembered_lines: Líneas ya anunciadas que no se repiten.
+        :param capture: Función que devuelve una imagen PIL de la pantalla (por defecto, pyautogui.screenshot).
+        """
+        self.lang = lang
+        self.tile_width, self.tile_height = tile_size
+        self.cache_size = cache_size
+        self.remembered_lines = remembered_lines
+        if capture is None and pyautogui is None:
+            raise RuntimeError("pyautogui no está instalado; pasa una función capture para leer la pantalla.")
+        self.capture = capture or pyautogui.screenshot
+        self._hashes = None
+        self._cache = OrderedDict()
+        self._announced = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._stop = threading.Event()
+        self.stats = {"captures": 0, "tiles": 0, "changed_tiles": 0, "ocr_calls": 0, "cache_hits": 0,
+                      "seconds": 0.0}
+
+    def _tile_hashes(self, pixels):
+        rows = -(-pixels.shape[0] // self.tile_height)
+        columns = -(-pixels.shape[1] // self.tile_width)
+        hashes = np.empty((rows, columns), dtype=object)
+        for row in range(rows):
+            band = pixels[row * self.tile_height:(row + 1) * self.tile_height]
+            for column in range(columns):
+                tile = band[:, column * self.tile_width:(column + 1) * self.tile_width]
+                hashes[row, column] = hashlib.blake2b(np.ascontiguousarray(tile), digest_size=8).digest()
+        return hashes
+
+    def _changed_regions(self, hashes):
+        """Rectángulos (fila0, fila1, col0, col1) de teselas cambiadas con una tesela de margen, sin solaparse."""
+        if self._hashes is None or self._hashes.shape != hashes.shape:
+            changed = np.ones(hashes.shape, dtype=bool)
+        else:
+            changed = hashes != self._hashes
+        self.stats["tiles"] += changed.size
+        self.stats["changed_tiles"] += int(changed.sum())
+        regions = []
+        changed_rows = changed.any(axis=1)
+        row = 0
+        while row < len(changed_rows):
+            if not changed_rows[row]:
+                row += 1
+                continue
+            end = row
+            while end + 1 < len(changed_rows) and changed_rows[end + 1]:
+                end += 1
+            columns = np.flatnonzero(changed[row:end + 1].any(axis=0))
+            region = (max(row - 1, 0), min(end + 2, hashes.shape[0]),
+                      max(int(columns[0]) - 1, 0), min(int(columns[-1]) + 2, hashes.shape[1]))
+            if regions and region[0] < regions[-1][1]:
+                # Con el margen se solapa con el anterior: se unen para no leer dos veces las mismas líneas.
+                previous = regions.pop()
+                region = (previous[0], region[1], min(previous[2], region[2]), max(previous[3], region[3]))
+            regions.append(region)
+            row = end + 1
+        return regions
+
+    def _ocr(self, pixels, hashes, region):
+        row0, row1, column0, column1 = region
+        # La clave es solo el contenido: la forma en teselas y sus hashes, no la posición en pantalla.
+        key = (row1 - row0, column1 - column0, tuple(hashes[row0:row1, column0:column1].ravel()))
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return text
+        crop = pixels[row0 * self.tile_height:row1 * self.tile_height,
+                      column0 * self.tile_width:column1 * self.tile_width]
+        text = pytesseract.image_to_string(Image.fromarray(crop), lang=self.lang)
+        self.stats["ocr_calls"] += 1
+        self._cache[key] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def read(self):
+        """Captura la pantalla y devuelve el texto nuevo (líneas no anunciadas antes), o "" si no hay nada nuevo."""
+        if pytesseract is None:
+            raise RuntimeError("pytesseract no está instalado; no se puede leer la pantalla.")
+        with self._lock:
+            start = time.perf_counter()
+            pixels = np.asarray(self.capture().convert("L"))
+            hashes = self._tile_hashes(pixels)
+            regions = self._changed_regions(hashes)
+            new_lines = []
+            for region in regions:
+                for line in self._ocr(pixels, hashes, region).splitlines():
+                    line = " ".join(line.split())
+                    if not line or line in self._announced:
+                        continue
+                    self._announced[line] = True
+                    new_lines.append(line)
+            while len(self._announced) > self.remembered_lines:
+                self._announced.popitem(last=False)
+            self._hashes = hashes
+            self.stats["captures"] += 1
+            self.stats["seconds"] += time.perf_counter() - start
+            return "\n".join(new_lines)
+
+    def reset(self):
+        """Olvida la captura anterior y lo ya anunciado: la próxima lectura incluye toda la pantalla."""
+        with self._lock:
+            self._hashes = None
+            self._announced.clear()
+
+    def start(self, callback, interval=2.0):
+        """Lee la pantalla cada interval segundos en un hilo propio y llama a callback(texto) si hay texto nuevo."""
+        if self._timer is not None:
+            return
+        self._stop.clear()
+        self._timer = threading.Thread(target=self._run, args=(callback, interval), name="bermm-screen-reader",
+                                       daemon=True)
+        self._timer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+
+    def _run(self, callback, interval):
+        while not self._stop.wait(interval):
+            try:
+                text = self.read()
+            except Exception as e:
+                logging.error("Error al leer el texto de la pantalla: %s", e)
+                continue
+            if text:
+                callback(text)
+
+    def log_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        captures = stats["captures"] or 1
+        logging.info("[pantalla] %d capturas, %.0f%% de teselas cambiadas, %d OCR, %d aciertos de caché, "
+                     "%.0f ms por lectura.", stats["captures"],
+                     100.0 * stats["changed_tiles"] / (stats["tiles"] or 1), stats["ocr_calls"],
+                     stats["cache_hits"], stats["seconds"] / captures * 1000)
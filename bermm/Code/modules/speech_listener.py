@@ -0,0 +1,473 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from recognizers import RecognizerBackend, WakeWordGate, make_backend
+
+try:
+    import webrtcvad  # Detección de voz más fiable que el umbral de energía (opcional)
+except ImportError:
+    webrtcvad = None
+
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+
+
+class Transcript:
+    """Texto reconocido de una locución (o hipótesis parcial, si partial es True)."""
+
+    __slots__ = ("text", "language", "captured", "recognized", "audio_seconds", "partial", "backend")
+
+    def __init__(self, text, language, captured, recognized, audio_seconds, partial=False, backend=None):
+        self.text = text
+        self.language = language
+        self.captured = captured
+        self.recognized = recognized
+        self.audio_seconds = audio_seconds
+        self.partial = partial
+        self.backend = backend
+
+    @property
+    def latency(self):
+        """Segundos desde el final de la locución hasta tener el texto."""
+        return self.recognized - self.captured
+
+
+class SpeechListener:
+    """
+    Escucha continua del micrófono compartida por todo el proceso.
+
+    Calibra el ruido ambiente una sola vez y después ajusta el umbral de
+    energía de forma continua. El micrófono se abre con el primer suscriptor y
+    se cierra cuando se va el último; listen() mantiene su propia suscripción
+    mientras se siga llamando. El reconocedor es intercambiable (ver
+    recognizers.py):
+
+    - Backends de locución completa (GoogleBackend, por defecto):
+      Recognizer.listen_in_background segmenta las locuciones y se reconocen en
+      un hilo aparte, para no perder audio mientras se espera al servicio.
+    - Backends de streaming (VoskBackend): un hilo propio lee el micrófono en
+      tramas de 30 ms, segmenta con VAD y pasa el audio al reconocedor mientras
+      el usuario habla, publicando hipótesis parciales antes del texto final.
+
+    Si webrtcvad está instalado, el VAD decide qué tramas son voz; si no, se usa
+    el umbral de energía. Con un WakeWordGate, el reconocedor principal solo
+    trabaja tras oír la palabra de activación.
+    """
+
+    def __init__(self, language="es-ES", calibration_seconds=1.0, pause_threshold=0.8, phrase_time_limit=15,
+                 vad_aggressiveness=2, min_voiced_ratio=0.2, ignore_while_speaking=True, backend=None,
+                 wake_word=None, model_path=None, max_queued_age=30.0, listen_queue_size=8,
+                 listen_idle_seconds=60.0):
+        """
+        :param calibration_seconds: Duración de la única calibración de ruido ambiente.
+        :param pause_threshold: Silencio (s) que cierra una locución.
+        :param min_voiced_ratio: Fracción mínima de tramas con voz según el VAD.
+        :param ignore_while_speaking: Descartar lo que se capta mientras BERMM habla (su propia voz).
+        :param backend: RecognizerBackend a usar, o su nombre ("google", "vosk"); por defecto, GoogleBackend.
+        :param wake_word: WakeWordGate opcional delante del reconocedor, o la lista de palabras de activación.
+        :param model_path: Modelo de Vosk para backend="vosk" y para el detector de la palabra de activación.
+        :param max_queued_age: Segundos que listen() conserva una locución dicha entre dos llamadas.
+        :param listen_queue_size: Locuciones que listen() guarda como mucho entre llamadas (se descartan las antiguas).
+        :param listen_idle_seconds: Tiempo sin llamadas a listen() tras el que se anula su suscripción.
+        """
+        self.language = language
+        self.calibration_seconds = calibration_seconds
+        self.pause_threshold = pause_threshold
+        self.phrase_time_limit = phrase_time_limit
+        self.min_voiced_ratio = min_voiced_ratio
+        self.ignore_while_speaking = ignore_while_speaking
+        self.max_queued_age = max_queued_age
+        self.listen_queue_size = listen_queue_size
+        self.listen_idle_seconds = listen_idle_seconds
+
+        self.recognizer = sr.Recognizer()
+        self.recognizer.dynamic_energy_threshold = True
+        self.recognizer.pause_threshold = pause_threshold
+        self.vad = webrtcvad.Vad(vad_aggressiveness) if webrtcvad is not None else None
+        if not isinstance(backend, RecognizerBackend):
+            backend = make_backend(backend or "google", language, self.recognizer, model_path)
+        self.backend = backend
+        if wake_word and not isinstance(wake_word, WakeWordGate):
+            wake_word = WakeWordGate([wake_word] if isinstance(wake_word, str) else wake_word,
+                                     model_path=model_path, sample_rate=self.backend.sample_rate)
+        self.wake_word = wake_word or None
+
+        self.stats = {"segments": 0, "rejected_vad": 0, "ignored_speaking": 0, "ignored_wake_word": 0,
+                      "recognized": 0, "unknown": 0, "errors": 0}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bermm-recognizer")
+        self._stop_listening = None
+        self._calibrated = False
+        # Arranques en curso (la calibración va fuera del cerrojo) y número de stop() para anularlos.
+        self._starting = False
+        self._stops = 0
+        # Cola de listen(): se suscribe en la primera llamada y sigue suscrita hasta pasar
+        # listen_idle_seconds sin llamadas, así que lo dicho entre dos llamadas no se pierde.
+        self._utterances = None
+        self._listen_entry = None
+        self._listening = 0
+        self._idle_timer = None
+        self.available = True
+
+    def subscribe(self, callback, partials=False):
+        """
+        Suscribe callback(Transcript); empieza a escuchar si aún no lo hacía.
+
+        :param partials: Recibir también las hipótesis parciales (solo backends de streaming).
+        :return: Función que anula la suscripción.
+        """
+        entry = (callback, partials)
+        with self._lock:
+            self._subscribers.append(entry)
+        self.start()
+        return lambda: self.unsubscribe(entry)
+
+    def unsubscribe(self, entry):
+        with self._lock:
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+            # Se decide bajo el cerrojo: un subscribe simultáneo verá el micrófono ya cerrado y lo reabrirá.
+            stop_listening = None
+            if not self._subscribers:
+                stop_listening, self._stop_listening = self._stop_listening, None
+        self._halt(stop_listening)
+
+    def listen(self, timeout=None):
+        """
+        Espera la siguiente locución reconocida y devuelve su texto, o None si vence el tiempo.
+
+        La primera llamada suscribe una cola acotada (listen_queue_size) que se
+        mantiene hasta pasar listen_idle_seconds sin llamadas: las locuciones
+        dichas entre dos llamadas se devuelven si tienen menos de max_queued_age
+        segundos.
+        """
+        with self._lock:
+            self._listening += 1
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._listen_entry is None:
+                self._utterances = queue.Queue(self.listen_queue_size)
+                self._listen_entry = (self._queue_utterance, False)
+                self._subscribers.append(self._listen_entry)
+            utterances = self._utterances
+        try:
+            self.start()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                try:
+                    transcript = utterances.get(timeout=None if deadline is None else
+                                                max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    return None
+                if time.time() - transcript.recognized <= self.max_queued_age:
+                    return transcript.text
+        finally:
+            with self._lock:
+                self._listening -= 1
+                if not self._listening and self._listen_entry is not None:
+                    self._idle_timer = threading.Timer(self.listen_idle_seconds, self._release_listen)
+                    self._idle_timer.daemon = True
+                    self._idle_timer.start()
+
+    def _queue_utterance(self, transcript):
+        utterances = self._utterances
+        while True:
+            try:
+                utterances.put_nowait(transcript)
+                return
+            except queue.Full:
+                # Cola llena: se descarta la locución más antigua.
+                try:
+                    utterances.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _release_listen(self):
+        """Anula la suscripción de listen() tras listen_idle_seconds sin llamadas."""
+        with self._lock:
+            if self._listening or self._listen_entry is None:
+                return
+            entry, self._listen_entry = self._listen_entry, None
+            self._idle_timer = None
+        self.unsubscribe(entry)
+
+    def start(self):
+        with self._lock:
+            if self._stop_listening is not None or self._starting or not self.available or not self._subscribers:
+                return
+            self._starting = True
+            stops = self._stops
+        # La calibración dura calibration_seconds: se hace fuera del cerrojo para no bloquear
+        # a listen(), subscribe() ni stop() mientras tanto.
+        try:
+            if self.backend.streaming:
+                # Tramas de 30 ms a la frecuencia del reconocedor: una trama de VAD por lectura.
+                microphone = sr.Microphone(sample_rate=self.backend.sample_rate,
+                                           chunk_size=self.backend.sample_rate * VAD_FRAME_MS // 1000)
+            else:
+                microphone = sr.Microphone()
+            if not self._calibrated:
+                # Al reabrir el micrófono se conserva el umbral, que se sigue ajustando solo.
+                with microphone as source:
+                    logging.info("Calibrando el ruido ambiente (%.1f s)...", self.calibration_seconds)
+                    self.recognizer.adjust_for_ambient_noise(source, duration=self.calibration_seconds)
+                self._calibrated = True
+        except (OSError, AttributeError) as e:
+            # AttributeError: speech_recognition lo lanza si falta PyAudio.
+            with self._lock:
+                self._starting = False
+                self.available = False
+            logging.error("No se pudo abrir el micrófono: %s", e)
+            return
+        with self._lock:
+            self._starting = False
+            # stop() o el último unsubscribe() llegaron durante la calibración.
+            if self._stops != stops or not self._subscribers:
+                return
+            if self.backend.streaming:
+                # Un evento por arranque: un hilo anterior que aún no ha terminado no sigue escuchando.
+                stop_event = threading.Event()
+
+                def stop_streaming(wait_for_stop=False):
+                    stop_event.set()
+
+                self._stop_listening = stop_streaming
+                thread = threading.Thread(target=self._stream_loop, args=(microphone, stop_event, stop_streaming),
+                                          name="bermm-listener", daemon=True)
+                thread.start()
+            else:
+                self._stop_listening = self.recognizer.listen_in_background(
+                    microphone, self._on_audio, phrase_time_limit=self.phrase_time_limit)
+        logging.info("Escucha en segundo plano iniciada con %s (umbral de energía %.0f, VAD %s%s).",
+                     self.backend.name, self.recognizer.energy_threshold, "activo" if self.vad else "no disponible",
+                     ", palabra de activación" if self.wake_word else "")
+
+    def stop(self):
+        """Deja de escuchar y cierra el micrófono; subscribe() vuelve a abrirlo."""
+        with self._lock:
+            self._stops += 1
+            stop_listening, self._stop_listening = self._stop_listening, None
+        self._halt(stop_listening)
+
+    def _halt(self, stop_listening):
+        if stop_listening is None:
+            return
+        stop_listening(wait_for_stop=False)
+        logging.info("Escucha en segundo plano detenida.")
+        self.log_stats()
+
+    def log_stats(self):
+        self.backend.metrics.log()
+        if self.wake_word is not None and self.wake_word.backend is not None:
+            self.wake_word.backend.metrics.log()
+        logging.info("[escucha] %s", ", ".join(f"{key}: {value}" for key, value in self.stats.items()))
+
+    def _speaking(self):
+        if not self.ignore_while_speaking:
+            return False
+        from speech_service import get_speech_service
+        return get_speech_service().is_busy()
+
+    def _is_speech(self, audio):
+        if self.vad is None:
+            return True
+        pcm = audio.get_raw_data(convert_rate=VAD_SAMPLE_RATE, convert_width=2)
+        frame_bytes = VAD_SAMPLE_RATE * VAD_FRAME_MS // 1000 * 2
+        frames = [pcm[i:i + frame_bytes] for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)]
+        if not frames:
+            return False
+        voiced = sum(self.vad.is_speech(frame, VAD_SAMPLE_RATE) for frame in frames)
+        return voiced / len(frames) >= self.min_voiced_ratio
+
+    def _frame_is_speech(self, pcm, sample_rate, in_speech):
+        """Decide si una trama de 30 ms es voz; fuera de las locuciones adapta el umbral de energía."""
+        if self.vad is not None:
+            return self.vad.is_speech(pcm, sample_rate)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        energy = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        if not in_speech:
+            # Misma regla que el ajuste dinámico de speech_recognition.
+            damping = self.recognizer.dynamic_energy_adjustment_damping ** (VAD_FRAME_MS / 1000)
+            target = energy * self.recognizer.dynamic_energy_ratio
+            self.recognizer.energy_threshold = self.recognizer.energy_threshold * damping + target * (1 - damping)
+        return energy > self.recognizer.energy_threshold
+
+    def _stream_loop(self, microphone, stop_event, stop_streaming):
+        rate = self.backend.sample_rate
+        frame_samples = rate * VAD_FRAME_MS // 1000
+        silence_frames = int(self.pause_threshold * 1000 / VAD_FRAME_MS)
+        max_frames = int(self.phrase_time_limit * 1000 / VAD_FRAME_MS)
+        # Sin detector local de la palabra de activación, el reconocedor principal escucha siempre
+        # y la palabra se comprueba sobre el texto en _deliver.
+        gated = self.wake_word is not None and self.wake_word.backend is not None
+
+        in_speech = ignoring = recognizing = False
+        segment = bytearray()
+        silent = frames = 0
+        processing = 0.0
+        last_partial = ""
+        captured = 0.0
+        try:
+            with microphone as source:
+                while not stop_event.is_set():
+                    pcm = source.stream.read(frame_samples)
+                    voiced = self._frame_is_speech(pcm, rate, in_speech)
+                    if not in_speech:
+                        if not voiced:
+                            continue
+                        in_speech = True
+                        self.stats["segments"] += 1
+                        segment.clear()
+                        silent = frames = 0
+                        processing = 0.0
+                        last_partial = ""
+                        ignoring = self._speaking()
+                        recognizing = not gated or self.wake_word.awake
+                        if not ignoring:
+                            (self.backend if recognizing else self.wake_word).start()
+
+                    segment += pcm
+                    frames += 1
+                    silent = 0 if voiced else silent + 1
+                    if not ignoring:
+                        start = time.perf_counter()
+                        if recognizing:
+                            partial = self.backend.accept(pcm)
+                            if partial and partial != last_partial:
+                                last_partial = partial
+                                self._publish(Transcript(partial, self.language, time.time(), time.time(),
+                                                         len(segment) / (2 * rate), partial=True,
+                                                         backend=self.backend.name))
+                        elif self.wake_word.accept(pcm):
+                            # Palabra de activación oída: el reconocedor principal recibe la locución entera.
+                            self.wake_word.finish()
+                            self.wake_word.wake()
+                            recognizing = True
+                            self.backend.start()
+                            self.backend.accept(bytes(segment))
+                        processing += time.perf_counter() - start
+
+                    if silent < silence_frames and frames < max_frames:
+                        continue
+                    in_speech = False
+                    if ignoring:
+                        self.stats["ignored_speaking"] += 1
+                        continue
+                    captured = time.time()
+                    audio_seconds = len(segment) / (2 * rate)
+                    if not recognizing:
+                        self.wake_word.finish()
+                        self.stats["ignored_wake_word"] += 1
+                        continue
+                    start = time.perf_counter()
+                    text = self.backend.finish()
+                    processing += time.perf_counter() - start
+                    self.backend.metrics.record(audio_seconds, processing, time.time() - captured)
+                    if text:
+                        self._deliver(text, captured, audio_seconds)
+                    else:
+                        self.stats["unknown"] += 1
+        except Exception as e:
+            logging.error("Error en la escucha en streaming: %s", e)
+        finally:
+            with self._lock:
+                if self._stop_listening is stop_streaming:
+                    self._stop_listening = None
+
+    def _on_audio(self, recognizer, audio):
+        # Hilo de captura de speech_recognition: solo filtrar y pasar el audio al reconocedor.
+        captured = time.time()
+        self.stats["segments"] += 1
+        if self._speaking():
+            self.stats["ignored_speaking"] += 1
+            return
+        if not self._is_speech(audio):
+            self.stats["rejected_vad"] += 1
+            return
+        self._executor.submit(self._recognize, audio, captured)
+
+    def _recognize(self, audio, captured):
+        audio_seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        if self.wake_word is not None and not self.wake_word.awake:
+            heard = self.wake_word.check_audio(audio)
+            if heard is False:
+                # El detector local (barato) no oyó la palabra: no se llama al reconocedor principal.
+                self.stats["ignored_wake_word"] += 1
+                return
+            if heard:
+                self.wake_word.wake()
+        start = time.perf_counter()
+        try:
+            text = self.backend.recognize(audio)
+        except sr.RequestError as e:
+            self.stats["errors"] += 1
+            logging.error("Error con el servicio de reconocimiento de voz: %s", e)
+            return
+        self.backend.metrics.record(audio_seconds, time.perf_counter() - start, time.time() - captured)
+        if not text:
+            self.stats["unknown"] += 1
+            logging.debug("No se pudo entender el audio.")
+            return
+        self._deliver(text, captured, audio_seconds)
+
+    def _deliver(self, text, captured, audio_seconds):
+        text = text.lower()
+        if self.wake_word is not None:
+            if self.wake_word.heard(text):
+                text = self.wake_word.strip(text)
+            elif not self.wake_word.awake:
+                self.stats["ignored_wake_word"] += 1
+                return
+            # Cada comando prolonga la ventana: se puede seguir hablando sin repetir la palabra.
+            self.wake_word.wake()
+            if not text:
+                return
+        transcript = Transcript(text, self.language, captured, time.time(), audio_seconds, backend=self.backend.name)
+        self.stats["recognized"] += 1
+        logging.info("Texto reconocido: %s (%.2f s)", transcript.text, transcript.latency)
+        self._publish(transcript)
+
+    def _publish(self, transcript):
+        with self._lock:
+            subscribers = [callback for callback, partials in self._subscribers if partials or not transcript.partial]
+        for callback in subscribers:
+            try:
+                callback(transcript)
+            except Exception as e:
+                logging.error("Error en un suscriptor del reconocimiento de voz: %s", e)
+
+
+_listener = None
+_listener_options = None
+_listener_lock = threading.Lock()
+
+
+def get_speech_listener(language=None, **kwargs):
+    """
+    Devuelve el SpeechListener compartido del proceso, creándolo en el primer uso.
+
+    Los argumentos (idioma, backend, wake_word...) solo se aplican en la primera
+    llamada (el idioma por defecto es "es-ES"); si una llamada posterior pide
+    otra configuración, se avisa y se devuelve el listener ya creado.
+    """
+    global _listener, _listener_options
+    requested = dict(kwargs, **({"language": language} if language is not None else {}))
+    with _listener_lock:
+        if _listener is None:
+            _listener = SpeechListener(language or "es-ES", **kwargs)
+            _listener_options = dict({"language": "es-ES", "backend": "google", "wake_word": None,
+                                      "model_path": None}, **requested)
+        else:
+            ignored = {key: value for key, value in requested.items() if _listener_options.get(key) != value}
+            if ignored:
+                logging.warning("El reconocimiento de voz ya está configurado (%s, %s); se ignora %s.",
+                                _listener.language, _listener.backend.name, ignored)
+        return _listener
@@ -0,0 +1,213 @@
+import itertools
+import logging
+import queue
+import re
+import threading
+import pyttsx3
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Corta después de un signo de fin de frase seguido de espacio.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…;])\s+')
+
+
+def split_sentences(text):
+    """Divide un texto en frases para empezar a hablar antes de sintetizar todo."""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+def iter_sentences(tokens):
+    """Agrupa un flujo de tokens en frases completas a medida que se cierran."""
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        parts = SENTENCE_BOUNDARY.split(buffer)
+        for sentence in parts[:-1]:
+            if sentence.strip():
+                yield sentence.strip()
+        buffer = parts[-1]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class Utterance:
+    """Locución encolada en el servicio de voz; permite esperar o cancelar su reproducción."""
+
+    def __init__(self, utterance_id, text, priority, chunks, on_start=None, on_done=None, on_word=None):
+        self.id = utterance_id
+        self.text = text
+        self.priority = priority
+        self.chunks = chunks
+        self.remaining = len(chunks)
+        self.on_start = on_start
+        self.on_done = on_done
+        self.on_word = on_word
+        self.started = False
+        self.cancelled = False
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Bloquea hasta que la locución termine o se cancele. Devuelve False si vence el tiempo."""
+        return self._done.wait(timeout)
+
+
+class SpeechService:
+    """
+    Servicio de voz único para todo el proceso.
+
+    Un solo hilo posee el motor pyttsx3 y consume una cola con prioridad. Los
+    textos se dividen en frases, de modo que la primera frase empieza a sonar
+    sin esperar al resto. speak() no bloquea: devuelve una Utterance que se
+    puede esperar, y interrupt() corta la locución actual y vacía la cola
+    (barge-in).
+    """
+
+    def __init__(self, rate=150):
+        self.rate = rate
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = set()
+        self._current = None
+        self._current_chunk = None
+        self._ready = threading.Event()
+        self.engine = None
+        self._thread = threading.Thread(target=self._run, name="bermm-speech", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def speak(self, text, priority=PRIORITY_NORMAL, interrupt=False, on_start=None, on_done=None, on_word=None):
+        """
+        Encola un texto para reproducirlo sin bloquear al llamador.
+
+        :param text: Texto a pronunciar.
+        :param priority: PRIORITY_HIGH, PRIORITY_NORMAL o PRIORITY_LOW.
+        :param interrupt: Si es True, corta lo que se esté diciendo y descarta la cola.
+        :param on_start: Callback llamado con la Utterance al empezar a sonar.
+        :param on_done: Callback llamado con la Utterance al terminar o cancelarse.
+        :param on_word: Callback llamado con (Utterance, palabra) cuando el motor empieza
+            cada palabra (evento started-word de pyttsx3), desde el hilo de voz.
+        :return: Utterance encolada.
+        """
+        if interrupt:
+            self.interrupt()
+
+        utterance = Utterance(next(self._ids), text, priority, split_sentences(text or ""),
+                              on_start=on_start, on_done=on_done, on_word=on_word)
+        if not utterance.chunks:
+            self._finish(utterance)
+            return utterance
+
+        with self._lock:
+            self._active.add(utterance)
+        for chunk in utterance.chunks:
+            self._queue.put((priority, next(self._sequence), utterance, chunk))
+        return utterance
+
+    def set_rate(self, rate):
+        """Cambia la velocidad (palabras por minuto); se aplica desde la siguiente frase."""
+        self.rate = rate
+
+    def interrupt(self):
+        """Cancela todas las locuciones pendientes y detiene la actual."""
+        with self._lock:
+            active, self._active = self._active, set()
+        for utterance in active:
+            utterance.cancelled = True
+            self._finish(utterance)
+        if self._current is not None and self.engine is not None:
+            try:
+                self.engine.stop()
+            except Exception as e:
+                logging.error("Error al interrumpir la voz: %s", e)
+
+    def is_busy(self):
+        with self._lock:
+            return bool(self._active)
+
+    def _finish(self, utterance):
+        with self._lock:
+            if utterance.done:
+                return
+            self._active.discard(utterance)
+            utterance._done.set()
+        if utterance.on_done:
+            try:
+                utterance.on_done(utterance)
+            except Exception as e:
+                logging.error("Error en el callback de fin de voz: %s", e)
+
+    def _on_started_word(self, name, location, length):
+        utterance, chunk = self._current, self._current_chunk
+        if utterance is None or utterance.on_word is None or chunk is None:
+            return
+        try:
+            utterance.on_word(utterance, chunk[location:location + length])
+        except Exception as e:
+            logging.error("Error en el callback de palabra: %s", e)
+
+    def _run(self):
+        try:
+            self.engine = pyttsx3.init()
+            self.engine.setProperty('rate', self.rate)
+            self.engine.connect('started-word', self._on_started_word)
+        except Exception as e:
+            logging.error("Error al inicializar el motor de texto a voz: %s", e)
+        finally:
+            self._ready.set()
+
+        engine_rate = self.rate
+        while True:
+            _, _, utterance, chunk = self._queue.get()
+            if utterance.cancelled or utterance.done:
+                continue
+            if not utterance.started:
+                utterance.started = True
+                if utterance.on_start:
+                    try:
+                        utterance.on_start(utterance)
+                    except Exception as e:
+                        logging.error("Error en el callback de inicio de voz: %s", e)
+
+            self._current = utterance
+            self._current_chunk = chunk
+            try:
+                if self.engine is not None:
+                    # El motor solo se toca desde este hilo: set_rate() deja el cambio para aquí.
+                    if engine_rate != self.rate:
+                        engine_rate = self.rate
+                        self.engine.setProperty('rate', engine_rate)
+                    self.engine.say(chunk)
+                    self.engine.runAndWait()
+                else:
+                    logging.error("No hay motor de texto a voz disponible.")
+            except Exception as e:
+                logging.error("Error al reproducir voz: %s", e)
+            finally:
+                self._current = None
+                self._current_chunk = None
+
+            utterance.remaining -= 1
+            if utterance.remaining <= 0:
+                self._finish(utterance)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_speech_service():
+    """Devuelve el servicio de voz compartido del proceso, creándolo en el primer uso."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SpeechService()
+    return _service
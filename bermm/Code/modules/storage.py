@@ -0,0 +1,208 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+MEMORY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS memory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_input TEXT UNIQUE,
+        bot_response TEXT
+    )
+"""
+INSERT_MEMORY = "INSERT OR IGNORE INTO memory (user_input, bot_response) VALUES (?, ?)"
+SELECT_MEMORY = "SELECT bot_response FROM memory WHERE user_input = ?"
+SELECT_RECENT_MEMORY = "SELECT user_input, bot_response FROM memory ORDER BY id DESC LIMIT ?"
+
+
+class MemoryStore:
+    """
+    Capa de persistencia de chat_memory.db.
+
+    - Modo WAL: las lecturas no se bloquean mientras se escribe.
+    - Una conexión por hilo, de modo que cualquier hilo de BERMM puede usar la memoria.
+    - Un hilo escritor agrupa las inserciones en transacciones (group commit)
+      en lugar de hacer commit y fsync en cada turno.
+    - Sentencias SQL constantes reutilizadas desde la caché de sentencias de sqlite3.
+
+    Las escrituras pendientes de la tabla memory se consultan también en get_memory(),
+    así que una respuesta guardada se puede leer antes de que llegue al disco.
+    """
+
+    def __init__(self, path="chat_memory.db", batch_size=64, flush_interval=0.05, cached_statements=128):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._pending_memory = {}
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self.execute_script(MEMORY_SCHEMA)
+
+        self._writer = threading.Thread(target=self._write_loop, name="bermm-memory-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def connection(self):
+        """Devuelve la conexión del hilo actual, abriéndola si es necesario."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def execute_script(self, sql):
+        conn = self.connection()
+        conn.executescript(sql)
+        conn.commit()
+
+    def query(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def write(self, sql, params):
+        """Encola una escritura para el siguiente group commit."""
+        if self._closed:
+            raise RuntimeError("MemoryStore cerrado.")
+        self._queue.put((sql, params))
+
+    def save_memory(self, user_input, bot_response):
+        with self._pending_lock:
+            self._pending_memory.setdefault(user_input, bot_response)
+        self.write(INSERT_MEMORY, (user_input, bot_response))
+
+    def get_memory(self, user_input):
+        with self._pending_lock:
+            pending = self._pending_memory.get(user_input)
+        if pending is not None:
+            return pending
+        row = self.connection().execute(SELECT_MEMORY, (user_input,)).fetchone()
+        return row[0] if row else None
+
+    def recent_memory(self, limit):
+        """Devuelve las últimas entradas (user_input, bot_response), de la más antigua a la más reciente."""
+        self.flush()
+        return list(reversed(self.query(SELECT_RECENT_MEMORY, (limit,))))
+
+    def flush(self):
+        """Bloquea hasta que todas las escrituras encoladas estén confirmadas."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        conn = self.connection()
+        try:
+            with conn:
+                # Agrupar escrituras consecutivas con la misma sentencia en un executemany.
+                start = 0
+                for index in range(1, len(batch) + 1):
+                    if index == len(batch) or batch[index][0] != batch[start][0]:
+                        conn.executemany(batch[start][0], [params for _, params in batch[start:index]])
+                        start = index
+        except sqlite3.Error as e:
+            logging.error("Error al guardar en memoria: %s", e)
+        finally:
+            with self._pending_lock:
+                for sql, params in batch:
+                    if sql == INSERT_MEMORY:
+                        self._pending_memory.pop(params[0], None)
+            for _ in batch:
+                self._queue.task_done()
+
+
+def _naive_session(conn, lock, session, turns):
+    # Patrón anterior: una conexión compartida y un commit por inserción.
+    for turn in range(turns):
+        key = f"sesion {session} mensaje {turn}"
+        with lock:
+            conn.execute(SELECT_MEMORY, (key,)).fetchone()
+            conn.execute(INSERT_MEMORY, (key, "respuesta"))
+            conn.commit()
+
+
+def _store_session(store, session, turns):
+    for turn in range(turns):
+        key = f"sesion {session} mensaje {turn}"
+        store.get_memory(key)
+        store.save_memory(key, "respuesta")
+
+
+def benchmark(sessions=8, turns=250):
+    """Compara turnos por segundo con sesiones concurrentes: conexión única vs MemoryStore."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "naive.db"), check_same_thread=False)
+        conn.execute(MEMORY_SCHEMA)
+        lock = threading.Lock()
+        threads = [threading.Thread(target=_naive_session, args=(conn, lock, s, turns)) for s in range(sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results["conexión única"] = sessions * turns / (time.perf_counter() - start)
+        conn.close()
+
+        store = MemoryStore(os.path.join(tmp, "store.db"))
+        threads = [threading.Thread(target=_store_session, args=(store, s, turns)) for s in range(sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        store.flush()
+        results["MemoryStore"] = sessions * turns / (time.perf_counter() - start)
+        store.close()
+    return results
+
+
+if __name__ == "__main__":
+    for name, turns_per_second in benchmark().items():
+        print(f"{name:<16}{turns_per_second:>10.0f} turnos/s")
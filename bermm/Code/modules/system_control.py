@@ -1,80 +1,136 @@
-import os
 import platform
-import subprocess
 import logging
+import threading
+import time
+
+from intents import IntentMatcher, normalize
+from launcher import get_process_launcher
+from speech_service import PRIORITY_HIGH, get_speech_service
+
+# Comandos del sistema: método que los ejecuta y frases que los activan (se
+# normalizan: sin tildes, mayúsculas ni artículos).
+SYSTEM_COMMANDS = {
+    "open_browser": ("abrir navegador", "abre navegador", "abra navegador", "abrir chrome", "abre chrome"),
+    "open_notepad": ("abrir bloc notas", "abre bloc notas", "abra bloc notas"),
+    # Solo órdenes directas: la frase debe ser todo lo dicho y se pide confirmación.
+    "shutdown": ("apagar computadora", "apaga computadora", "apague computadora",
+                 "apagar ordenador", "apaga ordenador", "apague ordenador",
+                 "apagar equipo", "apaga equipo", "apague equipo"),
+    "restart": ("reiniciar computadora", "reinicia computadora", "reinicie computadora",
+                "reiniciar ordenador", "reinicia ordenador", "reinicie ordenador",
+                "reiniciar equipo", "reinicia equipo", "reinicie equipo"),
+}
+# Comandos que no se ejecutan sin confirmación, con la pregunta que se hace al usuario.
+DESTRUCTIVE_COMMANDS = {
+    "shutdown": "¿Seguro que quieres apagar el equipo? Di «sí» para confirmarlo.",
+    "restart": "¿Seguro que quieres reiniciar el equipo? Di «sí» para confirmarlo.",
+}
+# Respuestas (normalizadas) que confirman un comando pendiente; cualquier otra lo cancela.
+CONFIRMATIONS = {("si",), ("confirmar",), ("confirmo",), ("si", "confirmo"), ("si", "seguro")}
+CONFIRMATION_SECONDS = 15.0
 
 class SystemControl:
     def __init__(self):
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.launcher = get_process_launcher()
+        self.matcher = IntentMatcher()
+        self._pending = None
+        self._pending_lock = threading.Lock()
+        for name, phrases in SYSTEM_COMMANDS.items():
+            self.register_command(name, phrases, getattr(self, name), confirmation=DESTRUCTIVE_COMMANDS.get(name))
         logging.info("Módulo de Control del Sistema inicializado.")
 
+    def register_command(self, name, phrases, handler, description="", confirmation=None):
+        """
+        Añade un comando (p. ej. desde otro módulo); handler() se llama sin argumentos al reconocerlo.
+
+        :param confirmation: Pregunta para comandos peligrosos: la frase debe ser todo lo dicho
+            (sin correcciones) y handler() solo se ejecuta si la siguiente entrada lo confirma.
+        """
+        if confirmation is not None:
+            action = handler
+            handler = lambda: self._ask_confirmation(name, action, confirmation)
+        self.matcher.register(name, phrases, handler, description, anchored=confirmation is not None)
+
     def execute_command(self, command):
-        """Ejecuta comandos del sistema basados en la entrada del usuario."""
-        command = command.lower()
-        
-        if "abrir navegador" in command:
-            self.open_browser()
-        elif "abrir bloc de notas" in command:
-            self.open_notepad()
-        elif "apagar computadora" in command:
-            self.shutdown()
-        elif "reiniciar computadora" in command:
-            self.restart()
-        else:
-            logging.warning("Comando no reconocido: %s", command)
+        """Ejecuta el comando del sistema contenido en la entrada del usuario; devuelve True si había uno."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            name, action, deadline = pending
+            if time.monotonic() < deadline and tuple(normalize(command)) in CONFIRMATIONS:
+                logging.info("Comando '%s' confirmado.", name)
+                action()
+                return True
+            logging.info("Comando '%s' cancelado: no se confirmó.", name)
+        if self.matcher.dispatch(command) is not None:
+            return True
+        # Casi todo lo que llega es charla normal, no un comando.
+        logging.debug("Comando no reconocido: %s", command)
+        return False
+
+    def _ask_confirmation(self, name, action, question):
+        with self._pending_lock:
+            self._pending = (name, action, time.monotonic() + CONFIRMATION_SECONDS)
+        logging.warning(question)
+        # En el pipeline de voz el usuario solo se entera si la pregunta se dice en voz alta,
+        # antes que la respuesta del chatbot a la misma entrada.
+        get_speech_service().speak(question, priority=PRIORITY_HIGH, interrupt=True)
+
+    def _track(self, future, message=None):
+        """Registra message cuando el proceso termine bien (o el error, si no) sin bloquear a quien llama."""
+        def done(finished):
+            try:
+                result = finished.result()
+            except Exception as e:
+                logging.error("Error al ejecutar el comando: %s", e)
+                return
+            if result.ok and message:
+                logging.info(message)
+        future.add_done_callback(done)
+        return future
 
     def open_browser(self):
-        """Abre el navegador predeterminado."""
-        try:
-            if platform.system() == "Windows":
-                os.system("start chrome" if self.is_program_installed("chrome") else "start msedge")
-            elif platform.system() == "Linux":
-                os.system("xdg-open https://www.google.com")
-            elif platform.system() == "Darwin":
-                os.system("open -a Safari")
-            logging.info("Navegador abierto.")
-        except Exception as e:
-            logging.error("Error al abrir el navegador: %s", e)
+        """Abre el navegador; devuelve un Future con el LaunchResult."""
+        if platform.system() == "Windows":
+            browser = "chrome" if self.is_program_installed("chrome") else "msedge"
+            if self.is_program_installed(browser):
+                # El navegador sigue abierto mientras el usuario lo usa: se informa al arrancar, no al salir.
+                return self._track(self.launcher.launch(
+                    browser, on_start=lambda pid: logging.info("Navegador abierto.")))
+            return self._track(self.launcher.open_target("https://www.google.com"), "Navegador abierto.")
+        if platform.system() == "Darwin":
+            return self._track(self.launcher.launch("open", "-a", "Safari"), "Navegador abierto.")
+        return self._track(self.launcher.open_target("https://www.google.com"), "Navegador abierto.")
 
     def open_notepad(self):
         """Abre el Bloc de Notas en Windows."""
-        try:
-            if platform.system() == "Windows":
-                os.system("notepad")
-            else:
-                logging.warning("El Bloc de Notas solo está disponible en Windows.")
-        except Exception as e:
-            logging.error("Error al abrir el Bloc de Notas: %s", e)
+        if platform.system() != "Windows":
+            logging.warning("El Bloc de Notas solo está disponible en Windows.")
+            return None
+        # Como el navegador, se informa al arrancar: el proceso sigue abierto mientras se usa.
+        return self._track(self.launcher.launch(
+            "notepad", on_start=lambda pid: logging.info("Bloc de Notas abierto.")))
 
     def shutdown(self):
         """Apaga la computadora."""
-        try:
-            if platform.system() == "Windows":
-                os.system("shutdown /s /t 0")
-            elif platform.system() == "Linux" or platform.system() == "Darwin":
-                os.system("shutdown now")
-            logging.info("Orden de apagado enviada.")
-        except Exception as e:
-            logging.error("Error al apagar la computadora: %s", e)
+        if platform.system() == "Windows":
+            future = self.launcher.launch("shutdown", "/s", "/t", "0")
+        else:
+            future = self.launcher.launch("shutdown", "now")
+        return self._track(future, "Orden de apagado enviada.")
 
     def restart(self):
         """Reinicia la computadora."""
-        try:
-            if platform.system() == "Windows":
-                os.system("shutdown /r /t 0")
-            elif platform.system() == "Linux" or platform.system() == "Darwin":
-                os.system("reboot")
-            logging.info("Orden de reinicio enviada.")
-        except Exception as e:
-            logging.error("Error al reiniciar la computadora: %s", e)
+        if platform.system() == "Windows":
+            future = self.launcher.launch("shutdown", "/r", "/t", "0")
+        else:
+            future = self.launcher.launch("reboot")
+        return self._track(future, "Orden de reinicio enviada.")
 
     def is_program_installed(self, program):
-        """Verifica si un programa está instalado en Windows."""
-        try:
-            output = subprocess.check_output(f"where {program}", shell=True, stderr=subprocess.DEVNULL)
-            return bool(output.strip())
-        except subprocess.CalledProcessError:
-            return False
+        """Verifica si un programa está en PATH o en App Paths de Windows (cacheado hasta que cambie PATH)."""
+        return self.launcher.which(program) is not None
 
 if __name__ == "__main__":
     system_control = SystemControl()
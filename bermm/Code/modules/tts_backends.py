@@ -0,0 +1,277 @@
+import atexit
+import ctypes
+import logging
+import os
+import platform
+import struct
+import threading
+import time
+
+from speech_service import get_speech_service, split_sentences
+
+try:
+    import tolk  # Biblioteca para compatibilidad con lectores de pantalla (NVDA, JAWS, etc.)
+except ImportError:
+    tolk = None
+
+try:
+    import accessible_output2.outputs.auto  # Para mayor compatibilidad con sistemas de accesibilidad
+except ImportError:
+    accessible_output2 = None
+
+# Orden de preferencia: el lector de pantalla del usuario antes que la voz propia de BERMM.
+DEFAULT_BACKENDS = ("nvda", "tolk", "accessible_output2", "speech_service")
+
+
+class SpeechLatency:
+    """Latencias de un backend de voz: lo que tarda speak() en volver y, si se sabe, hasta que empieza a sonar."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.utterances = 0
+        self.chunks = 0
+        self.dispatch_total = self.dispatch_max = 0.0
+        self.start_count = 0
+        self.start_total = self.start_max = 0.0
+
+    def record_dispatch(self, seconds, chunks):
+        with self._lock:
+            self.utterances += 1
+            self.chunks += chunks
+            self.dispatch_total += seconds
+            self.dispatch_max = max(self.dispatch_max, seconds)
+
+    def record_start(self, seconds):
+        with self._lock:
+            self.start_count += 1
+            self.start_total += seconds
+            self.start_max = max(self.start_max, seconds)
+
+    def log(self):
+        with self._lock:
+            if not self.utterances:
+                return
+            message = "[voz %s] %d textos en %d fragmentos, envío medio %.2f ms (máx. %.2f ms)" % (
+                self.name, self.utterances, self.chunks, self.dispatch_total / self.utterances * 1000,
+                self.dispatch_max * 1000)
+            if self.start_count:
+                message += ", inicio del audio medio %.0f ms (máx. %.0f ms)" % (
+                    self.start_total / self.start_count * 1000, self.start_max * 1000)
+        logging.info(message + ".")
+
+
+class TTSBackend:
+    """
+    Interfaz de los motores de voz.
+
+    El constructor prueba el motor y lanza RuntimeError si no está disponible;
+    el objeto conserva el manejador abierto durante toda la vida del proceso.
+    speak_chunk() envía un fragmento sin esperar a que se pronuncie.
+    """
+
+    name = "base"
+    # False si el motor ya parte el texto en frases por su cuenta.
+    split_text = True
+
+    def __init__(self):
+        self.latency = SpeechLatency(self.name)
+
+    def speak_chunk(self, text, interrupt=False):
+        raise NotImplementedError
+
+    def silence(self):
+        pass
+
+    def set_rate(self, rate):
+        """Velocidad en palabras por minuto; los lectores de pantalla conservan la que eligió el usuario."""
+
+
+class NVDABackend(TTSBackend):
+    """NVDA a través de nvdaControllerClient.dll cargada con ctypes (sin procesos ni shell por frase)."""
+
+    name = "nvda"
+
+    def __init__(self, dll_path=None):
+        super().__init__()
+        if platform.system() != "Windows":
+            raise RuntimeError("NVDA solo está disponible en Windows.")
+        self.dll = self._load_dll(dll_path)
+        self.dll.nvdaController_speakText.argtypes = (ctypes.c_wchar_p,)
+        if self.dll.nvdaController_testIfRunning() != 0:
+            raise RuntimeError("NVDA no se está ejecutando.")
+
+    @staticmethod
+    def _load_dll(dll_path):
+        bits = struct.calcsize("P") * 8
+        names = [dll_path] if dll_path else [f"nvdaControllerClient{bits}.dll", "nvdaControllerClient.dll"]
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in names:
+            for candidate in (os.path.join(here, name), name):
+                try:
+                    return ctypes.WinDLL(candidate)
+                except OSError:
+                    continue
+        raise RuntimeError("No se encontró nvdaControllerClient.dll.")
+
+    def speak_chunk(self, text, interrupt=False):
+        if interrupt:
+            self.dll.nvdaController_cancelSpeech()
+        self.dll.nvdaController_speakText(text)
+
+    def silence(self):
+        self.dll.nvdaController_cancelSpeech()
+
+
+class TolkBackend(TTSBackend):
+    """Tolk: habla a través del lector de pantalla activo (JAWS, NVDA, Window-Eyes...)."""
+
+    name = "tolk"
+
+    def __init__(self):
+        super().__init__()
+        if tolk is None:
+            raise RuntimeError("tolk no está instalado.")
+        tolk.load()
+        if not tolk.is_loaded():
+            raise RuntimeError("No se pudo cargar Tolk.")
+        logging.info("Tolk cargado (lector de pantalla: %s).", tolk.detect_screen_reader() or "ninguno")
+
+    def speak_chunk(self, text, interrupt=False):
+        tolk.speak(text, interrupt)
+
+    def silence(self):
+        tolk.silence()
+
+
+class AccessibleOutputBackend(TTSBackend):
+    """accessible_output2: elige automáticamente entre los lectores y voces del sistema."""
+
+    name = "accessible_output2"
+
+    def __init__(self):
+        super().__init__()
+        if accessible_output2 is None:
+            raise RuntimeError("accessible_output2 no está instalado.")
+        self.output = accessible_output2.outputs.auto.Auto()
+
+    def speak_chunk(self, text, interrupt=False):
+        self.output.speak(text, interrupt=interrupt)
+
+    def silence(self):
+        silence = getattr(self.output, "silence", None)
+        if silence is not None:
+            silence()
+
+
+class SpeechServiceBackend(TTSBackend):
+    """La voz propia de BERMM (pyttsx3 en el SpeechService compartido); mide también el inicio del audio."""
+
+    name = "speech_service"
+    split_text = False
+
+    def __init__(self):
+        super().__init__()
+        self.service = get_speech_service()
+
+    def speak_chunk(self, text, interrupt=False):
+        sent = time.perf_counter()
+        self.service.speak(text, interrupt=interrupt,
+                           on_start=lambda utterance: self.latency.record_start(time.perf_counter() - sent))
+
+    def silence(self):
+        self.service.interrupt()
+
+    def set_rate(self, rate):
+        self.service.set_rate(rate)
+
+
+BACKENDS = {
+    "nvda": NVDABackend,
+    "tolk": TolkBackend,
+    "accessible_output2": AccessibleOutputBackend,
+    "speech_service": SpeechServiceBackend,
+}
+
+
+def probe_backend(names=DEFAULT_BACKENDS):
+    """Devuelve el primer backend disponible de names, probando cada uno una sola vez; None si no hay ninguno."""
+    for name in names:
+        start = time.perf_counter()
+        try:
+            backend = BACKENDS[name]()
+        except Exception as e:
+            logging.debug("Motor de voz '%s' no disponible: %s", name, e)
+            continue
+        logging.info("Motor de voz: %s (detectado en %.1f ms).", name, (time.perf_counter() - start) * 1000)
+        return backend
+    logging.error("No hay motor de texto a voz disponible.")
+    return None
+
+
+class TextToSpeech:
+    """
+    Envía texto al motor de voz elegido al arrancar.
+
+    El texto se parte en frases para que el lector empiece a hablar con la
+    primera sin esperar a procesar el resto.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @property
+    def name(self):
+        return self.backend.name if self.backend else None
+
+    def speak(self, text, interrupt=False):
+        """Envía text al motor sin esperar a que termine de sonar; devuelve False si no hay motor."""
+        if self.backend is None or not text:
+            return False
+        chunks = split_sentences(text) if self.backend.split_text else [text]
+        start = time.perf_counter()
+        for index, chunk in enumerate(chunks):
+            self.backend.speak_chunk(chunk, interrupt=interrupt and index == 0)
+        self.backend.latency.record_dispatch(time.perf_counter() - start, len(chunks))
+        return True
+
+    def set_rate(self, rate):
+        if self.backend is not None:
+            self.backend.set_rate(rate)
+
+    def silence(self):
+        if self.backend is not None:
+            self.backend.silence()
+
+    def log_stats(self):
+        if self.backend is not None:
+            self.backend.latency.log()
+
+
+_tts = None
+_tts_lock = threading.Lock()
+
+
+def get_text_to_speech(names=DEFAULT_BACKENDS):
+    """Devuelve el TextToSpeech compartido del proceso; el motor se elige en la primera llamada."""
+    global _tts
+    if _tts is None:
+        with _tts_lock:
+            if _tts is None:
+                _tts = TextToSpeech(probe_backend(names))
+                atexit.register(_tts.log_stats)
+    return _tts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sample = "Hola, soy BERMM. Esta es una prueba de voz. Cada frase se envía por separado."
+    for backend_name in DEFAULT_BACKENDS:
+        engine = TextToSpeech(probe_backend((backend_name,)))
+        if engine.backend is None:
+            continue
+        for _ in range(3):
+            engine.speak(sample, interrupt=True)
+            time.sleep(2)
+        engine.silence()
+        engine.log_stats()
@@ -1,13 +1,63 @@
+import argparse
 import cv2
 import mediapipe as mp
+import numpy as np
 import logging
-import os
+import threading
 import time
+import types
+from camera_broker import get_camera_broker
+from frame_pipeline import LatestFrameBuffer, StageStats, AdaptiveScheduler
+from recorder import FrameRecorder
+
+# Desplazamientos que reproducen el punto de cv2.circle(radius=1, thickness=-1).
+DOT_OFFSETS = np.array([[0, 0], [1, 0], [-1, 0], [0, 1], [0, -1]], dtype=np.int32)
+
+
+def landmarks_to_array(face_landmarks):
+    """Convierte los landmarks de mediapipe en un array (N, 3) de coordenadas normalizadas en una pasada."""
+    return np.array([(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark], dtype=np.float32)
+
+
+def draw_landmarks(frame, landmarks, color=(0, 255, 0)):
+    """Dibuja todos los landmarks normalizados de una vez sobre el frame BGR."""
+    h, w = frame.shape[:2]
+    points = (landmarks[:, :2] * (w, h)).astype(np.int32)
+    dots = (points[:, None, :] + DOT_OFFSETS[None, :, :]).reshape(-1, 2)
+    inside = (dots[:, 0] >= 0) & (dots[:, 0] < w) & (dots[:, 1] >= 0) & (dots[:, 1] < h)
+    dots = dots[inside]
+    frame[dots[:, 1], dots[:, 0]] = color
+
+
+def create_detector(mode, detection_confidence, static_image_mode=False):
+    """Crea el detector de mediapipe para el modo 'detection' o 'mesh'."""
+    if mode == "detection":
+        return mp.solutions.face_detection.FaceDetection(min_detection_confidence=detection_confidence)
+    elif mode == "mesh":
+        return mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=static_image_mode,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=detection_confidence
+        )
+    raise ValueError("Modo no reconocido. Usa 'detection' o 'mesh'.")
+
+
+def detections_to_array(results):
+    """Convierte las detecciones de mediapipe en un array (N, 5): xmin, ymin, ancho, alto (normalizados) y score."""
+    if not results or not results.detections:
+        return np.empty((0, 5), dtype=np.float32)
+    return np.array([(d.location_data.relative_bounding_box.xmin, d.location_data.relative_bounding_box.ymin,
+                      d.location_data.relative_bounding_box.width, d.location_data.relative_bounding_box.height,
+                      d.score[0]) for d in results.detections], dtype=np.float32)
+
 
 class VisionModule:
     def __init__(self, camera_index=0, mode="detection", display_window=True, 
                  save_frames=False, output_folder="captured_frames", frame_skip=1, 
-                 detection_confidence=0.6):
+                 detection_confidence=0.6, pipelined=False, report_interval=5.0,
+                 target_fps=30.0, tracking=False, redetect_interval=10, roi_margin=0.5,
+                 record_mode="continuous", segment_seconds=300, pre_event_seconds=5.0, post_event_seconds=5.0):
         self.camera_index = camera_index
         self.mode = mode
         self.display_window = display_window
@@ -15,91 +65,181 @@ class VisionModule:
         self.output_folder = output_folder
         self.frame_skip = frame_skip
         self.detection_confidence = detection_confidence
+        # En modo pipelined, captura, inferencia y escritura corren en hilos separados.
+        self.pipelined = pipelined
+        self.report_interval = report_interval
+        # frame_skip="auto" ajusta la tasa de detección al coste medido y a target_fps.
+        self.scheduler = AdaptiveScheduler(target_fps) if frame_skip == "auto" else None
+        # Seguimiento por región de interés (modo detection): entre detecciones completas
+        # solo se procesa el recorte alrededor del último rostro. En modo mesh, FaceMesh
+        # ya sigue el rostro internamente con static_image_mode=False.
+        self.tracking = tracking
+        self.redetect_interval = redetect_interval
+        self.roi_margin = roi_margin
+        self._last_boxes = []
+        self._frames_since_full = 0
+        # Búfer RGB reutilizado entre frames del mismo tamaño (cvtColor con dst=).
+        self._rgb_buffer = None
         
-        if self.save_frames and not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
+        # Los frames se guardan en segmentos de vídeo rotativos; con record_mode="triggered"
+        # solo se graban los segundos alrededor de cada detección.
+        self.recorder = None
+        if self.save_frames:
+            self.recorder = FrameRecorder(self.output_folder, fps=target_fps, mode=record_mode,
+                                          segment_seconds=segment_seconds, pre_seconds=pre_event_seconds,
+                                          post_seconds=post_event_seconds)
         
-        self.mp_face_detection = mp.solutions.face_detection
-        self.mp_face_mesh = mp.solutions.face_mesh
-        if self.mode == "detection":
-            self.detector = self.mp_face_detection.FaceDetection(min_detection_confidence=self.detection_confidence)
-        elif self.mode == "mesh":
-            self.detector = self.mp_face_mesh.FaceMesh(
-                static_image_mode=False,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=self.detection_confidence
-            )
-        else:
-            raise ValueError("Modo no reconocido. Usa 'detection' o 'mesh'.")
+        self.detector = create_detector(self.mode, self.detection_confidence)
+        # La cámara se comparte con otros módulos (p. ej. los gestos del avatar) a través del broker.
+        self.camera = get_camera_broker(self.camera_index)
 
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         logging.info("VisionModule inicializado en modo '%s' con cámara %d.", self.mode, self.camera_index)
 
+    def should_process(self, frame_count):
+        """Decide si un frame capturado se procesa (frame_skip fijo o programador adaptativo)."""
+        if self.scheduler is not None:
+            return self.scheduler.due()
+        return frame_count % self.frame_skip == 0
+
+    def _tracking_roi(self, frame_shape):
+        """Región (x0, y0, x1, y1) alrededor de los últimos rostros, o None si toca detección completa."""
+        if not self.tracking or not self._last_boxes or self._frames_since_full >= self.redetect_interval:
+            return None
+        h, w = frame_shape[:2]
+        x0 = min(box[0] for box in self._last_boxes)
+        y0 = min(box[1] for box in self._last_boxes)
+        x1 = max(box[0] + box[2] for box in self._last_boxes)
+        y1 = max(box[1] + box[3] for box in self._last_boxes)
+        margin_x = int((x1 - x0) * self.roi_margin)
+        margin_y = int((y1 - y0) * self.roi_margin)
+        x0, y0 = max(0, x0 - margin_x), max(0, y0 - margin_y)
+        x1, y1 = min(w, x1 + margin_x), min(h, y1 + margin_y)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return x0, y0, x1, y1
+
+    def _detect_faces(self, frame, roi, rgb=None):
+        """Detecta rostros en el frame completo o en una región; devuelve cajas (x, y, w, h, score) en píxeles."""
+        x0, y0 = 0, 0
+        region = frame
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            region = frame[y0:y1, x0:x1]
+        if rgb is not None:
+            # RGB ya convertido por el broker: basta con recortarlo.
+            rgb_region = rgb if roi is None else np.ascontiguousarray(rgb[y0:y1, x0:x1])
+        else:
+            # Los recortes tienen tamaño variable: solo se reutiliza el búfer para frames completos.
+            rgb_region = self._to_rgb(region, reuse=roi is None)
+        results = self.detector.process(rgb_region)
+        boxes = []
+        if results and results.detections:
+            h, w = region.shape[:2]
+            for detection in results.detections:
+                bboxC = detection.location_data.relative_bounding_box
+                boxes.append((x0 + int(bboxC.xmin * w), y0 + int(bboxC.ymin * h),
+                              int(bboxC.width * w), int(bboxC.height * h), detection.score[0]))
+        return boxes
+
+    def process_frame(self, frame, frame_count, rgb=None, draw=True):
+        """
+        Detecta rostros o landmarks en un frame BGR y, si draw es True, los dibuja sobre él.
+
+        :param rgb: Versión RGB del frame si ya está convertida (frames del CameraBroker).
+        :param draw: Con False el frame no se modifica, así que puede ser de solo lectura.
+        :return: Cajas detectadas (modo detection) o landmarks por rostro (modo mesh).
+        """
+        process_start = time.time()
+        try:
+            if self.mode == "detection":
+                results = self._process_detection(frame, frame_count, process_start, rgb, draw)
+            else:
+                results = self._process_mesh(frame, frame_count, process_start, rgb, draw)
+        except cv2.error as e:
+            logging.error("Error al convertir frame a RGB: %s", e)
+            return None
+        if self.scheduler is not None:
+            self.scheduler.record(time.time() - process_start)
+        return results
+
+    def _process_detection(self, frame, frame_count, process_start, rgb=None, draw=True):
+        roi = self._tracking_roi(frame.shape)
+        boxes = self._detect_faces(frame, roi, rgb)
+        if roi is not None and not boxes:
+            # Se perdió el rostro dentro de la región: volver a buscar en todo el frame.
+            roi = None
+            boxes = self._detect_faces(frame, None, rgb)
+        self._frames_since_full = self._frames_since_full + 1 if roi is not None else 0
+        self._last_boxes = boxes
+
+        if boxes:
+            for x, y, box_width, box_height, _ in boxes if draw else ():
+                cv2.rectangle(frame, (x, y), (x + box_width, y + box_height), (0, 255, 0), 2)
+            logging.info("Frame %d: %d detecciones procesadas en %.2f segundos%s.",
+                         frame_count, len(boxes), time.time() - process_start,
+                         " (región de interés)" if roi is not None else "")
+        else:
+            logging.debug("Frame %d: No se detectaron rostros.", frame_count)
+        return boxes
+
+    def _to_rgb(self, frame, reuse=True):
+        """Convierte BGR a RGB; con reuse=True escribe en un búfer preasignado en lugar de crear uno nuevo."""
+        if not reuse:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self._rgb_buffer is None or self._rgb_buffer.shape != frame.shape:
+            self._rgb_buffer = np.empty_like(frame)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer)
+
+    def _process_mesh(self, frame, frame_count, process_start, rgb=None, draw=True):
+        rgb_frame = rgb if rgb is not None else self._to_rgb(frame)
+        results = self.detector.process(rgb_frame)
+        faces = []
+        if results and results.multi_face_landmarks:
+            for face_landmarks in results.multi_face_landmarks:
+                landmarks = landmarks_to_array(face_landmarks)
+                if draw:
+                    draw_landmarks(frame, landmarks)
+                faces.append(landmarks)
+            logging.info("Frame %d: Landmarks detectados en %.2f segundos.",
+                         frame_count, time.time() - process_start)
+        else:
+            logging.debug("Frame %d: No se detectaron landmarks.", frame_count)
+        return faces
+
+    def process_batch(self, source, output, workers=None, chunk_size=32):
+        """Procesa un vídeo o una carpeta de imágenes en paralelo y guarda las detecciones en un .npz."""
+        from vision_batch import process_batch
+        return process_batch(source, output, mode=self.mode, detection_confidence=self.detection_confidence,
+                             workers=workers, chunk_size=chunk_size)
+
     def process_camera_feed(self):
-        cap = cv2.VideoCapture(self.camera_index)
-        if not cap.isOpened():
-            logging.error("No se pudo abrir la cámara con índice %d.", self.camera_index)
-            return
-        
+        if self.pipelined:
+            return self.process_camera_feed_pipelined()
+
+        subscription = self.camera.subscribe("vision", rgb=True)
         frame_count = 0
         start_time = time.time()
-        logging.info("Cámara abierta; iniciando procesamiento de frames.")
+        logging.info("Iniciando procesamiento de frames de la cámara %d.", self.camera_index)
         
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    logging.warning("No se pudo leer el frame. Terminando procesamiento.")
-                    break
-
-                frame_count += 1
-                if frame_count % self.frame_skip != 0:
+            while not subscription.closed:
+                shared = subscription.get(timeout=0.1)
+                if shared is None:
                     continue
 
-                original_frame = frame.copy()
-                try:
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                except Exception as e:
-                    logging.error("Error al convertir frame a RGB: %s", e)
+                frame_count += 1
+                if not self.should_process(frame_count):
                     continue
 
-                process_start = time.time()
-                if self.mode == "detection":
-                    results = self.detector.process(rgb_frame)
-                    if results and results.detections:
-                        for detection in results.detections:
-                            bboxC = detection.location_data.relative_bounding_box
-                            h, w, _ = frame.shape
-                            x = int(bboxC.xmin * w)
-                            y = int(bboxC.ymin * h)
-                            box_width = int(bboxC.width * w)
-                            box_height = int(bboxC.height * h)
-                            cv2.rectangle(frame, (x, y), (x + box_width, y + box_height), (0, 255, 0), 2)
-                        logging.info("Frame %d: %d detecciones procesadas en %.2f segundos.",
-                                     frame_count, len(results.detections), time.time() - process_start)
-                    else:
-                        logging.debug("Frame %d: No se detectaron rostros.", frame_count)
-                elif self.mode == "mesh":
-                    results = self.detector.process(rgb_frame)
-                    if results and results.multi_face_landmarks:
-                        for face_landmarks in results.multi_face_landmarks:
-                            for lm in face_landmarks.landmark:
-                                h, w, _ = frame.shape
-                                cx, cy = int(lm.x * w), int(lm.y * h)
-                                cv2.circle(frame, (cx, cy), 1, (0, 255, 0), -1)
-                        logging.info("Frame %d: Landmarks detectados en %.2f segundos.",
-                                     frame_count, time.time() - process_start)
-                    else:
-                        logging.debug("Frame %d: No se detectaron landmarks.", frame_count)
-                
-                if self.save_frames:
-                    frame_filename = os.path.join(self.output_folder, f"frame_{frame_count}.jpg")
-                    try:
-                        cv2.imwrite(frame_filename, original_frame)
-                        logging.info("Frame %d guardado: %s", frame_count, frame_filename)
-                    except Exception as e:
-                        logging.error("Error al guardar el frame %d: %s", frame_count, e)
+                # El frame compartido es de solo lectura: se graba sin copiarlo y
+                # solo se copia si hay que dibujar las detecciones para mostrarlas.
+                if self.recorder is not None:
+                    self.recorder.write(shared.bgr, shared.timestamp)
+                frame = shared.bgr.copy() if self.display_window else shared.bgr
+                results = self.process_frame(frame, frame_count, rgb=shared.rgb, draw=self.display_window)
+                if results and self.recorder is not None:
+                    self.recorder.trigger(shared.timestamp)
                 
                 if self.display_window:
                     try:
@@ -113,12 +253,154 @@ class VisionModule:
         except Exception as e:
             logging.error("Error durante el procesamiento de la cámara: %s", e)
         finally:
-            cap.release()
+            subscription.close()
+            if self.recorder is not None:
+                self.recorder.close()
             if self.display_window:
                 cv2.destroyAllWindows()
             total_time = time.time() - start_time
             logging.info("Procesamiento finalizado. Total frames: %d, Tiempo transcurrido: %.2f segundos.", frame_count, total_time)
 
+    def process_camera_feed_pipelined(self):
+        """
+        Procesa la cámara con captura, inferencia y visualización en hilos separados.
+
+        La captura la hace el CameraBroker y la suscripción solo conserva el frame
+        más reciente, de modo que una inferencia lenta descarta frames en lugar de
+        acumular retraso. La ventana se muestra desde este hilo (requisito de cv2.imshow).
+        """
+        stop = threading.Event()
+        subscription = self.camera.subscribe("vision", rgb=True)
+        processed = LatestFrameBuffer(capacity=1)
+        stats = {"captura": self.camera.stats}
+        stats.update((name, StageStats(name)) for name in ("inferencia", "extremo a extremo"))
+        counters = {"received": 0, "processed": 0}
+        start_time = time.time()
+        logging.info("Iniciando procesamiento en pipeline de la cámara %d.", self.camera_index)
+
+        def inference_loop():
+            while not stop.is_set() and not subscription.closed:
+                shared = subscription.get(timeout=0.1)
+                if shared is None:
+                    continue
+                counters["received"] += 1
+                frame_count = counters["received"]
+                if not self.should_process(frame_count):
+                    continue
+                if self.recorder is not None:
+                    self.recorder.write(shared.bgr, shared.timestamp)
+                frame = shared.bgr.copy() if self.display_window else shared.bgr
+                inference_start = time.perf_counter()
+                try:
+                    results = self.process_frame(frame, frame_count, rgb=shared.rgb, draw=self.display_window)
+                except Exception as e:
+                    logging.error("Error al procesar el frame %d: %s", frame_count, e)
+                    continue
+                stats["inferencia"].record(time.perf_counter() - inference_start)
+                if results and self.recorder is not None:
+                    self.recorder.trigger(shared.timestamp)
+                counters["processed"] += 1
+                processed.put((frame_count, shared.timestamp, frame))
+                if not self.display_window:
+                    stats["extremo a extremo"].record(time.time() - shared.timestamp)
+            stop.set()
+
+        thread = threading.Thread(target=inference_loop, name="bermm-vision-inference", daemon=True)
+        thread.start()
+
+        next_report = time.perf_counter() + self.report_interval
+        try:
+            while not stop.is_set():
+                item = processed.get(timeout=0.1)
+                if item is not None and self.display_window:
+                    _, captured_at, frame = item
+                    try:
+                        cv2.imshow("BERMM Vision", frame)
+                    except Exception as e:
+                        logging.error("Error al mostrar la ventana: %s", e)
+                    stats["extremo a extremo"].record(time.time() - captured_at)
+                if self.display_window and cv2.waitKey(1) & 0xFF == ord("q"):
+                    logging.info("Tecla 'q' presionada. Cerrando procesamiento.")
+                    break
+                if time.perf_counter() >= next_report:
+                    self._log_pipeline_stats(stats, self.recorder, subscription)
+                    next_report = time.perf_counter() + self.report_interval
+        except KeyboardInterrupt:
+            logging.info("Procesamiento interrumpido.")
+        finally:
+            stop.set()
+            thread.join()
+            subscription.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            if self.display_window:
+                cv2.destroyAllWindows()
+            self._log_pipeline_stats(stats, self.recorder, subscription)
+            logging.info("Procesamiento finalizado. Frames recibidos: %d, procesados: %d, Tiempo transcurrido: %.2f segundos.",
+                         counters["received"], counters["processed"], time.time() - start_time)
+
+    @staticmethod
+    def _log_pipeline_stats(stats, recorder, subscription):
+        for stage in stats.values():
+            stage.log()
+        if recorder is not None:
+            recorder.stats.log()
+            logging.info("[grabación] frames descartados: %d, repetidos: %d, omitidos: %d, eventos descartados: %d.",
+                         recorder.dropped, recorder.repeated_frames, recorder.skipped_frames,
+                         recorder.dropped_triggers)
+        logging.info("[captura] frames descartados sin procesar: %d.", subscription.dropped)
+
+def benchmark_mesh_rendering(iterations=200, width=640, height=480, num_landmarks=478):
+    """
+    Compara el coste por frame del modo mesh: bucle por landmark con copia y
+    conversión nuevas en cada frame, frente a la versión vectorizada con búfer RGB
+    reutilizado. Devuelve milisegundos por frame de cada variante.
+    """
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(-0.02, 1.02, size=(num_landmarks, 3))
+    face = types.SimpleNamespace(landmark=[types.SimpleNamespace(x=x, y=y, z=z) for x, y, z in coords])
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+
+    def loop_version(canvas):
+        original_frame = canvas.copy()
+        rgb_frame = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
+        for lm in face.landmark:
+            h, w, _ = canvas.shape
+            cx, cy = int(lm.x * w), int(lm.y * h)
+            cv2.circle(canvas, (cx, cy), 1, (0, 255, 0), -1)
+        return original_frame, rgb_frame
+
+    rgb_buffer = np.empty_like(frame)
+
+    def vectorized_version(canvas):
+        rgb_frame = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB, dst=rgb_buffer)
+        draw_landmarks(canvas, landmarks_to_array(face))
+        return rgb_frame
+
+    # Ambas variantes deben dibujar exactamente los mismos píxeles.
+    expected, actual = frame.copy(), frame.copy()
+    loop_version(expected)
+    vectorized_version(actual)
+    assert np.array_equal(expected, actual), "El dibujo vectorizado no coincide con cv2.circle."
+
+    results = {}
+    for name, function in (("bucle", loop_version), ("vectorizado", vectorized_version)):
+        canvas = frame.copy()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function(canvas)
+        results[name] = (time.perf_counter() - start) / iterations * 1000
+    return results
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Módulo de visión de BERMM")
+    parser.add_argument("--benchmark-mesh", action="store_true",
+                        help="Mide el coste por frame del dibujo de landmarks y termina.")
+    args = parser.parse_args()
+    if args.benchmark_mesh:
+        for name, milliseconds in benchmark_mesh_rendering().items():
+            print(f"{name:<12}{milliseconds:>8.3f} ms/frame")
+        raise SystemExit
+
     vision = VisionModule(camera_index=0, mode="detection", display_window=True, save_frames=False, frame_skip=1, detection_confidence=0.6)
     vision.process_camera_feed()
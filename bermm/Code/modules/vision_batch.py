@@ -0,0 +1,175 @@
+import argparse
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Detector propio de cada proceso del pool, creado en _init_worker.
+_worker = {}
+
+
+def _init_worker(mode, detection_confidence, static_image_mode):
+    from vision import create_detector
+    _worker["mode"] = mode
+    _worker["detection_confidence"] = detection_confidence
+    _worker["static_image_mode"] = static_image_mode
+    _worker["detector"] = create_detector(mode, detection_confidence, static_image_mode=static_image_mode)
+
+
+def _process_chunk(chunk):
+    """Procesa en el worker una lista de (índice, frame BGR o ruta de imagen) y devuelve los resultados en orden."""
+    from vision import create_detector, detections_to_array, landmarks_to_array
+    if _worker["mode"] == "mesh" and not _worker["static_image_mode"]:
+        # Cada worker recibe bloques no consecutivos del vídeo: el seguimiento de FaceMesh
+        # empieza de cero en cada bloque para no enlazar caras de frames sin relación.
+        _worker["detector"].close()
+        _worker["detector"] = create_detector("mesh", _worker["detection_confidence"], static_image_mode=False)
+    detector = _worker["detector"]
+    results = []
+    for frame_index, item in chunk:
+        frame = cv2.imread(item) if isinstance(item, str) else item
+        if frame is None:
+            logging.warning("No se pudo leer la imagen %s.", item)
+            results.append((frame_index, None))
+            continue
+        output = detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if _worker["mode"] == "detection":
+            results.append((frame_index, detections_to_array(output)))
+        else:
+            faces = [landmarks_to_array(face) for face in (output.multi_face_landmarks or [])] if output else []
+            results.append((frame_index, np.stack(faces) if faces else np.empty((0, 478, 3), dtype=np.float32)))
+    return results
+
+
+def _iter_chunks(source, chunk_size):
+    """Genera bloques de frames consecutivos: rutas para carpetas (las lee el worker) o frames para vídeos."""
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        for start in range(0, len(paths), chunk_size):
+            yield list(enumerate(paths[start:start + chunk_size], start))
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"No se pudo abrir el vídeo {source}.")
+    try:
+        frame_index, chunk = 0, []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            chunk.append((frame_index, frame))
+            frame_index += 1
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        cap.release()
+
+
+def _video_fps(source):
+    if os.path.isdir(source):
+        return None
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+    cap.release()
+    return fps
+
+
+def process_batch(source, output, mode="detection", detection_confidence=0.6, workers=None, chunk_size=32):
+    """
+    Procesa un vídeo o una carpeta de imágenes con un pool de procesos y guarda las detecciones en un .npz.
+
+    Cada worker tiene su propio detector de mediapipe. Los bloques se envían en
+    orden con un número limitado en vuelo y los resultados se recogen en el mismo
+    orden, así que la salida conserva el orden de los frames sin cargar todo el
+    vídeo en memoria.
+
+    Formato de salida (columnar, estilo CSR):
+    - frame_index (F,): índice de cada frame procesado.
+    - offsets (F + 1,): las filas del frame i van de offsets[i] a offsets[i + 1].
+    - modo detection: boxes (D, 4) normalizadas (xmin, ymin, ancho, alto) y scores (D,).
+    - modo mesh: landmarks (K, 478, 3) normalizados.
+
+    :return: Diccionario con frames procesados, segundos y factor sobre tiempo real.
+    """
+    if mode not in ("detection", "mesh"):
+        raise ValueError("Modo no reconocido. Usa 'detection' o 'mesh'.")
+    workers = workers or os.cpu_count() or 1
+    # Los frames de un vídeo son consecutivos: en mesh se aprovecha el seguimiento dentro de
+    # cada bloque (el detector se reinicia al empezar cada uno, ver _process_chunk).
+    static_image_mode = os.path.isdir(source)
+
+    frame_indices, rows, missing = [], [], 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mode, detection_confidence, static_image_mode)) as executor:
+        pending = deque()
+        for chunk in _iter_chunks(source, chunk_size):
+            pending.append(executor.submit(_process_chunk, chunk))
+            if len(pending) >= workers * 2:
+                missing += _collect(pending.popleft().result(), frame_indices, rows)
+        while pending:
+            missing += _collect(pending.popleft().result(), frame_indices, rows)
+    elapsed = time.perf_counter() - start
+
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(row) for row in rows])
+    if rows:
+        stacked = np.concatenate(rows)
+    else:
+        stacked = np.empty((0, 5) if mode == "detection" else (0, 478, 3), dtype=np.float32)
+    columns = {"frame_index": np.asarray(frame_indices, dtype=np.int64), "offsets": offsets}
+    if mode == "detection":
+        columns["boxes"] = stacked[:, :4]
+        columns["scores"] = stacked[:, 4]
+    else:
+        columns["landmarks"] = stacked
+    np.savez_compressed(output, mode=mode, source=os.path.abspath(source), **columns)
+
+    fps = _video_fps(source)
+    summary = {
+        "frames": len(frame_indices),
+        "unreadable": missing,
+        "seconds": elapsed,
+        "frames_per_second": len(frame_indices) / elapsed if elapsed else 0.0,
+        "realtime_factor": (len(frame_indices) / fps) / elapsed if fps and elapsed else None,
+    }
+    logging.info("Lote procesado: %d frames en %.2f s (%.1f FPS%s). Resultados en %s.",
+                 summary["frames"], elapsed, summary["frames_per_second"],
+                 f", {summary['realtime_factor']:.1f}x tiempo real" if summary["realtime_factor"] else "", output)
+    return summary
+
+
+def _collect(results, frame_indices, rows):
+    missing = 0
+    for frame_index, row in results:
+        if row is None:
+            missing += 1
+            continue
+        frame_indices.append(frame_index)
+        rows.append(row)
+    return missing
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Procesamiento por lotes de vídeos o carpetas de imágenes.")
+    parser.add_argument("source", help="Archivo de vídeo o carpeta de imágenes.")
+    parser.add_argument("--output", default="detections.npz", help="Archivo .npz de salida.")
+    parser.add_argument("--mode", choices=("detection", "mesh"), default="detection")
+    parser.add_argument("--confidence", type=float, default=0.6)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=32)
+    args = parser.parse_args()
+    process_batch(args.source, args.output, mode=args.mode, detection_confidence=args.confidence,
+                  workers=args.workers, chunk_size=args.chunk_size)
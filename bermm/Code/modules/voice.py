@@ -1,36 +1,36 @@
-import speech_recognition as sr
-import pyttsx3
+from speech_service import get_speech_service
+from speech_listener import get_speech_listener
 import logging
 
 class VoiceAssistant:
-    def __init__(self):
+    def __init__(self, speech_backend=None, vosk_model=None, wake_word=None):
+        """
+        :param speech_backend: Reconocedor del listener compartido ("google" o "vosk").
+        :param vosk_model: Carpeta del modelo de Vosk.
+        :param wake_word: Palabras de activación; None escucha siempre.
+        """
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-        self.recognizer = sr.Recognizer()
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
+        # Solo se pasan las opciones indicadas: el resto las decide quien cree antes el listener.
+        options = {"backend": speech_backend, "model_path": vosk_model, "wake_word": wake_word}
+        self.listener = get_speech_listener(**{key: value for key, value in options.items() if value is not None})
+        self.speech = get_speech_service()
         logging.info("Asistente de voz inicializado.")
 
-    def listen(self):
-        """Escucha la entrada de voz y la convierte en texto."""
-        with sr.Microphone() as source:
-            logging.info("Escuchando...")
-            self.recognizer.adjust_for_ambient_noise(source)
-            try:
-                audio = self.recognizer.listen(source, timeout=5)
-                text = self.recognizer.recognize_google(audio, language="es-ES")
-                logging.info(f"Texto reconocido: {text}")
-                return text.lower()
-            except sr.UnknownValueError:
-                logging.warning("No se pudo entender el audio.")
-                return None
-            except sr.RequestError:
-                logging.error("Error con el servicio de reconocimiento de voz.")
-                return None
+    def listen(self, timeout=None):
+        """
+        Devuelve el texto de la siguiente locución reconocida, en minúsculas.
+
+        El SpeechListener compartido calibra el micrófono una sola vez y lo deja
+        abierto desde la primera llamada: lo dicho entre dos llamadas no se pierde.
+
+        :param timeout: Segundos máximos de espera; None espera indefinidamente.
+        :return: Texto reconocido o None si vence el tiempo.
+        """
+        return self.listener.listen(timeout)
 
     def speak(self, text):
-        """Convierte texto a voz y lo reproduce."""
-        self.engine.say(text)
-        self.engine.runAndWait()
+        """Encola el texto en el servicio de voz compartido sin bloquear."""
+        return self.speech.speak(text)
 
 if __name__ == "__main__":
     assistant = VoiceAssistant()
@@ -38,6 +38,6 @@ if __name__ == "__main__":
         command = assistant.listen()
         if command:
             if "salir" in command:
-                assistant.speak("Cerrando asistente de voz.")
+                assistant.speak("Cerrando asistente de voz.").wait()
                 break
             assistant.speak(f"Dijiste: {command}")
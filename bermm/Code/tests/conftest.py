@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos se importan como scripts (from x import Y), igual que al ejecutar main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "modules"))
@@ -0,0 +1,91 @@
+import pytest
+
+import ai_chatbot
+from ai_chatbot import AIChatbot
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = []
+
+    def complete(self, messages, timeout=None):
+        self.calls.append(messages[-1]["content"])
+        return f"Respuesta {len(self.calls)}."
+
+
+@pytest.fixture
+def make_chatbot(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ai_chatbot, "get_speech_service", lambda: None)
+    chatbots = []
+
+    def make():
+        chatbot = AIChatbot(context_tokens=10_000)
+        chatbot.llm = FakeLLM()
+        chatbots.append(chatbot)
+        return chatbot
+
+    yield make
+    # chat_memory.db es una ruta relativa: cerrar antes de salir de tmp_path.
+    for chatbot in chatbots:
+        chatbot.store.close()
+
+
+def test_is_follow_up():
+    assert AIChatbot.is_follow_up("¿Y mañana?")
+    assert AIChatbot.is_follow_up("explícalo mejor")
+    assert AIChatbot.is_follow_up("¿por qué pasa eso con los planetas?")
+    assert not AIChatbot.is_follow_up("¿Cuál es la capital de Francia?")
+    assert not AIChatbot.is_follow_up("quién es cervantes")
+
+
+def test_repeated_standalone_question_is_served_from_cache(make_chatbot):
+    chatbot = make_chatbot()
+    answer = chatbot.get_response("cuál es la capital de francia")
+    chatbot.get_response("recomiéndame una novela de ciencia ficción")
+    chatbot.get_response("cuántos habitantes tiene el planeta tierra")
+    assert chatbot.get_response("¿Cuál es la capital de Francia?") == answer
+    assert len(chatbot.llm.calls) == 3
+    assert chatbot.cache_stats()["hits"] == 1
+
+
+def test_standalone_answers_survive_a_restart(make_chatbot):
+    chatbot = make_chatbot()
+    answer = chatbot.get_response("cuál es la capital de francia")
+    chatbot.get_response("recomiéndame una novela de ciencia ficción")
+    chatbot.store.flush()
+
+    restarted = make_chatbot()
+    assert restarted.conversation.reply_digest()
+    assert restarted.get_response("¿Cuál es la capital de Francia?") == answer
+    assert restarted.llm.calls == []
+
+
+def test_short_questions_are_served_from_cache(make_chatbot):
+    chatbot = make_chatbot()
+    for message in ("quién es cervantes", "quién es cervantes", "¿Quién es Cervantes?",
+                    "capital de francia", "capital de francia"):
+        chatbot.get_response(message)
+    assert len(chatbot.llm.calls) == 2
+    assert chatbot.cache_stats()["size"] == 2
+
+
+def test_follow_ups_are_keyed_on_the_last_answer(make_chatbot):
+    chatbot = make_chatbot()
+    chatbot.get_response("qué tiempo hace en madrid esta semana")
+    madrid = chatbot.get_response("¿y el fin de semana?")
+    chatbot.get_response("qué tiempo hace en sevilla esta semana")
+    sevilla = chatbot.get_response("¿y el fin de semana?")
+    assert madrid != sevilla
+    # Tras la misma respuesta, el mismo seguimiento sale de la caché.
+    chatbot.get_response("qué tiempo hace en madrid esta semana")
+    assert chatbot.get_response("¿y el fin de semana?") == madrid
+    assert len(chatbot.llm.calls) == 4
+
+
+def test_follow_up_without_a_previous_answer_is_not_cached(make_chatbot):
+    chatbot = make_chatbot()
+    chatbot.get_response("explícalo mejor")
+    chatbot.store.flush()
+    assert chatbot.get_from_memory("explícalo mejor") is None
+    assert chatbot.cache_stats()["size"] == 0
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import numpy as np
+
+import camera_broker
+from camera_broker import CameraBroker
+
+
+class FakeCapture:
+    """Cámara falsa: un frame distinto cada 5 ms."""
+
+    opened = 0
+
+    def __init__(self, index):
+        FakeCapture.opened += 1
+        self.index = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(0.005)
+        self.index += 1
+        return True, np.full((4, 6, 3), (self.index % 256, 0, 255), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_resubscribe_while_stopping_restarts_capture(monkeypatch):
+    monkeypatch.setattr(camera_broker.cv2, "VideoCapture", FakeCapture)
+    broker = CameraBroker()
+    for _ in range(20):
+        first = broker.subscribe("a")
+        assert first.get(timeout=1.0) is not None
+        closer = threading.Thread(target=first.close)
+        closer.start()
+        second = broker.subscribe("b")
+        closer.join()
+        # La nueva suscripción siempre recibe frames, aunque coincida con la parada del hilo.
+        assert not second.closed
+        assert second.get(timeout=1.0) is not None
+        second.close()
+    assert broker._thread is None
+
+
+def test_rgb_buffers_are_reused_without_touching_held_frames(monkeypatch):
+    monkeypatch.setattr(camera_broker.cv2, "VideoCapture", FakeCapture)
+    broker = CameraBroker()
+    subscription = broker.subscribe("rgb", rgb=True)
+    held = subscription.get(timeout=1.0)
+    expected = held.bgr[..., ::-1].copy()
+    for _ in range(30):
+        frame = subscription.get(timeout=1.0)
+        assert np.array_equal(frame.rgb, frame.bgr[..., ::-1])
+    subscription.close()
+    # El frame retenido no se sobrescribió y los demás buffers se reutilizaron.
+    assert np.array_equal(held.rgb, expected)
+    assert len(broker._rgb_buffers) < broker.max_rgb_buffers
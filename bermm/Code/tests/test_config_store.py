@@ -0,0 +1,24 @@
+import json
+
+from config_store import ConfigStore
+
+
+def test_failed_write_keeps_changes_and_backs_off(tmp_path):
+    directory = tmp_path / "config"
+    store = ConfigStore(str(directory / "avatar.json"), {"color": "azul"}, debounce=0.01, max_delay=0.01)
+    try:
+        # El directorio no existe: mkstemp falla, pero el cambio sigue pendiente y el hilo sigue vivo.
+        store.flush()
+        assert store.writes == 0 and store._dirty
+        assert store._retry_at > 0 and store._thread.is_alive()
+        first_backoff = store._backoff
+        store.flush()
+        assert store._backoff == 2 * first_backoff
+
+        directory.mkdir()
+        store.set("color", "rojo")
+        store.flush()
+        assert store.writes == 1 and store._backoff == 0.0
+        assert json.loads((directory / "avatar.json").read_text(encoding="utf-8")) == {"color": "rojo"}
+    finally:
+        store.close()
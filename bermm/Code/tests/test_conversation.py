@@ -0,0 +1,107 @@
+from conversation import ConversationManager, clip_words, estimate_tokens
+from storage import MemoryStore
+
+
+class FakeSummarizer:
+    """Resume sin modelo: anota cada llamada y cuenta los mensajes resumidos."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous_summary, messages):
+        self.calls.append((previous_summary, [message.content for message in messages]))
+        return f"{previous_summary} +{len(messages)}".strip()
+
+
+def _wait_for_compaction(conversation):
+    # La compactación corre en el hilo bermm-summary; se espera a que se vacíe.
+    conversation._executor.submit(lambda: None).result(timeout=5)
+
+
+def _store(tmp_path):
+    return MemoryStore(str(tmp_path / "chat_memory.db"))
+
+
+def test_reply_digest_follows_the_last_answer(tmp_path):
+    store = _store(tmp_path)
+    conversation = ConversationManager(store, lambda summary, messages: "")
+    assert conversation.reply_digest() == ""
+    conversation.add_turn("¿qué tiempo hace en madrid?", "Soleado.")
+    first = conversation.reply_digest()
+    assert first and first == conversation.reply_digest()
+    conversation.add_turn("¿y mañana?", "Lluvia.")
+    assert conversation.reply_digest() not in ("", first)
+    # Solo cuenta la última respuesta, no el resto de la conversación.
+    conversation.add_turn("¿qué tiempo hace en sevilla?", "Soleado.")
+    assert conversation.reply_digest() == first
+
+
+def test_window_is_sent_with_the_prompt_while_under_budget(tmp_path):
+    summarizer = FakeSummarizer()
+    conversation = ConversationManager(_store(tmp_path), summarizer, max_context_tokens=100, system_prompt="Eres BERMM.")
+    conversation.add_turn("hola", "¡Hola!")
+    messages = conversation.build_messages("¿qué tal?")
+    assert messages == [{"role": "system", "content": "Eres BERMM."},
+                        {"role": "user", "content": "hola"},
+                        {"role": "assistant", "content": "¡Hola!"},
+                        {"role": "user", "content": "¿qué tal?"}]
+    assert conversation.window_tokens == estimate_tokens("hola") + estimate_tokens("¡Hola!")
+    assert summarizer.calls == []
+
+
+def test_compaction_trims_the_window_to_half_the_budget(tmp_path):
+    summarizer = FakeSummarizer()
+    conversation = ConversationManager(_store(tmp_path), summarizer, max_context_tokens=40)
+    turn = "x" * 40  # 10 tokens por mensaje, 20 por turno.
+    for _ in range(3):
+        conversation.add_turn(turn, turn)
+    _wait_for_compaction(conversation)
+
+    assert len(summarizer.calls) == 1
+    assert conversation.window_tokens <= 40 // 2
+    assert conversation.summary == "+4"
+    assert conversation.upto_seq == 4
+    system = conversation.build_messages("sigue")[0]
+    assert system["role"] == "system" and "+4" in system["content"]
+
+
+def test_summary_is_incremental_and_survives_a_restart(tmp_path):
+    summarizer = FakeSummarizer()
+    store = _store(tmp_path)
+    conversation = ConversationManager(store, summarizer, max_context_tokens=40)
+    turn = "x" * 40
+    for _ in range(5):
+        conversation.add_turn(turn, turn)
+        _wait_for_compaction(conversation)
+
+    # Cada compactación parte del resumen anterior en lugar de rehacerlo todo.
+    assert [previous for previous, _ in summarizer.calls] == ["", "+4"]
+    assert conversation.summary == "+4 +4"
+    store.flush()
+
+    restarted = ConversationManager(_store(tmp_path), FakeSummarizer(), max_context_tokens=40)
+    assert restarted.summary == conversation.summary
+    assert restarted.upto_seq == conversation.upto_seq
+    assert [message.content for message in restarted.window] == [message.content for message in conversation.window]
+    assert restarted.reply_digest() == conversation.reply_digest()
+    restarted.add_turn("z", "z")
+    assert restarted.window[-1].seq == conversation.window[-1].seq + 2
+
+
+def test_clip_words_keeps_whole_words():
+    assert clip_words("el usuario se llama ana y vive en lugo", 20) == "el usuario se llama"
+    assert clip_words("el usuario se llama ana y vive en lugo", 20, keep_end=True) == "ana y vive en lugo"
+    assert clip_words("corto", 20) == "corto"
+
+
+def test_long_model_summary_keeps_its_beginning(tmp_path):
+    summary = "El usuario se llama Ana. " + "Le gusta el cine. " * 20
+    conversation = ConversationManager(_store(tmp_path), lambda previous, messages: summary,
+                                       max_context_tokens=40, summary_tokens=10)
+    turn = "x" * 40
+    for _ in range(3):
+        conversation.add_turn(turn, turn)
+    _wait_for_compaction(conversation)
+    assert conversation.summary.startswith("El usuario se llama Ana.")
+    assert len(conversation.summary) <= 40 and summary.startswith(conversation.summary)
+    assert conversation.summary.endswith(("Ana.", "Le", "gusta", "el", "cine."))
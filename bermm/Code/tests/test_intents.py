@@ -0,0 +1,138 @@
+import logging
+
+import pytest
+
+import system_control
+from intents import IntentMatcher, normalize
+from system_control import DESTRUCTIVE_COMMANDS, SystemControl
+
+
+class FakeLauncher:
+    def __init__(self):
+        self.launched = []
+
+    def launch(self, program, *args, on_start=None):
+        self.launched.append((program,) + args)
+        if on_start is not None:
+            on_start(1234)
+        return None
+
+    def which(self, program):
+        return None
+
+
+class FakeSpeech:
+    def __init__(self):
+        self.spoken = []
+
+    def speak(self, text, **kwargs):
+        self.spoken.append(text)
+
+
+@pytest.fixture
+def speech(monkeypatch):
+    speech = FakeSpeech()
+    monkeypatch.setattr(system_control, "get_speech_service", lambda: speech)
+    return speech
+
+
+@pytest.fixture
+def control(monkeypatch, speech):
+    control = SystemControl()
+    control.launcher = FakeLauncher()
+    monkeypatch.setattr(control, "_track", lambda future, message=None: future)
+    return control
+
+
+def _matcher():
+    matcher = IntentMatcher()
+    matcher.register("open_browser", ("abrir navegador", "abre navegador"), lambda: None)
+    matcher.register("open_notepad", ("abrir bloc notas", "abre bloc notas"), lambda: None)
+    matcher.register("notes", "abre notas", lambda: None)
+    matcher.register("shutdown", ("apaga equipo", "apaga computadora"), lambda: None, anchored=True)
+    return matcher
+
+
+def test_normalize_drops_accents_punctuation_and_stopwords():
+    assert normalize("¡Ábrele el Navegador, por favor!") == ["abrele", "navegador"]
+    assert normalize("Apaga la cañería") == ["apaga", "cañeria"]
+
+
+def test_commands_inside_a_sentence_and_with_typos():
+    matcher = _matcher()
+    assert matcher.match("bermm, abre el navegador por favor").intent.name == "open_browser"
+    found = matcher.match("abrir navegadro")
+    assert found.intent.name == "open_browser" and found.corrections == 1
+    # Gana la frase más larga.
+    assert matcher.match("abre el bloc de notas").intent.name == "open_notepad"
+    assert matcher.match("hola, ¿qué tal estás hoy?") is None
+
+
+def test_corrections_are_at_most_one_edit():
+    matcher = _matcher()
+    # "xnavegado" comparte un borrado con "navegador", pero está a dos ediciones.
+    assert matcher.match("abrir xnavegado") is None
+
+
+@pytest.mark.parametrize("text", [
+    "mi hermano apaga el equipo cada noche",
+    "¿qué pasa si apago la computadora?",
+    "¿cómo apago el equipo?",
+    "¿apaga el equipo?",
+    "apaga el equpo",
+    "apagar equipo de música",
+])
+def test_anchored_commands_need_the_whole_utterance(text):
+    assert _matcher().match(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "mi hermano apaga el equipo cada noche",
+    "¿qué pasa si apago la computadora?",
+    "¿cómo apago el equipo?",
+    "apagar equipo de música",
+    "el técnico reinicia el ordenador los lunes",
+])
+def test_conversation_never_shuts_down(control, text):
+    control.execute_command(text)
+    control.execute_command("sí")
+    assert control.launcher.launched == []
+
+
+def test_shutdown_waits_for_confirmation(control):
+    assert control.execute_command("Bermm, apaga el equipo, por favor")
+    assert control.launcher.launched == []
+    assert control.execute_command("Sí")
+    assert control.launcher.launched and control.launcher.launched[0][0] in ("shutdown", "reboot")
+
+
+@pytest.mark.parametrize("text, program", [
+    ("apagar computadora", ("shutdown",)),
+    ("Apagar la computadora", ("shutdown",)),
+    ("reiniciar computadora", ("shutdown", "reboot")),
+    ("reiniciar el equipo", ("shutdown", "reboot")),
+])
+def test_infinitive_commands_still_work(control, text, program):
+    assert control.execute_command(text)
+    assert control.execute_command("sí")
+    assert control.launcher.launched[0][0] in program
+
+
+def test_confirmation_question_is_spoken(control, speech):
+    control.execute_command("apaga el equipo")
+    assert speech.spoken == [DESTRUCTIVE_COMMANDS["shutdown"]]
+
+
+def test_anything_else_cancels_the_shutdown(control):
+    control.execute_command("reinicia el ordenador")
+    control.execute_command("no, mejor no")
+    control.execute_command("sí")
+    assert control.launcher.launched == []
+
+
+def test_notepad_is_logged_when_it_starts(control, monkeypatch, caplog):
+    monkeypatch.setattr(system_control.platform, "system", lambda: "Windows")
+    with caplog.at_level(logging.INFO):
+        control.execute_command("abre el bloc de notas")
+    assert control.launcher.launched == [("notepad",)]
+    assert "Bloc de Notas abierto." in caplog.text
@@ -0,0 +1,48 @@
+import sys
+
+import launcher
+from launcher import ProcessLauncher
+
+
+class FakeKey:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeWinreg:
+    HKEY_CURRENT_USER = "HKCU"
+    HKEY_LOCAL_MACHINE = "HKLM"
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def OpenKey(self, root, key):
+        if (root, key) not in self.paths:
+            raise OSError(key)
+        return FakeKey(self.paths[(root, key)])
+
+    def QueryValue(self, key, name):
+        return key.path
+
+
+def test_programs_outside_path_are_found_in_app_paths(monkeypatch, tmp_path):
+    chrome = tmp_path / "chrome.exe"
+    chrome.write_text("")
+    key = launcher.APP_PATHS_KEY + "\\chrome.exe"
+    monkeypatch.setattr(launcher, "winreg", FakeWinreg({("HKLM", key): f'"{chrome}"'}))
+    programs = launcher.ProgramCache()
+    assert programs.which("chrome") == str(chrome)
+    assert programs.which("msedge") is None
+
+
+def test_on_start_runs_before_the_process_exits():
+    started = []
+    result = ProcessLauncher().launch(sys.executable, "-c", "import time; time.sleep(0.2)",
+                                      on_start=started.append).result(timeout=10)
+    assert result.ok and started == [result.pid]
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from llm_client import LLMClient, LLMError, TokenBucket
+
+
+def _reply(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def _client(handler, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    return LLMClient("clave", api_base="http://stub", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_complete_returns_message_content():
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        return _reply("hola")
+
+    client = _client(handler)
+    try:
+        assert client.complete([{"role": "user", "content": "hola"}]) == "hola"
+        assert seen[0]["messages"][0]["content"] == "hola"
+    finally:
+        client.close()
+
+
+def test_complete_retries_server_errors():
+    responses = iter([httpx.Response(503), httpx.Response(429, headers={"Retry-After": "0"}), _reply("ok")])
+    client = _client(lambda request: next(responses))
+    try:
+        assert client.complete([{"role": "user", "content": "x"}]) == "ok"
+        assert client.stats["retries"] == 2
+    finally:
+        client.close()
+
+
+def test_client_errors_are_not_retried():
+    client = _client(lambda request: httpx.Response(401))
+    try:
+        with pytest.raises(LLMError):
+            client.complete([{"role": "user", "content": "x"}])
+        assert client.stats["requests"] == 1
+    finally:
+        client.close()
+
+
+def test_stream_yields_tokens():
+    body = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n"
+                   for token in ("Ho", "la", ".")) + "data: [DONE]\n\n"
+    client = _client(lambda request: httpx.Response(200, content=body.encode()))
+    try:
+        assert list(client.stream([{"role": "user", "content": "x"}])) == ["Ho", "la", "."]
+    finally:
+        client.close()
+
+
+def test_stream_deadline_covers_response_headers():
+    async def handler(request):
+        await asyncio.sleep(2)
+        return _reply("tarde")
+
+    client = _client(handler, max_retries=0)
+    try:
+        start = time.monotonic()
+        with pytest.raises(LLMError):
+            list(client.stream([{"role": "user", "content": "x"}], timeout=0.2))
+        assert time.monotonic() - start < 1.0
+    finally:
+        client.close()
+
+
+def test_throttled_request_fails_at_its_deadline():
+    client = _client(lambda request: _reply("ok"), rate=0.5, burst=1)
+    try:
+        client.complete([{"role": "user", "content": "primera"}])
+        start = time.monotonic()
+        with pytest.raises(LLMError):
+            client.complete([{"role": "user", "content": "segunda"}], timeout=0.2)
+        assert time.monotonic() - start < 0.5
+    finally:
+        client.close()
+
+
+def test_identical_requests_share_one_call_and_keep_their_own_deadline():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.5)
+        return _reply("compartida")
+
+    client = _client(handler)
+    messages = [{"role": "user", "content": "misma pregunta"}]
+    results = []
+    try:
+        leader = threading.Thread(target=lambda: results.append(client.complete(messages, timeout=5)))
+        follower = threading.Thread(target=lambda: results.append(client.complete(messages, timeout=5)))
+        leader.start()
+        time.sleep(0.1)
+        follower.start()
+
+        start = time.monotonic()
+        with pytest.raises(LLMError):
+            client.complete(messages, timeout=0.1)
+        assert time.monotonic() - start < 0.3
+
+        leader.join()
+        follower.join()
+        assert results == ["compartida", "compartida"]
+        assert len(calls) == 1
+        assert client.stats["coalesced"] == 2
+    finally:
+        client.close()
+
+
+def test_token_bucket_respects_deadline():
+    async def scenario():
+        bucket = TokenBucket(rate=10, capacity=1)
+        assert await bucket.acquire()
+        assert not await bucket.acquire(deadline=time.monotonic() + 0.01)
+        assert bucket.tokens < 1  # No se consumió ninguna ficha.
+        assert await bucket.acquire(deadline=time.monotonic() + 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+import asyncio
+
+import pipeline
+from pipeline import ConversationPipeline
+
+
+class FakeUtterance:
+    def wait(self, timeout=None):
+        return True
+
+
+class FakeSpeech:
+    def __init__(self):
+        self.spoken = []
+
+    def speak(self, text):
+        self.spoken.append(text)
+        return FakeUtterance()
+
+
+class FakeModules:
+    def __init__(self, loaded):
+        self.loaded = loaded
+
+    def is_loaded(self, name):
+        return name in self.loaded
+
+
+class FakeChatbot:
+    def get_response_stream(self, message):
+        yield from ["Hola. ", "¿Qué tal?"]
+
+
+class FakeSystemControl:
+    def execute_command(self, command):
+        pass
+
+
+class FakeBermm:
+    def __init__(self, loaded=()):
+        self.modules = FakeModules(loaded)
+        self.chatbot = FakeChatbot()
+        self.system_control = FakeSystemControl()
+        self.avatar_speech = FakeSpeech()
+
+    @property
+    def avatar(self):
+        if not self.modules.is_loaded("avatar"):
+            raise AssertionError("El pipeline no debe cargar el avatar.")
+        return self.avatar_speech
+
+
+def _run(bermm):
+    inputs = iter(["hola", "salir"])
+    asyncio.run(ConversationPipeline(bermm, input_func=lambda prompt: next(inputs),
+                                     output_func=lambda *args, **kwargs: None).run())
+
+
+def test_speech_does_not_load_the_avatar(monkeypatch):
+    speech = FakeSpeech()
+    monkeypatch.setattr(pipeline, "get_speech_service", lambda: speech)
+    bermm = FakeBermm()
+    _run(bermm)
+    assert speech.spoken == ["Hola.", "¿Qué tal?"]
+
+
+def test_speech_goes_through_a_loaded_avatar(monkeypatch):
+    speech = FakeSpeech()
+    monkeypatch.setattr(pipeline, "get_speech_service", lambda: speech)
+    bermm = FakeBermm(loaded=("avatar",))
+    _run(bermm)
+    assert bermm.avatar_speech.spoken == ["Hola.", "¿Qué tal?"]
+    assert speech.spoken == []
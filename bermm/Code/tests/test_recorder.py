@@ -0,0 +1,44 @@
+import os
+
+import cv2
+import numpy as np
+
+from recorder import FrameRecorder
+
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def _frame_counts(folder):
+    return [int(cv2.VideoCapture(os.path.join(folder, name)).get(cv2.CAP_PROP_FRAME_COUNT))
+            for name in sorted(os.listdir(folder))]
+
+
+def test_slow_frames_are_spread_over_real_time(tmp_path):
+    recorder = FrameRecorder(str(tmp_path), fps=10)
+    for i in range(9):  # 4 frames/s durante 2 s
+        recorder.write(FRAME, 100.0 + i * 0.25)
+    recorder.close()
+    # 2 s a 10 fps: 21 frames (cada frame real se repite para cubrir su hueco).
+    assert _frame_counts(str(tmp_path)) == [21]
+    assert recorder.repeated_frames == 12
+
+
+def test_fast_frames_are_skipped(tmp_path):
+    recorder = FrameRecorder(str(tmp_path), fps=10)
+    for i in range(41):  # 40 frames/s durante 1 s
+        recorder.write(FRAME, 100.0 + i * 0.025)
+    recorder.close()
+    assert _frame_counts(str(tmp_path)) == [11]
+
+
+def test_triggered_recording_rotates_segments(tmp_path):
+    recorder = FrameRecorder(str(tmp_path), fps=10, mode="triggered", pre_seconds=1, post_seconds=100,
+                             segment_seconds=2)
+    for i in range(60):
+        recorder.write(FRAME, i * 0.1)
+        if i == 10:
+            recorder.trigger(i * 0.1)
+    recorder.close()
+    counts = _frame_counts(str(tmp_path))
+    assert len(counts) == 3
+    assert sum(counts) >= 55
@@ -0,0 +1,54 @@
+import time
+
+from response_cache import ResponseCache, normalize_key
+
+
+def test_exact_match_ignores_case_accents_and_punctuation():
+    cache = ResponseCache()
+    cache.put("¿Qué hora es?", "Son las cinco.")
+    assert normalize_key("¿Qué   HORA es?") == "que hora es"
+    assert cache.get("que hora es") == "Son las cinco."
+    assert cache.stats()["hits"] == 1
+
+
+def test_approximate_matching_is_off_by_default():
+    cache = ResponseCache()
+    cache.put("recuérdame llamar a juan a las 5", "Vale, te aviso para llamar a Juan.")
+    assert cache.get("recuérdame llamar a juana a las 5") is None
+
+
+def test_approximate_matching_requires_the_same_content_words():
+    cache = ResponseCache(approximate=True)
+    cache.put("recuérdame llamar a juan a las 5", "Vale, te aviso para llamar a Juan.")
+    assert cache.get("recuérdame llamar a juana a las 5") is None
+    assert cache.get("oye recuérdame llamar a juan a las 5") == "Vale, te aviso para llamar a Juan."
+    assert cache.stats()["approximate_hits"] == 1
+
+
+def test_approximate_matching_skips_short_prompts():
+    cache = ResponseCache(approximate=True)
+    cache.put("hola juan", "Hola.")
+    assert cache.get("oye hola juan") is None
+
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put("uno", 1, ttl=0.01)
+    cache.put("dos", 2)
+    time.sleep(0.02)
+    assert cache.get("uno") is None
+    cache.put("tres", 3)
+    cache.get("dos")
+    cache.put("cuatro", 4)
+    assert cache.get("tres") is None
+    assert cache.get("dos") == 2
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["evictions"] == 1
+
+
+def test_context_is_part_of_the_key():
+    cache = ResponseCache(approximate=True)
+    cache.put("¿y mañana?", "Mañana lloverá en Madrid.", context="conversacion-madrid")
+    assert cache.get("y mañana", context="conversacion-madrid") == "Mañana lloverá en Madrid."
+    assert cache.get("y mañana", context="conversacion-sevilla") is None
+    assert cache.get("y mañana") is None
@@ -0,0 +1,95 @@
+import logging
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import screen_reader
+from screen_reader import IncrementalScreenReader
+
+TILE = (16, 8)
+
+
+class FakeOCR:
+    """pytesseract falso: anota el tamaño de cada recorte y devuelve una línea según su contenido."""
+
+    def __init__(self):
+        self.sizes = []
+
+    def image_to_string(self, image, lang=None):
+        self.sizes.append(image.size)
+        return f"línea {int(np.asarray(image).sum())}\n"
+
+
+class FakeScreen:
+    def __init__(self):
+        self.pixels = np.zeros((64, 64), dtype=np.uint8)
+
+    def draw(self, row, column, value):
+        self.pixels[row * TILE[1]:(row + 1) * TILE[1], column * TILE[0]:(column + 1) * TILE[0]] = value
+
+    def capture(self):
+        return Image.fromarray(self.pixels.copy())
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    ocr = FakeOCR()
+    monkeypatch.setattr(screen_reader, "pytesseract", ocr)
+    return ocr
+
+
+def test_only_changed_tiles_are_read_with_a_margin(ocr):
+    screen = FakeScreen()
+    reader = IncrementalScreenReader(tile_size=TILE, capture=screen.capture)
+    assert reader.read() == "línea 0"
+    assert ocr.sizes == [(64, 64)]
+    assert reader.read() == ""
+    assert len(ocr.sizes) == 1
+
+    screen.draw(3, 1, 200)
+    assert reader.read() == f"línea {200 * TILE[0] * TILE[1]}"
+    # La tesela cambiada y una de margen por cada lado: 3x3 teselas.
+    assert ocr.sizes[-1] == (3 * TILE[0], 3 * TILE[1])
+
+
+def test_nearby_changes_are_merged_into_one_region(ocr):
+    screen = FakeScreen()
+    reader = IncrementalScreenReader(tile_size=TILE, capture=screen.capture)
+    reader.read()
+    screen.draw(2, 0, 50)
+    screen.draw(4, 3, 60)
+    reader.read()
+    assert ocr.sizes[1:] == [(4 * TILE[0], 5 * TILE[1])]
+
+
+def test_cache_is_keyed_on_content_not_position(ocr):
+    screen = FakeScreen()
+    reader = IncrementalScreenReader(tile_size=TILE, capture=screen.capture)
+    reader.read()
+    screen.draw(2, 1, 90)
+    reader.read()
+    screen.draw(2, 1, 0)
+    reader.read()
+    calls = len(ocr.sizes)
+
+    # El mismo contenido tres filas más abajo (p. ej. al desplazar una lista) sale de la caché.
+    screen.draw(5, 1, 90)
+    reader.read()
+    assert len(ocr.sizes) == calls
+    assert reader.stats["cache_hits"] == 1
+
+
+def test_lines_already_announced_are_not_repeated(ocr, caplog):
+    screen = FakeScreen()
+    reader = IncrementalScreenReader(tile_size=TILE, capture=screen.capture)
+    reader.read()
+    screen.draw(6, 2, 30)
+    assert reader.read()
+    screen.draw(6, 2, 0)
+    reader.read()
+    screen.draw(6, 2, 30)
+    assert reader.read() == ""
+    with caplog.at_level(logging.INFO):
+        reader.log_stats()
+    assert "capturas" in caplog.text
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import speech_listener
+from recognizers import RecognizerBackend, WakeWordGate
+from speech_listener import SpeechListener
+
+
+class FakeMicrophone:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _fake_microphone(monkeypatch, listener):
+    started = []
+    stopped = []
+    calibrations = []
+
+    def listen_in_background(source, callback, phrase_time_limit=None):
+        started.append(callback)
+        return lambda wait_for_stop=True: stopped.append(wait_for_stop)
+
+    monkeypatch.setattr(speech_listener.sr, "Microphone", FakeMicrophone)
+    monkeypatch.setattr(listener.recognizer, "listen_in_background", listen_in_background)
+    monkeypatch.setattr(listener.recognizer, "adjust_for_ambient_noise",
+                        lambda source, duration=1: calibrations.append(duration))
+    return started, stopped, calibrations
+
+
+def test_microphone_closes_with_last_subscriber(monkeypatch):
+    listener = SpeechListener()
+    started, stopped, calibrations = _fake_microphone(monkeypatch, listener)
+
+    first = listener.subscribe(lambda transcript: None)
+    second = listener.subscribe(lambda transcript: None)
+    assert len(started) == 1
+    first()
+    assert not stopped
+    second()
+    assert len(stopped) == 1
+
+    # Al volver a suscribirse se reabre el micrófono sin repetir la calibración.
+    listener.subscribe(lambda transcript: None)()
+    assert len(started) == 2 and len(stopped) == 2
+    assert len(calibrations) == 1
+
+
+def test_get_speech_listener_warns_on_other_configuration(monkeypatch, caplog):
+    monkeypatch.setattr(speech_listener, "_listener", None)
+    listener = speech_listener.get_speech_listener("es-ES")
+    with caplog.at_level(logging.WARNING):
+        assert speech_listener.get_speech_listener() is listener
+        assert not caplog.records
+        assert speech_listener.get_speech_listener("en-US") is listener
+    assert "en-US" in caplog.text
+
+
+def test_backend_is_chosen_by_name():
+    assert SpeechListener(backend="google").backend.name == "google"
+    with pytest.raises(ValueError):
+        SpeechListener(backend="vosk")
+    listener = SpeechListener(wake_word=["bermm"])
+    assert listener.wake_word.wake_words == ("bermm",)
+
+
+class FakeAudio:
+    frame_data = b"\0" * 3200
+    sample_rate = 16000
+    sample_width = 2
+
+
+class FakeBackend(RecognizerBackend):
+    name = "fake"
+
+    def __init__(self, texts):
+        super().__init__()
+        self.texts = list(texts)
+
+    def recognize(self, audio):
+        return self.texts.pop(0)
+
+
+def test_local_wake_word_detection_opens_the_window():
+    gate = WakeWordGate(["bermm"])
+    gate.check_audio = lambda audio: True
+    listener = SpeechListener(backend=FakeBackend(["verm abre el navegador", "y el bloc de notas"]),
+                              wake_word=gate)
+    heard = []
+    listener._subscribers.append((heard.append, False))
+
+    # El detector local oyó la palabra aunque el reconocedor principal la transcriba mal.
+    listener._recognize(FakeAudio(), 0.0)
+    assert gate.awake
+    # Dentro de la ventana no hace falta repetir la palabra ni se vuelve a consultar al detector.
+    gate.check_audio = lambda audio: False
+    listener._recognize(FakeAudio(), 0.0)
+    assert [transcript.text for transcript in heard] == ["verm abre el navegador", "y el bloc de notas"]
+
+
+def test_listen_keeps_the_microphone_open_between_calls(monkeypatch):
+    listener = SpeechListener()
+    started, stopped, calibrations = _fake_microphone(monkeypatch, listener)
+
+    assert listener.listen(timeout=0.01) is None
+    assert len(started) == 1 and not stopped
+
+    # Lo que se dice entre dos llamadas queda en cola para la siguiente.
+    listener._deliver("abre el navegador", 0.0, 1.0)
+    assert listener.listen(timeout=0.01) == "abre el navegador"
+    assert len(started) == 1 and not stopped
+
+    stale = speech_listener.Transcript("hace rato", "es-ES", 0.0, 0.0, 1.0)
+    listener._publish(stale)
+    assert listener.listen(timeout=0.01) is None
+
+
+def test_listen_queue_is_bounded_and_released_when_idle(monkeypatch):
+    listener = SpeechListener(listen_queue_size=2, listen_idle_seconds=0.05)
+    started, stopped, calibrations = _fake_microphone(monkeypatch, listener)
+
+    assert listener.listen(timeout=0.01) is None
+    for text in ("uno", "dos", "tres"):
+        listener._deliver(text, 0.0, 1.0)
+    # Solo se conservan las más recientes.
+    assert listener.listen(timeout=0.01) == "dos"
+    assert listener.listen(timeout=0.01) == "tres"
+
+    # Sin llamadas a listen() se anula su suscripción y se cierra el micrófono.
+    time.sleep(0.2)
+    assert len(stopped) == 1 and not listener._subscribers
+
+
+def test_calibration_does_not_hold_the_lock(monkeypatch):
+    listener = SpeechListener()
+    started, stopped, calibrations = _fake_microphone(monkeypatch, listener)
+    calibrating = threading.Event()
+    release = threading.Event()
+
+    def slow_calibration(source, duration=1):
+        calibrating.set()
+        release.wait(5)
+
+    monkeypatch.setattr(listener.recognizer, "adjust_for_ambient_noise", slow_calibration)
+    thread = threading.Thread(target=listener.subscribe, args=(lambda transcript: None,))
+    thread.start()
+    assert calibrating.wait(5)
+    # stop() no espera a la calibración y anula el arranque en curso.
+    listener.stop()
+    release.set()
+    thread.join(5)
+    assert started == []
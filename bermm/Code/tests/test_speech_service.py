@@ -0,0 +1,53 @@
+import speech_service
+from speech_service import SpeechService, iter_sentences, split_sentences
+
+
+def test_split_sentences():
+    assert split_sentences("Hola. ¿Qué tal?  Bien; gracias… Adiós") == ["Hola.", "¿Qué tal?", "Bien;", "gracias…",
+                                                                          "Adiós"]
+    assert split_sentences("   ") == []
+    assert split_sentences("3.14 es pi") == ["3.14 es pi"]
+
+
+def test_iter_sentences_yields_each_sentence_as_it_closes():
+    produced = []
+
+    def tokens():
+        for token in ["Ho", "la. ", "Esto ", "es una", " prueba", "! Y ", "fin"]:
+            produced.append(token)
+            yield token
+
+    sentences = iter_sentences(tokens())
+    assert next(sentences) == "Hola."
+    # La primera frase sale antes de consumir el resto de tokens.
+    assert produced == ["Ho", "la. "]
+    assert list(sentences) == ["Esto es una prueba!", "Y fin"]
+
+
+class FakeEngine:
+    def __init__(self):
+        self.rates = []
+
+    def setProperty(self, name, value):
+        if name == "rate":
+            self.rates.append(value)
+
+    def connect(self, name, callback):
+        pass
+
+    def say(self, text):
+        pass
+
+    def runAndWait(self):
+        pass
+
+
+def test_rate_changes_apply_from_the_next_sentence(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(speech_service.pyttsx3, "init", lambda: engine)
+    service = SpeechService(rate=150)
+    service.speak("Hola.").wait(timeout=5)
+    service.set_rate(200)
+    service.speak("Más rápido.").wait(timeout=5)
+    service.speak("Igual.").wait(timeout=5)
+    assert engine.rates == [150, 200]
@@ -0,0 +1,98 @@
+import logging
+
+import pytest
+
+import tts_backends
+from tts_backends import SpeechLatency, SpeechServiceBackend, TextToSpeech, TTSBackend, probe_backend
+
+
+class FakeBackend(TTSBackend):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def speak_chunk(self, text, interrupt=False):
+        self.chunks.append((text, interrupt))
+
+
+class MissingBackend(TTSBackend):
+    name = "missing"
+    created = 0
+
+    def __init__(self):
+        MissingBackend.created += 1
+        raise RuntimeError("No disponible.")
+
+
+class FakeService:
+    def __init__(self):
+        self.spoken = []
+
+    def speak(self, text, interrupt=False, on_start=None):
+        self.spoken.append((text, interrupt))
+        on_start(None)
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(MissingBackend, "created", 0)
+    monkeypatch.setattr(tts_backends, "BACKENDS", {"missing": MissingBackend, "fake": FakeBackend})
+
+
+def test_probe_backend_returns_the_first_available(backends):
+    backend = probe_backend(("missing", "fake"))
+    assert isinstance(backend, FakeBackend)
+    assert MissingBackend.created == 1
+
+
+def test_probe_backend_without_any_backend(backends, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert probe_backend(("missing",)) is None
+    assert "No hay motor" in caplog.text
+
+
+def test_sentences_are_sent_separately_and_only_the_first_interrupts():
+    backend = FakeBackend()
+    tts = TextToSpeech(backend)
+    assert tts.speak("Hola. ¿Qué tal? Adiós.", interrupt=True)
+    assert backend.chunks == [("Hola.", True), ("¿Qué tal?", False), ("Adiós.", False)]
+    assert backend.latency.utterances == 1 and backend.latency.chunks == 3
+
+
+def test_nothing_is_sent_without_backend_or_text():
+    assert not TextToSpeech(None).speak("Hola.")
+    backend = FakeBackend()
+    assert not TextToSpeech(backend).speak("")
+    assert backend.chunks == [] and backend.latency.utterances == 0
+
+
+def test_speech_service_gets_the_whole_text(monkeypatch):
+    service = FakeService()
+    monkeypatch.setattr(tts_backends, "get_speech_service", lambda: service)
+    backend = SpeechServiceBackend()
+    TextToSpeech(backend).speak("Hola. ¿Qué tal?", interrupt=True)
+    # El SpeechService ya parte el texto en frases: se le envía entero.
+    assert service.spoken == [("Hola. ¿Qué tal?", True)]
+    assert backend.latency.start_count == 1
+
+
+def test_speech_latency_accounting(caplog):
+    latency = SpeechLatency("fake")
+    with caplog.at_level(logging.INFO):
+        latency.log()
+    assert not caplog.records
+
+    latency.record_dispatch(0.002, 3)
+    latency.record_dispatch(0.004, 1)
+    latency.record_start(0.1)
+    latency.record_start(0.3)
+    assert latency.utterances == 2 and latency.chunks == 4
+    assert latency.dispatch_total == pytest.approx(0.006) and latency.dispatch_max == 0.004
+    assert latency.start_count == 2 and latency.start_max == 0.3
+    with caplog.at_level(logging.INFO):
+        latency.log()
+    assert "2 textos en 4 fragmentos" in caplog.text
+    assert "envío medio 3.00 ms" in caplog.text
+    assert "inicio del audio medio 200 ms" in caplog.text